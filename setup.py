@@ -15,11 +15,20 @@ setup(
             'owl2types = owl2types:owl2types',
         ],
     },
-    py_modules=['owl2types'],
+    py_modules=[
+        'owl2types',
+        'owl2types_compact',
+        'owl2types_lexicon',
+        'owl2types_serve',
+        'owl2types_snapshot',
+    ],
     package_dir={'': 'tools'},
     install_requires=[
         'owlready2',
     ],
+    extras_require={
+        'zstd': ['zstandard'],
+    },
     classifiers=[
         'Development Status :: 3 - Alpha',
         'Intended Audience :: Science/Research',
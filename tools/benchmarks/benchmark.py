@@ -0,0 +1,380 @@
+"""Benchmarks the stages of owl2types.
+
+Each stage of a conversion is timed and its peak memory is measured, on
+synthetic ontologies of different shapes and on the ontologies of this
+repository:
+
+    python tools/benchmarks/benchmark.py run --output results.json
+    python tools/benchmarks/benchmark.py compare baseline.json results.json
+
+compare exits with status 1 if a stage got slower or needs more memory than
+in the baseline, by more than the threshold (25% by default).
+
+The synthetic ontologies can also be written to a directory, to try them
+with owl2types directly:
+
+    python tools/benchmarks/benchmark.py generate /tmp/synthetic --classes 50000
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+
+TOOLS = Path(__file__).absolute().parent.parent
+REPOSITORY = TOOLS.parent
+
+sys.path.insert(0, str(TOOLS))
+
+from owl2types import (PREFIX_REGISTRY, ClassGraph, OntologyArgument, classes2ccg,  # noqa: E402
+                       classes2xml, exclude_owl_thing, extract_classes, extract_classes_sql,
+                       insert_ccg_features, isolated_world, load_ontologies, resolve_imports,
+                       stream_ontologies)
+
+
+RESULTS_VERSION = 1
+
+# The shapes of the synthetic ontologies, see generate_ontologies.
+SCENARIOS = OrderedDict([
+    ('small', {'classes': 1000, 'depth': 6, 'fanout': 4, 'multi': 0.1, 'imports': 1}),
+    ('deep', {'classes': 2000, 'depth': 500, 'fanout': 1, 'multi': 0.0, 'imports': 1}),
+    ('wide', {'classes': 10000, 'depth': 2, 'fanout': 10000, 'multi': 0.0, 'imports': 1}),
+    ('multi', {'classes': 5000, 'depth': 8, 'fanout': 4, 'multi': 0.5, 'imports': 1}),
+    ('imports', {'classes': 5000, 'depth': 8, 'fanout': 4, 'multi': 0.1, 'imports': 16}),
+    ('large', {'classes': 20000, 'depth': 10, 'fanout': 6, 'multi': 0.1, 'imports': 4}),
+])
+
+# The ontologies of this repository, converted like by the Makefile.
+REPOSITORY_SCENARIO = 'ontologies'
+REPOSITORY_ONTOLOGIES = ['ontologies/SLM-cooking.owl:slm', 'ontologies/UIO.owl:uio']
+
+# The grammar the feature section is inserted into.
+GRAMMAR = REPOSITORY / 'english-cooking' / 'english-cooking.ccg'
+
+# Differences below these are noise and never regressions.
+MIN_SECONDS = 0.002
+MIN_BYTES = 64 * 1024
+
+RDF_HEADER = '''<?xml version="1.0"?>
+<rdf:RDF xmlns:owl="http://www.w3.org/2002/07/owl#"
+         xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+         xmlns:rdfs="http://www.w3.org/2000/01/rdf-schema#"
+         xml:base="{iri}">
+    <owl:Ontology rdf:about="{iri}">
+'''
+
+
+def main(args=None):
+    """The command line of the benchmarks, see the module documentation."""
+    parser = argparse.ArgumentParser(description='Benchmarks the stages of owl2types.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='Runs the benchmarks.')
+    run_parser.add_argument('-s', '--scenario', action='append', choices=[*SCENARIOS, REPOSITORY_SCENARIO],
+                            help='Only run this scenario. Can be repeated. Default: all.')
+    run_parser.add_argument('-r', '--repeat', type=int, default=5,
+                            help='How often each stage is timed. Default: 5.')
+    run_parser.add_argument('-o', '--output', help='The JSON file to write the results to.')
+    run_parser.add_argument('-l', '--lookup', action='append', default=[],
+                            help=f'Additional lookup directories for the {REPOSITORY_SCENARIO} scenario, '
+                                 'e.g. for ontologies which are otherwise downloaded.')
+
+    compare_parser = commands.add_parser('compare', help='Compares results to a baseline.')
+    compare_parser.add_argument('baseline', help='The JSON file of the baseline.')
+    compare_parser.add_argument('results', help='The JSON file of the new results.')
+    compare_parser.add_argument('-t', '--threshold', type=float, default=0.25,
+                                help='The relative slowdown or memory increase which counts as a '
+                                     'regression. Default: 0.25.')
+
+    generate_parser = commands.add_parser('generate', help='Writes a synthetic ontology.')
+    generate_parser.add_argument('directory', help='The directory to write the ontologies to.')
+    generate_parser.add_argument('--classes', type=int, default=1000, help='Default: 1000.')
+    generate_parser.add_argument('--depth', type=int, default=6, help='Default: 6.')
+    generate_parser.add_argument('--fanout', type=int, default=4, help='Default: 4.')
+    generate_parser.add_argument('--multi', type=float, default=0.1, help='Default: 0.1.')
+    generate_parser.add_argument('--imports', type=int, default=1, help='Default: 1.')
+    generate_parser.add_argument('--seed', type=int, default=0, help='Default: 0.')
+
+    arguments = parser.parse_args(args)
+    if arguments.command == 'run':
+        if arguments.repeat < 1:
+            parser.error('--repeat must be at least 1')
+        results = run(arguments.scenario or [*SCENARIOS, REPOSITORY_SCENARIO], arguments.repeat,
+                      arguments.lookup)
+        print_results(results)
+        if arguments.output:
+            Path(arguments.output).write_text(json.dumps(results, indent=2) + '\n')
+    elif arguments.command == 'compare':
+        baseline = json.loads(Path(arguments.baseline).read_text())
+        results = json.loads(Path(arguments.results).read_text())
+        regressions = compare(baseline, results, arguments.threshold)
+        sys.exit(1 if regressions else 0)
+    else:
+        path = generate_ontologies(arguments.directory, arguments.classes, arguments.depth, arguments.fanout,
+                                   arguments.multi, arguments.imports, arguments.seed)
+        print(path)
+
+
+def generate_ontologies(directory, classes, depth, fanout, multi=0.0, imports=1, seed=0):
+    """Writes a synthetic class hierarchy as a chain of RDF/XML ontologies.
+
+    The classes form a tree which is filled breadth first: each class gets
+    up to fanout children, down to depth levels. Classes which do not fit
+    into this tree are attached to random classes above the last level. A
+    share multi of the classes gets a second parent, a random class
+    declared before it.
+
+    The classes are split evenly into a chain of imports ontologies, each
+    importing the one before it, so the parents of each class are declared
+    in its own or in an imported ontology.
+
+    Args:
+        directory: The directory to write the ontologies to.
+        classes: The number of classes.
+        depth: The maximum number of levels.
+        fanout: The maximum number of children of a class in the tree.
+        multi: The share of classes with a second parent.
+        imports: The number of ontologies.
+        seed: The seed of the random choices.
+
+    Returns:
+        The Path of the last ontology, which (indirectly) imports all
+        others.
+    """
+    rng = random.Random(seed)
+    parents = [[]]
+    levels = [0]
+    inner = [0] if depth > 1 else []
+    tree_parent = 0
+    children = 0
+    for cls in range(1, classes):
+        if children == fanout:
+            tree_parent += 1
+            children = 0
+        if tree_parent < cls and levels[tree_parent] < depth - 1:
+            parent = tree_parent
+            children += 1
+        else:
+            parent = rng.choice(inner) if inner else 0
+        parents.append([parent])
+        levels.append(levels[parent] + 1)
+        if levels[cls] < depth - 1:
+            inner.append(cls)
+        if rng.random() < multi:
+            other = rng.randrange(cls)
+            if other != parent:
+                parents[cls].append(other)
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    imports = max(1, min(imports, classes))
+    owners = [cls * imports // classes for cls in range(classes)]
+    iris = [f'http://example.org/{ontology_name(part)}.owl' for part in range(imports)]
+    for part in range(imports):
+        lines = [RDF_HEADER.format(iri=iris[part])]
+        if part:
+            lines.append(f'        <owl:imports rdf:resource="{iris[part - 1]}"/>\n')
+        lines.append('    </owl:Ontology>\n')
+        for cls in range(classes):
+            if owners[cls] != part:
+                continue
+            lines.append(f'    <owl:Class rdf:about="{iris[part]}#C{cls}">\n')
+            for parent in parents[cls]:
+                lines.append(f'        <rdfs:subClassOf rdf:resource="{iris[owners[parent]]}#C{parent}"/>\n')
+            lines.append('    </owl:Class>\n')
+        lines.append('</rdf:RDF>\n')
+        (directory / f'{ontology_name(part)}.owl').write_text(''.join(lines))
+    return directory / f'{ontology_name(imports - 1)}.owl'
+
+
+def ontology_name(part):
+    """Names the part of a synthetic ontology chain: PartA, PartB, ...,
+    PartBA, ...; letters, as generate_prefix drops digits."""
+    letters = ''
+    while True:
+        letters = chr(ord('A') + part % 26) + letters
+        part //= 26
+        if not part:
+            return 'Part' + letters
+
+
+@contextmanager
+def measure(sample, trace=False):
+    """Measures the wall time of the block in seconds, and with trace its
+    peak memory in bytes, into the dictionary sample."""
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        yield sample
+    finally:
+        sample['seconds'] = time.perf_counter() - start
+        if trace:
+            sample['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+
+def run(scenarios, repeat=5, lookup=()):
+    """Runs the benchmarks of the scenarios.
+
+    Args:
+        scenarios: The names of the scenarios, see SCENARIOS and
+                   REPOSITORY_SCENARIO.
+        repeat: How often each stage is timed.
+        lookup: Additional lookup directories for REPOSITORY_SCENARIO.
+
+    Returns:
+        The results as a JSON serializable dictionary.
+    """
+    import owlready2
+
+    results = {'version': RESULTS_VERSION, 'python': platform.python_version(),
+               'platform': platform.platform(), 'owlready2': getattr(owlready2, 'VERSION', None),
+               'repeat': repeat, 'scenarios': OrderedDict()}
+    grammar = GRAMMAR.read_text() if GRAMMAR.exists() else ''
+    for scenario in scenarios:
+        print(f'benchmark: {scenario}', file=sys.stderr)
+        if scenario == REPOSITORY_SCENARIO:
+            ontologies = [str(REPOSITORY / ontology) for ontology in REPOSITORY_ONTOLOGIES]
+            lookup_paths = [REPOSITORY / 'ontologies', *map(Path, lookup)]
+            try:
+                results['scenarios'][scenario] = benchmark(ontologies, lookup_paths, grammar, repeat)
+            except Exception as error:
+                results['scenarios'][scenario] = {'error': f'{type(error).__name__}: {error}'}
+            continue
+        with tempfile.TemporaryDirectory() as directory:
+            path = generate_ontologies(directory, **SCENARIOS[scenario])
+            result = benchmark([str(path)], [Path(directory)], grammar, repeat)
+        results['scenarios'][scenario] = OrderedDict([('parameters', SCENARIOS[scenario]), *result.items()])
+    return results
+
+
+def benchmark(ontologies, lookup_paths, grammar, repeat=5):
+    """Times each stage of converting the ontologies, and measures its peak
+    memory in an additional run.
+
+    The stages are those of owl2types.convert for each engine: resolving the
+    import graph, loading the ontologies with owlready2 and extracting the
+    classes from its objects or with the sql engine's queries, or streaming
+    them, followed by excluding owl:Thing, building the ClassGraph and its
+    transitive closure, generating types.xml and the ccg features, and
+    inserting them into the grammar.
+
+    Returns:
+        A dictionary of the number of classes and, per stage, the minimum
+        and median seconds and the peak bytes.
+    """
+    samples = OrderedDict()
+
+    def stage(name):
+        sample = {}
+        samples.setdefault(name, []).append(sample)
+        return measure(sample, trace=len(samples[name]) > repeat)
+
+    for _ in range(repeat + 1):
+        token = PREFIX_REGISTRY.set([])
+        try:
+            arguments = [OntologyArgument.argument(ontology) for ontology in ontologies]
+            with stage('resolve'):
+                resolve_imports(arguments, lookup_paths)
+            with isolated_world(lookup_paths) as world:
+                with stage('load'):
+                    loaded, prefix_map = load_ontologies(arguments, world=world)
+                with stage('extract'):
+                    extract_classes(loaded, prefix_map)
+                with stage('extract_sql'):
+                    extract_classes_sql(loaded, prefix_map)
+        finally:
+            PREFIX_REGISTRY.reset(token)
+
+        token = PREFIX_REGISTRY.set([])
+        try:
+            arguments = [OntologyArgument.argument(ontology) for ontology in ontologies]
+            with stage('stream'):
+                classes, loaded, prefix_map = stream_ontologies(arguments, lookup_paths)
+        finally:
+            PREFIX_REGISTRY.reset(token)
+        with stage('exclude_owl_thing'):
+            classes = exclude_owl_thing(classes)
+        with stage('graph'):
+            graph = ClassGraph(classes)
+        with stage('closure'):
+            graph.close()
+        with stage('xml'):
+            classes2xml(graph, loaded, prefix_map)
+        with stage('ccg'):
+            features = classes2ccg(graph, loaded, prefix_map)
+        with stage('splice'):
+            insert_ccg_features(grammar, features)
+
+    stages = OrderedDict()
+    for name, runs in samples.items():
+        seconds = [sample['seconds'] for sample in runs[:-1]]
+        stages[name] = {'min_seconds': min(seconds), 'median_seconds': statistics.median(seconds),
+                        'peak_bytes': runs[-1]['peak_bytes']}
+    return OrderedDict([('classes', len(classes)), ('stages', stages)])
+
+
+def print_results(results):
+    """Prints the results as a table."""
+    print(f'{"scenario":<12} {"stage":<18} {"min ms":>10} {"median ms":>10} {"peak KiB":>10}')
+    for scenario, result in results['scenarios'].items():
+        if 'error' in result:
+            print(f'{scenario:<12} skipped, {result["error"]}')
+            continue
+        for name, stage in result['stages'].items():
+            print(f'{scenario:<12} {name:<18} {stage["min_seconds"] * 1000:>10.2f} '
+                  f'{stage["median_seconds"] * 1000:>10.2f} {stage["peak_bytes"] / 1024:>10.0f}')
+
+
+def compare(baseline, results, threshold=0.25):
+    """Compares the results of two runs and prints the differences.
+
+    A stage regressed if its minimum time or its peak memory grew by more
+    than threshold relative to the baseline, and by more than MIN_SECONDS or
+    MIN_BYTES. Scenarios and stages which are missing in either run are
+    skipped.
+
+    Args:
+        baseline: The results of the baseline, see run.
+        results: The new results.
+        threshold: The relative increase which counts as a regression.
+
+    Returns:
+        A list of (scenario, stage, measure, old, new) tuples of the
+        regressions.
+    """
+    regressions = []
+    print(f'{"scenario":<12} {"stage":<18} {"time":>8} {"memory":>8}')
+    for scenario, result in results['scenarios'].items():
+        old_result = baseline['scenarios'].get(scenario, {})
+        if 'stages' not in result or 'stages' not in old_result:
+            continue
+        for name, stage in result['stages'].items():
+            old = old_result['stages'].get(name)
+            if old is None:
+                continue
+            changes = []
+            for key, minimum in [('min_seconds', MIN_SECONDS), ('peak_bytes', MIN_BYTES)]:
+                change = stage[key] / old[key] - 1 if old[key] else 0.0
+                regressed = change > threshold and stage[key] - old[key] > minimum
+                if regressed:
+                    regressions.append((scenario, name, key, old[key], stage[key]))
+                changes.append(f'{change:+8.0%}{"!" if regressed else " "}')
+            print(f'{scenario:<12} {name:<18} {changes[0]}{changes[1]}')
+    for scenario, name, key, old, new in regressions:
+        print(f'regression: {scenario} {name} {key} {old:.6g} -> {new:.6g}')
+    return regressions
+
+
+if __name__ == '__main__':
+    main()
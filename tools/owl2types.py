@@ -1,21 +1,99 @@
 import argparse
+import hashlib
+import json
+import os
 import re
-import xml.etree.ElementTree as ET
-
-from collections import OrderedDict
+import struct
+import sys
+import threading
+import time
+
+from array import array
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
-from urllib.parse import unquote
-from xml.dom import minidom
-
-
-import owlready2
+from urllib.parse import unquote, urljoin, urlparse
 
 
 CCG_COMMENT = '# FEATURE SECTION AUTO GENERATED FROM ONTOLOGY FILES'
 INDENT = ' ' * 4
 
-
-def owl2types():
+# What find_ccg_features looks for while it searches for the end of the
+# feature section.
+CCG_SECTION_TOKENS = re.compile(re.escape(CCG_COMMENT.encode('utf-8')) + b'|[{}\n]')
+
+# What read_hierarchy looks for in a types.xml and a feature section.
+TYPES_XML_TOKENS = re.compile(rb'<!--.*?-->|<type\b(?P<attributes>[^>]*)>', re.DOTALL)
+TYPES_XML_ATTRIBUTE = re.compile(rb'([\w:.-]+)\s*=\s*"([^"]*)"')
+CCG_FEATURE_TOKENS = re.compile(r'#[^\n]*|[{}\[\]:;]|[^\s{}\[\]:;#]+')
+
+# The attributes of OpenCCG grammar elements which refer to types, and
+# whether they refer to them as nominal:type, see iter_type_references.
+TYPE_REFERENCES = {
+    'entry': [('class', False)],
+    'nom': [('name', True)],
+    'nomvar': [('name', True)],
+    'satop': [('nomvar', True)],
+}
+
+
+# ccg files of at least this size are mapped into memory instead of read.
+MMAP_THRESHOLD = 1 << 24
+
+# The number of concurrent downloads of remote ontologies and the timeout
+# for each connection in seconds, see fetch_remote_ontologies.
+FETCH_THREADS = 8
+FETCH_TIMEOUT = 30
+
+RDF = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#'
+RDFS = 'http://www.w3.org/2000/01/rdf-schema#'
+OWL = 'http://www.w3.org/2002/07/owl#'
+XML_BASE = '{http://www.w3.org/XML/1998/namespace}base'
+
+# Vocabularies owlready2 knows without loading them, they are never fetched.
+WELL_KNOWN_ONTOLOGIES = {RDF.rstrip('#'), RDFS.rstrip('#'), OWL.rstrip('#'),
+                         'http://www.w3.org/2001/XMLSchema'}
+
+# The suffixes of the compressed files which are read and written
+# transparently, see open_source and compressing_writer.
+COMPRESSION_SUFFIXES = ('.gz', '.xz', '.zst')
+
+MANIFEST_VERSION = 1
+PROFILE_VERSION = 1
+DELTA_VERSION = 1
+
+
+# The prefix registry of the conversion running in the current thread, see
+# Converter. If it is not set, the registry of the command line,
+# unique_prefix.prefixes, is used.
+PREFIX_REGISTRY = ContextVar('PREFIX_REGISTRY', default=None)
+
+# The Profiler of the current thread, see Profiler.
+PROFILER = ContextVar('PROFILER', default=None)
+
+# owlready2's lookup path and parts of its state are global, so
+# conversions with owlready2 inside one process take turns, see
+# isolated_world.
+OWLREADY2_LOCK = threading.Lock()
+
+# The options of a grammar in a build file and their command line flags.
+BUILD_OPTIONS = OrderedDict([
+    ('lookup', '--lookup'),
+    ('exclude_owl_thing', '--exclude-owl-thing'),
+    ('cache', '--cache'),
+    ('offline', '--offline'),
+    ('engine', '--engine'),
+    ('jobs', '--jobs'),
+    ('manifest', '--manifest'),
+    ('nobackup', '--nobackup'),
+    ('keep', '--keep'),
+    ('keep_referenced', '--keep-referenced'),
+    ('reduce', '--reduce'),
+])
+
+
+def owl2types(args=None):
     """Converts owl files into OpenCCG grammar types.xml files.
 
     This is the entrypoint for the command line program owl2types.
@@ -44,38 +122,864 @@ def owl2types():
     they are loaded instead of their online parts, you can use the --lookup
     flag to provide additional paths where owlready2 searches for ontologies
     first.
+
+    Parsing large ontologies (like GUM) takes most of the time of a run. With
+    --cache DIR the parsed ontologies are kept in an on-disk quadstore which
+    is reused as long as none of the files in the import closure change.
+    Ontologies which are only available online are downloaded into DIR as
+    well, and only downloaded again if the server has a newer version, see
+    fetch_remote_ontologies. With --offline, they are never downloaded.
+
+    Ontology files may be compressed with gzip, xz or zstd, and an output
+    file ending in .gz, .xz or .zst is written compressed, see open_source
+    and compressing_writer.
+
+    With --format graph, a binary snapshot of the class graph is written,
+    which can be converted instead of the ontologies without loading any of
+    them, see iter_graph_snapshot and GraphSnapshot.
+
+    With --manifest, a manifest of all inputs and options is written next to
+    the output file. If the next run finds a matching manifest, it exits
+    without loading any ontology and leaves the output file untouched.
+
+    With --engine stream, the class hierarchy is read directly from the
+    RDF/XML files instead of loading them with owlready2. With --engine sql,
+    the ontologies are loaded with owlready2, but the hierarchy is read with
+    bulk queries from its quadstore instead of creating a Python object for
+    each class.
+
+    With --watch, owl2types does not exit after the conversion but converts
+    again whenever one of the ontology files changes, see watch.
+
+    With --delta FILE, the added, removed and reparented classes compared to
+    the existing output files are written to FILE, and with --in-place only
+    the changed type elements of a types.xml are rewritten, see convert.
+
+    With --profile FILE, the time and memory of each stage of the conversion
+    are written to FILE, see Profiler.
+
+    With --keep CLASS and --keep-referenced FILE, only the given classes and
+    the types referenced by the grammar files are written, together with
+    their ancestors, see prune_output. With --reduce, parents which are
+    ancestors of other parents of the same class are left out.
+
+    Instead of --output and --format, several --target FORMAT:PATH options
+    write a types.xml and any number of ccg files from a single load:
+
+        owl2types -t xml:types.xml -t ccg:grammar.ccg ontology1.owl
+
+    With the build command, several grammars are built from a build file,
+    see build. With the serve command, owl2types runs a local conversion
+    server, see serve.
+
+    With the query command, owl2types answers questions about the class
+    hierarchy instead, see query. With the check command, it checks the
+    type references of grammar files, see check, and with the lexicon
+    command, it looks up words in an index of a grammar's morph.xml and
+    lexicon.xml, see lexicon. The compact command writes a compact copy of
+    a grammar for deployment, see compact.
     """
+    args = sys.argv[1:] if args is None else args
+    if args[:1] == ['query']:
+        return query(args[1:])
+    if args[:1] == ['check']:
+        return check(args[1:])
+    if args[:1] == ['lexicon']:
+        from owl2types_lexicon import lexicon
+        return lexicon(args[1:])
+    if args[:1] == ['compact']:
+        from owl2types_compact import compact
+        return compact(args[1:])
+    if args[:1] == ['build']:
+        return build(args[1:])
+    if args[:1] == ['serve']:
+        from owl2types_serve import serve
+        return serve(args[1:])
+
     unique_prefix.prefixes = []
-    arguments = parse_args()
+    arguments = parse_args(args)
+    if arguments.profile is None and arguments.cprofile is None:
+        return run_conversion(arguments)
 
-    ontologies, ontology_prefix_map = load_ontologies(arguments.ontologies)
-    classes = extract_classes(ontologies, ontology_prefix_map)
-    if arguments.exclude_owl_thing:
-        classes = exclude_owl_thing(classes)
+    with Profiler(cprofile=arguments.cprofile is not None) as profiler:
+        run_conversion(arguments)
+    report = profiler.report()
+    print('owl2types: converted {} classes in {:.0f} ms ({:.0f} classes/s), hot stage: {}'.format(
+        report['counts'].get('classes', 0), report['wall_seconds'] * 1000, report['classes_per_second'] or 0,
+        report['hot_stage']), file=sys.stderr)
+    if arguments.profile is not None:
+        profiler.write(arguments.profile)
+    if arguments.cprofile is not None and profiler.hot is not None:
+        profiler.dump(arguments.cprofile)
 
-    outfile = Path(arguments.output)
 
-    if arguments.format == 'xml':
-        output = classes2xml(classes, ontologies, ontology_prefix_map)
+def run_conversion(arguments):
+    """Runs the conversion of the command line, see owl2types.
+
+    Args:
+        arguments: The parsed command line arguments.
+    """
+    if arguments.cache is not None:
+        try:
+            with profile_stage('fetch'):
+                fetch_remote_ontologies(arguments)
+        except OSError as error:
+            sys.exit(f'owl2types: {error}')
+
+    manifests = None
+    if arguments.manifest:
+        with profile_stage('manifest'):
+            manifests = build_manifests(arguments)
+        if not arguments.watch and all(manifest_matches(manifests[output], output)
+                                       for _, output in arguments.targets):
+            if arguments.delta is not None:
+                write_delta(arguments.delta, [OrderedDict([('format', output_format), ('output', output),
+                                                           *hierarchy_delta({}, {}).items()])
+                                              for output_format, output in arguments.targets])
+            return
+
+    cache = None
+    if arguments.cache is not None:
+        cache = OntologyCache(arguments.cache, arguments.ontologies)
+
+    try:
+        if arguments.watch:
+            watch(arguments, cache)
+        else:
+            convert(arguments, cache, manifests=manifests)
+    finally:
+        if cache is not None:
+            cache.close()
 
-    elif arguments.format == 'ccg':
-        input_text = ''
 
-        if outfile.exists():
-            input_text = outfile.read_text()
-            if not arguments.nobackup:
-                backup = Path(arguments.output + '.bak')
-                if backup.exists():
-                    raise ValueError('A backup file ({}) already exists, please delete it!'.format(backup.name))
-                backup.write_text(input_text)
+def convert(arguments, cache=None, resident=None, manifests=None, backup=True):
+    """Reads the classes and writes all output files, see owl2types.
 
-        output = classes2ccg(classes, ontologies, ontology_prefix_map)
-        output = insert_ccg_features(input_text, output)
+    The ontologies are loaded and the classes extracted only once, however
+    many targets there are.
 
-    if arguments.output != '-':
-        outfile.write_text(output)
+    Args:
+        arguments: The parsed command line arguments.
+        cache: An optional OntologyCache, see load_ontologies.
+        resident: Optional ResidentFiles to reuse what was read before.
+        manifests: The manifests to write next to the outputs, if any, see
+                   build_manifests.
+        backup: Whether to make a backup of an existing ccg file, unless
+                --nobackup is given.
+
+    If the only ontology is a graph snapshot, the class graph is read from
+    it instead, see GraphSnapshot. With --keep or --keep-referenced, only the
+    kept classes and their ancestors are written, see prune_output. With
+    --reduce, redundant parents are removed, see reduce_classes, and chains
+    of classes with a single child each are reported, see
+    ClassGraph.unary_chains. With --delta, the classes of each existing
+    output are read back and compared to the new ones, see hierarchy_delta.
+    With --in-place, only the changed type elements of an existing types.xml
+    are rewritten, see patch_types_xml.
+    """
+    graph = None
+    from owl2types_snapshot import open_snapshot_argument
+
+    snapshot = open_snapshot_argument(arguments)
+    if snapshot is None:
+        classes, ontologies, ontology_prefix_map = read_classes(arguments, cache, resident)
     else:
-        print(output)
+        with profile_stage('snapshot'):
+            graph = snapshot.graph()
+            ontologies, ontology_prefix_map = snapshot.ontologies, snapshot.ontology_prefix_map
+        exclude = arguments.exclude_owl_thing and 'owl-Thing' in graph
+        if exclude or arguments.keep or arguments.keep_referenced or arguments.reduce:
+            classes = {name: [parent for parent in parents if not exclude or parent != 'owl-Thing']
+                       for name, parents in graph.items() if not exclude or name != 'owl-Thing'}
+            graph = None
+    if arguments.keep or arguments.keep_referenced:
+        with profile_stage('prune'):
+            classes = prune_output(arguments, classes, ontologies, ontology_prefix_map)
+    if arguments.reduce:
+        with profile_stage('reduce'):
+            classes, removed = reduce_classes(classes)
+        profile_count(redundant_edges=removed)
+        print(f'owl2types: removed {removed} redundant parents', file=sys.stderr)
+    if graph is None:
+        with profile_stage('graph'):
+            graph = ClassGraph(classes)
+    profile_count(ontologies=len(ontologies), classes=len(graph), edges=len(graph.parent_ids))
+    if arguments.reduce:
+        for chain in graph.unary_chains(arguments.chain_length):
+            names = chain if len(chain) <= 6 else chain[:3] + ['...'] + chain[-2:]
+            print(f'owl2types: chain of {len(chain)} types, each the only child of the previous one: {" > ".join(names)}',
+                  file=sys.stderr)
+    deltas = []
+    for output_format, output in arguments.targets:
+        previous = None
+        if arguments.delta is not None or arguments.in_place:
+            with profile_stage('delta'):
+                try:
+                    previous = read_hierarchy(output, output_format)
+                except ValueError as error:
+                    print(f'owl2types: cannot read the classes of {output}, {error}', file=sys.stderr)
+                if arguments.delta is not None:
+                    deltas.append(OrderedDict([('format', output_format), ('output', output),
+                                               *hierarchy_delta(previous or {}, graph).items()]))
+        written = None
+        if arguments.in_place and output_format == 'xml' and previous is not None:
+            with profile_stage('xml'):
+                written = patch_types_xml(output, graph)
+        if written is None:
+            write_output(graph, ontologies, ontology_prefix_map, output_format, output,
+                         backup and not arguments.nobackup)
+        if manifests is not None:
+            write_manifest(manifests[output], output)
+    if arguments.delta is not None:
+        write_delta(arguments.delta, deltas)
+
+
+def prune_output(arguments, classes, ontologies, ontology_prefix_map):
+    """Drops the classes which the grammar does not reach, see
+    prune_classes.
+
+    The classes named by --keep and those referenced by the --keep-referenced
+    grammar files are kept (see iter_type_references), together with their
+    ancestors. The number of removed classes and the size of each output
+    format before and after pruning are printed to STDERR.
+
+    Args:
+        arguments: The parsed command line arguments.
+        classes: A class dictionary as given by extract_classes.
+        ontologies: The list of used ontologies.
+        ontology_prefix_map: A prefix map as returned by load_ontologies.
+
+    Returns:
+        The pruned class dictionary.
+    """
+    keep = set(arguments.keep)
+    for name in arguments.keep:
+        if name not in classes:
+            print(f'owl2types: --keep {name} is no class of the ontologies', file=sys.stderr)
+    unknown = set()
+    for grammar in arguments.keep_referenced:
+        try:
+            for _, name in iter_type_references(grammar):
+                keep.add(name)
+                if name not in classes:
+                    unknown.add(name)
+        except (OSError, SyntaxError) as error:
+            sys.exit(f'owl2types: cannot read the type references of {grammar}, {error}')
+
+    pruned = prune_classes(classes, keep)
+    sizes = []
+    for output_format in OrderedDict.fromkeys(output_format for output_format, _ in arguments.targets):
+        before, after = (output_size(c, ontologies, ontology_prefix_map, output_format) for c in (classes, pruned))
+        sizes.append(f', {output_format} {before} -> {after} bytes '
+                     f'(-{100 * (before - after) / before if before else 0:.0f}%)')
+    print(f'owl2types: removed {len(classes) - len(pruned)} of {len(classes)} types{"".join(sizes)}',
+          file=sys.stderr)
+    if unknown:
+        print(f'owl2types: {len(unknown)} referenced types are no classes of the ontologies, see owl2types check',
+              file=sys.stderr)
+    profile_count(pruned=len(classes) - len(pruned))
+    return pruned
+
+
+def output_size(classes, ontologies, ontology_prefix_map, output_format):
+    """Returns the size in bytes of the types.xml, the ccg feature section or
+    the graph snapshot of classes, without writing it."""
+    if output_format == 'xml':
+        return sum(len(chunk.encode('utf-8')) for chunk in iter_types_xml(classes, ontologies, ontology_prefix_map))
+    if output_format == 'graph':
+        from owl2types_snapshot import iter_graph_snapshot
+
+        return sum(len(chunk) for chunk in iter_graph_snapshot(ClassGraph(classes), ontologies, ontology_prefix_map))
+    return len(classes2ccg(classes, ontologies, ontology_prefix_map).encode('utf-8'))
+
+
+def write_output(graph, ontologies, ontology_prefix_map, output_format, output, backup=True):
+    """Writes a types.xml, the feature section of a ccg file or a graph
+    snapshot.
+
+    Files are replaced in one step, and left untouched if their content
+    would not change, see replace_file and write_ccg_features.
+
+    Args:
+        graph: The ClassGraph.
+        ontologies: The list of used ontologies.
+        ontology_prefix_map: A prefix map as returned by load_ontologies.
+        output_format: xml, ccg or graph, see iter_graph_snapshot.
+        output: The output filename, or - for STDOUT.
+        backup: Whether to make a backup of an existing ccg file.
+
+    Returns:
+        Whether the output was written.
+    """
+    if output_format == 'xml':
+        with profile_stage('xml'):
+            chunks = iter_types_xml(graph, ontologies, ontology_prefix_map)
+            if output != '-':
+                return replace_file(output, (chunk.encode('utf-8') for chunk in chunks))
+            sys.stdout.writelines(chunks)
+
+    elif output_format == 'ccg':
+        with profile_stage('ccg'):
+            features = classes2ccg(graph, ontologies, ontology_prefix_map)
+        with profile_stage('splice'):
+            if output != '-':
+                return write_ccg_features(output, features, backup)
+            sys.stdout.write(insert_ccg_features('', features))
+
+    elif output_format == 'graph':
+        from owl2types_snapshot import iter_graph_snapshot
+
+        with profile_stage('snapshot'):
+            return replace_file(output, iter_graph_snapshot(graph, ontologies, ontology_prefix_map))
+
+    sys.stdout.write('\n')
+    return True
+
+
+def watch(arguments, cache=None, rounds=None):
+    """Converts the ontologies and converts them again whenever one of the
+    files of their import closure changes.
+
+    The parsed (stream engine) or loaded (owlready2 and sql engines)
+    ontologies are kept in memory, and after a change only the changed files
+    are read again. Quick successive changes, e.g. of an editor saving
+    a file in several steps, are combined into a single conversion.
+
+    Args:
+        arguments: The parsed command line arguments.
+        cache: An optional OntologyCache, see load_ontologies.
+        rounds: The number of conversions after changes before returning,
+                by default watch runs until it is interrupted.
+    """
+    resident = ResidentFiles()
+
+    def local_sources(previous=frozenset()):
+        try:
+            return set(source for source in import_closure(arguments.ontologies, arguments.lookup)
+                       if isinstance(source, Path))
+        except (OSError, SyntaxError):
+            return previous
+
+    prefixes = list(unique_prefix.prefixes)
+
+    def regenerate(backup):
+        start = time.perf_counter()
+        unique_prefix.prefixes = list(prefixes)
+        try:
+            manifests = build_manifests(arguments) if arguments.manifest else None
+            convert(arguments, cache, resident, manifests, backup)
+        except Exception as error:
+            print(f'owl2types: {error}', file=sys.stderr)
+        else:
+            outputs = ', '.join(output for _, output in arguments.targets)
+            print(f'owl2types: wrote {outputs} in {(time.perf_counter() - start) * 1000:.0f} ms', file=sys.stderr)
+
+    if arguments.engine != 'stream':
+        extend_lookup_paths(arguments.lookup)
+    sources = local_sources()
+    watcher = Watcher(set(source.parent for source in sources) | set(Path(path).absolute() for path in arguments.lookup))
+    try:
+        regenerate(backup=True)
+        while rounds is None or rounds > 0:
+            if not sources & watcher.wait():
+                continue
+            regenerate(backup=False)
+            sources = local_sources(sources)
+            watcher.add(set(source.parent for source in sources))
+            if rounds is not None:
+                rounds -= 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+
+def read_classes(arguments, cache=None, resident=None, isolated=False):
+    """Loads the ontologies with the selected engine and extracts the classes.
+
+    The stream and sql engines fall back to owlready2's object model for
+    input they cannot handle.
+
+    Args:
+        arguments: The parsed command line arguments, see
+                   add_ontology_arguments.
+        cache: An optional OntologyCache, see load_ontologies.
+        resident: Optional ResidentFiles, see load_ontologies and
+                  stream_ontologies.
+        isolated: Whether owlready2 loads into a world of its own which is
+                  closed afterwards, see isolated_world, instead of into
+                  its default world. The cache is closed as well.
+
+    Returns:
+        A tuple of the classes (see extract_classes), the ontologies and the
+        prefix map (see load_ontologies).
+    """
+    classes = None
+    if arguments.engine == 'stream':
+        registry = prefix_registry()
+        prefixes = list(registry)
+        try:
+            with profile_stage('stream'):
+                classes, ontologies, ontology_prefix_map = stream_ontologies(arguments.ontologies, arguments.lookup,
+                                                                             arguments.jobs, resident)
+        except UnsupportedOntology as error:
+            print(f'owl2types: falling back to owlready2, {error}', file=sys.stderr)
+            registry[:] = prefixes
+    if classes is None and isolated:
+        with isolated_world(arguments.lookup) as world:
+            try:
+                classes, ontologies, ontology_prefix_map = read_owlready2_classes(arguments, cache, world=world)
+                ontologies = [StreamedOntology(onto.name, onto.base_iri) for onto in ontologies]
+            finally:
+                if cache is not None:
+                    cache.close()
+    elif classes is None:
+        extend_lookup_paths(arguments.lookup)
+        classes, ontologies, ontology_prefix_map = read_owlready2_classes(arguments, cache, resident)
+    if arguments.exclude_owl_thing:
+        with profile_stage('exclude_owl_thing'):
+            classes = exclude_owl_thing(classes)
+    return classes, ontologies, ontology_prefix_map
+
+
+def read_owlready2_classes(arguments, cache=None, resident=None, world=None):
+    """Loads the ontologies with owlready2 and extracts the classes, with
+    bulk queries for the sql engine. The arguments and the return value are
+    the same as for read_classes and load_ontologies."""
+    with profile_stage('load'):
+        ontologies, ontology_prefix_map = load_ontologies(arguments.ontologies, cache, resident, world)
+    classes = None
+    if arguments.engine == 'sql':
+        try:
+            with profile_stage('extract_sql'):
+                classes = extract_classes_sql(ontologies, ontology_prefix_map)
+        except UnsupportedOntology as error:
+            print(f'owl2types: falling back to owlready2, {error}', file=sys.stderr)
+    if classes is None:
+        with profile_stage('extract'):
+            classes = extract_classes(ontologies, ontology_prefix_map)
+    return classes, ontologies, ontology_prefix_map
+
+
+@contextmanager
+def isolated_world(lookup_paths):
+    """Provides a new owlready2 World which only searches lookup_paths for
+    imported ontologies.
+
+    The world is closed afterwards, so nothing of it is kept in memory, and
+    owlready2's lookup path is restored. Only one isolated world is used at
+    a time, as owlready2 is not thread-safe.
+
+    Args:
+        lookup_paths: The directories to search for imported ontologies.
+    """
+    import owlready2
+
+    with OWLREADY2_LOCK:
+        onto_path = list(owlready2.onto_path)
+        owlready2.onto_path[:] = [str(path) for path in lookup_paths]
+        world = owlready2.World()
+        try:
+            yield world
+        finally:
+            world.close()
+            owlready2.onto_path[:] = onto_path
+
+
+class Converter:
+    """Converts ontologies from within Python, without the command line.
+
+        converter = Converter(['ontologies/SLM-cooking.owl:slm'],
+                              lookup=['ontologies'], exclude_owl_thing=True)
+        types_xml = converter.render('xml')
+
+    The arguments are the same as for the command line, see owl2types.
+    Each conversion has its own prefix registry, and owlready2 loads into
+    a world of its own which is closed afterwards, so a converter can be
+    used repeatedly and from several threads at once. Conversions with the
+    stream engine run in parallel, those which need owlready2 take turns.
+    Conversions inside the with block of a Profiler are profiled.
+    """
+
+    def __init__(self, ontologies, lookup=(), exclude_owl_thing=False, engine='owlready2', jobs=1, cache=None,
+                 resident=None, offline=False, keep=None, reduce=False):
+        """Stores the arguments for the conversions.
+
+        Args:
+            ontologies: The ontologies and their prefixes, like on the
+                        command line, e.g. ['path/to/ontology.owl:prefix'].
+            lookup: Additional directories to search for ontology files.
+            exclude_owl_thing: Exclude owl:Thing as the top level element.
+            engine: owlready2, sql or stream, see read_classes.
+            jobs: The number of processes for the stream engine.
+            cache: An optional directory for an OntologyCache.
+            resident: Optional ResidentFiles to keep the files parsed by
+                      the stream engine between conversions. They must not
+                      be shared between threads.
+            offline: Never download ontologies, see
+                     fetch_remote_ontologies.
+            keep: Only convert these classes and their ancestors, see
+                  prune_classes. By default, all classes are converted.
+            reduce: Leave out redundant parents, see reduce_classes.
+        """
+        if engine not in ('owlready2', 'sql', 'stream'):
+            raise ValueError(f'unknown engine {engine}')
+        if jobs < 1:
+            raise ValueError('at least one job is needed')
+        if offline and cache is None:
+            raise ValueError('offline needs a cache directory')
+        self.ontologies = list(ontologies)
+        self.lookup = [str(path) for path in lookup]
+        self.exclude_owl_thing = exclude_owl_thing
+        self.engine = engine
+        self.jobs = jobs
+        self.cache = cache
+        self.resident = resident
+        self.offline = offline
+        self.keep = None if keep is None else sorted(set(keep))
+        self.reduce = reduce
+
+    def digest(self, *extra):
+        """Computes a hash over the options and the contents of all files
+        of the import closure. Conversions with the same digest have the
+        same result.
+
+        Args:
+            extra: Further strings which should be part of the hash.
+        """
+        token = PREFIX_REGISTRY.set([])
+        try:
+            sources = import_closure([OntologyArgument.argument(o) for o in self.ontologies], self.lookup)
+        finally:
+            PREFIX_REGISTRY.reset(token)
+        return hash_sources(sources, *self.ontologies, *map(str, sources),
+                            str(self.exclude_owl_thing), self.engine, json.dumps(self.keep),
+                            str(self.reduce), *extra)
+
+    def read(self):
+        """Runs a conversion up to the class graph.
+
+        Returns:
+            A tuple of the ClassGraph, the ontologies and the prefix map
+            (see load_ontologies).
+        """
+        token = PREFIX_REGISTRY.set([])
+        try:
+            arguments = argparse.Namespace(ontologies=[OntologyArgument.argument(o) for o in self.ontologies],
+                                           lookup=self.lookup, exclude_owl_thing=self.exclude_owl_thing,
+                                           engine=self.engine, jobs=self.jobs, cache=self.cache,
+                                           offline=self.offline)
+            cache = None
+            if self.cache is not None:
+                with profile_stage('fetch'):
+                    fetch_remote_ontologies(arguments)
+                cache = OntologyCache(self.cache, arguments.ontologies)
+            classes, ontologies, ontology_prefix_map = read_classes(arguments, cache, self.resident, isolated=True)
+        finally:
+            PREFIX_REGISTRY.reset(token)
+        if self.keep is not None:
+            with profile_stage('prune'):
+                classes = prune_classes(classes, self.keep)
+        if self.reduce:
+            with profile_stage('reduce'):
+                classes = reduce_classes(classes)[0]
+        with profile_stage('graph'):
+            graph = ClassGraph(classes)
+        profile_count(ontologies=len(ontologies), classes=len(graph), edges=len(graph.parent_ids))
+        return graph, ontologies, ontology_prefix_map
+
+    def graph(self):
+        """Returns the ClassGraph of the ontologies."""
+        return self.read()[0]
+
+    def render(self, output_format='xml', ccg=''):
+        """Converts the ontologies.
+
+        Args:
+            output_format: xml or ccg.
+            ccg: The ccg file to insert the features into, see
+                 insert_ccg_features.
+
+        Returns:
+            The types.xml or the ccg file as a string.
+        """
+        if output_format not in ('xml', 'ccg'):
+            raise ValueError(f'unknown format {output_format}')
+        graph, ontologies, ontology_prefix_map = self.read()
+        if output_format == 'xml':
+            with profile_stage('xml'):
+                return ''.join(iter_types_xml(graph, ontologies, ontology_prefix_map))
+        with profile_stage('ccg'):
+            features = classes2ccg(graph, ontologies, ontology_prefix_map)
+        with profile_stage('splice'):
+            return insert_ccg_features(ccg, features)
+
+
+def query(args=None):
+    """Answers questions about the class hierarchy of the ontologies.
+
+    This is the query command of owl2types:
+
+        owl2types query --ancestors slm-Cup ontologies/SLM-cooking.owl:slm
+
+    The ontologies are loaded like for a conversion, the classes are
+    referred to by their prefixed names. Each question prints one line: the
+    matching classes separated by spaces, or true or false for --is-subtype.
+    If any --is-subtype question is answered with false, the exit status is 1.
+    """
+    unique_prefix.prefixes = []
+    arguments = parse_query_args(args)
+    graph = load_graph(arguments)
+
+    for name in [name for question, names in arguments.questions for name in names]:
+        if name not in graph.ids:
+            sys.exit(f'owl2types: unknown class {name}')
+
+    answers = []
+    for question, names in arguments.questions:
+        if question == 'is_subtype':
+            answers.append(graph.is_subtype(*names))
+            print('true' if answers[-1] else 'false')
+        else:
+            print(' '.join(getattr(graph, question)(*names)))
+    if not all(answers):
+        sys.exit(1)
+
+
+def load_graph(arguments):
+    """Loads the ontologies of the query and check commands into a
+    ClassGraph.
+
+    Args:
+        arguments: The parsed command line arguments, see
+                   add_ontology_arguments.
+    """
+    from owl2types_snapshot import open_snapshot_argument
+
+    snapshot = open_snapshot_argument(arguments)
+    if snapshot is not None:
+        return snapshot.graph()
+    if arguments.cache is not None:
+        try:
+            fetch_remote_ontologies(arguments)
+        except OSError as error:
+            sys.exit(f'owl2types: {error}')
+
+    cache = None
+    if arguments.cache is not None:
+        cache = OntologyCache(arguments.cache, arguments.ontologies)
+    try:
+        return ClassGraph(read_classes(arguments, cache)[0])
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+def check(args=None):
+    """Checks the type references of grammar files against the class
+    hierarchy of the ontologies.
+
+    This is the check command of owl2types:
+
+        owl2types check --grammar english-cooking/lexicon.xml \\
+                        --grammar english-cooking/morph.xml \\
+                        ontologies/SLM-cooking.owl:slm
+
+    The ontologies are loaded like for a conversion. Each type reference
+    which is no class of the ontologies is printed as file:line with the
+    problem: unknown types, or, if they are classes of the --previous
+    output, types which were removed from the ontologies since. The exit
+    status is 1 if there is any problem.
+    """
+    unique_prefix.prefixes = []
+    arguments = parse_check_args(args)
+    graph = load_graph(arguments)
+    previous = set()
+    if arguments.previous is not None:
+        output_format, output = arguments.previous
+        try:
+            previous = set(read_hierarchy(output, output_format) or ())
+        except ValueError as error:
+            sys.exit(f'owl2types: cannot read the classes of {output}, {error}')
+
+    # Classes by their lowercase names without prefix, for suggestions.
+    local_names = {}
+    for name in graph.names[:len(graph)]:
+        local_names.setdefault(name.partition('-')[2].lower(), name)
+
+    references = problems = 0
+    for grammar in arguments.grammars:
+        try:
+            for line, name in iter_type_references(grammar):
+                references += 1
+                if name in graph.ids:
+                    continue
+                problems += 1
+                if name in previous:
+                    problem = f'type {name} was removed from the ontologies'
+                else:
+                    problem = f'unknown type {name}'
+                suggestion = local_names.get(name.partition('-')[2].lower())
+                if suggestion is not None:
+                    problem += f', did you mean {suggestion}?'
+                print(f'{grammar}:{line}: {problem}')
+        except (OSError, SyntaxError) as error:
+            sys.exit(f'owl2types: cannot check {grammar}, {error}')
+    print(f'owl2types: checked {references} type references in {len(arguments.grammars)} files, '
+          f'{problems} problems', file=sys.stderr)
+    if problems:
+        sys.exit(1)
+
+
+def iter_type_references(path):
+    """Streams the type references of an OpenCCG grammar file.
+
+    The file is parsed in blocks with expat, which also provides the line
+    numbers, and the references of each block are yielded before the next
+    one is read. The referencing attributes are listed in TYPE_REFERENCES.
+
+    Args:
+        path: The grammar file, e.g. lexicon.xml or morph.xml.
+
+    Yields:
+        Tuples of the line number and the type name of each reference.
+
+    Raises:
+        SyntaxError: If the file is not well-formed XML.
+    """
+    from xml.parsers import expat
+
+    references = []
+    parser = expat.ParserCreate()
+
+    def start_element(tag, attributes):
+        for attribute, nominal in TYPE_REFERENCES.get(tag, ()):
+            value = attributes.get(attribute)
+            if value and nominal:
+                value = value.partition(':')[2]
+            if value:
+                references.append((parser.CurrentLineNumber, value))
+
+    parser.StartElementHandler = start_element
+    with open(path, 'rb') as f:
+        try:
+            for block in iter(lambda: f.read(1 << 16), b''):
+                parser.Parse(block, False)
+                yield from references
+                references.clear()
+            parser.Parse(b'', True)
+        except expat.ExpatError as error:
+            raise SyntaxError(f'{path}: {error}') from None
+    yield from references
+
+
+def build(args=None):
+    """Builds all grammars of a build file.
+
+    This is the build command of owl2types:
+
+        owl2types build grammars.json
+
+    The build file is a JSON object with a list of grammars. Each grammar
+    names its ontologies and targets, and may set the options lookup,
+    exclude_owl_thing, cache, engine, jobs, manifest, nobackup, keep,
+    keep_referenced and reduce, which work like their command line counterparts.
+    Relative paths are relative to the build file:
+
+        {"grammars": [{"ontologies": ["ontologies/SLM-cooking.owl:slm"],
+                       "lookup": ["ontologies"],
+                       "exclude_owl_thing": true,
+                       "targets": ["ccg:grammar/cooking.ccg",
+                                   "xml:grammar/types.xml"]}]}
+
+    Grammars which only differ in their targets are converted together, so
+    each distinct set of ontologies is loaded once. The remaining grammars
+    are independent of each other and are built concurrently, each in its
+    own process, as owlready2 keeps a single world per process.
+    """
+    arguments = parse_build_args(args)
+    directory = Path(arguments.buildfile).absolute().parent
+    try:
+        groups = read_buildfile(arguments.buildfile)
+    except (OSError, ValueError) as error:
+        sys.exit(f'owl2types: {arguments.buildfile}: {error}')
+
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        outputs = []
+        for group in groups:
+            unique_prefix.prefixes = []
+            outputs.extend(output for _, output in parse_args(group).targets)
+    finally:
+        os.chdir(cwd)
+    duplicates = sorted(set(output for output in outputs if outputs.count(output) > 1))
+    if duplicates:
+        sys.exit(f'owl2types: {arguments.buildfile}: {", ".join(duplicates)} written by several grammars')
+
+    jobs = min(len(groups), arguments.jobs or os.cpu_count() or 1)
+    if jobs <= 1:
+        for group in groups:
+            build_grammar(directory, group)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    failed = False
+    with ProcessPoolExecutor(jobs) as pool:
+        futures = [pool.submit(build_grammar, directory, group) for group in groups]
+        for index, future in enumerate(futures):
+            try:
+                future.result()
+            except (Exception, SystemExit) as error:
+                failed = True
+                print(f'owl2types: grammar {index + 1}: {error}', file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+def read_buildfile(buildfile):
+    """Reads a build file and turns its grammars into command line arguments.
+
+    Grammars with the same arguments apart from their targets are merged.
+
+    Args:
+        buildfile: The path to the build file, see build.
+
+    Returns:
+        A list of argument lists for owl2types, one for each distinct set of
+        ontologies and options.
+    """
+    with open(buildfile, encoding='utf-8') as f:
+        grammars = json.load(f)['grammars']
+
+    groups = OrderedDict()
+    for grammar in grammars:
+        unknown = set(grammar) - set(BUILD_OPTIONS) - {'ontologies', 'targets'}
+        if unknown:
+            raise ValueError(f'unknown grammar options {", ".join(sorted(unknown))}')
+        args = []
+        for option, flag in BUILD_OPTIONS.items():
+            value = grammar.get(option)
+            if value is True:
+                args.append(flag)
+            elif isinstance(value, list):
+                args.extend(arg for item in value for arg in (flag, str(item)))
+            elif value not in (None, False):
+                args.extend([flag, str(value)])
+        args.extend(grammar['ontologies'])
+        targets = groups.setdefault(tuple(args), [])
+        targets.extend(arg for target in grammar['targets'] for arg in ('--target', target))
+    return [targets + list(args) for args, targets in groups.items()]
+
+
+def build_grammar(directory, args):
+    """Runs owl2types with args inside directory, see build."""
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        owl2types(args)
+    finally:
+        os.chdir(cwd)
 
 
 class OntologyArgument:
@@ -88,8 +992,10 @@ class OntologyArgument:
         starts with http, it is assumed to be a web URL."""
         if filename.startswith('http'):
             self.uri = unquote(filename)
+            self.path = None
         else:
-            self.uri = unquote(Path(filename).absolute().as_uri())
+            self.path = Path(filename).absolute()
+            self.uri = unquote(self.path.as_uri())
             # Windows file URLs should only have two slashes for owlready2
             if self.uri[9] == ':':
                 self.uri = self.uri.replace('///', '//')
@@ -97,7 +1003,7 @@ class OntologyArgument:
         if prefix is not None:
             self.prefix = unique_prefix(prefix)
         else:
-            self.prefix = generate_prefix(self.uri)
+            self.prefix = generate_prefix(uncompressed_name(self.uri))
 
     def __str__(self):
         return f'Ontology: {self.prefix} -- {self.uri}'
@@ -133,12 +1039,21 @@ class OntologyArgument:
         Returns:
             An OntologyArgument.
         """
-        if argument.startswith('http') and argument.count(':') == 1:
-            return OntologyArgument(argument)
-        return OntologyArgument(*argument.rsplit(':', 1))
+        return OntologyArgument(*split_ontology_argument(argument))
 
 
-def load_ontologies(ontology_arguments):
+def split_ontology_argument(argument):
+    """Splits an ontology argument into the path or URL and the prefix,
+    which is None if there is none, see OntologyArgument.argument."""
+    if argument.startswith('http') and argument.count(':') == 1:
+        return argument, None
+    filename, _, prefix = argument.rpartition(':')
+    if not filename:
+        return prefix, None
+    return filename, prefix
+
+
+def load_ontologies(ontology_arguments, cache=None, resident=None, world=None):
     """Loads the ontologies provided as a list of OntologyArgument.
 
     Also loads all indirectly imported ontologies. Each ontology is prefixed
@@ -147,21 +1062,153 @@ def load_ontologies(ontology_arguments):
 
     Args:
         ontology_arguments: A list of OntologyArguments.
+        cache: An optional OntologyCache. If it is given, the ontologies are
+               loaded into (or, if nothing changed, read from) its on-disk
+               world instead of owlready2's default world.
+        resident: Optional ResidentFiles. If the ontologies were loaded
+                  before, only the ontologies whose files changed since are
+                  reloaded.
+        world: The owlready2 World to load the ontologies into if no cache
+               is given, by default owlready2's default world.
 
     Returns:
         A tuple, the first value is a list of loaded ontologies (owlready2
         objects), the second value is the map of ontology names to the
         prefix.
     """
+    import owlready2
+
+    if resident is not None and resident.ontologies is not None:
+        stale = resident.stale('owlready2', paths=True)
+        for path, onto in stale:
+            load_ontology_file(onto, path)
+        stale = [onto for _, onto in stale]
+        if stale:
+            # Entities are created in the namespace they are first accessed
+            # through; forget the classes so that they are created like in
+            # a fresh world.
+            world = stale[0].world
+            for cls in list(world.classes()):
+                world.forget_reference(cls)
+        ontologies, ontology_prefix_map = collect_ontologies(ontology_arguments, resident.ontologies)
+        remember_ontologies(resident, ontology_arguments, ontologies)
+        return ontologies, ontology_prefix_map
+
+    if cache is not None:
+        world = cache.open()
+    elif world is None:
+        world = owlready2.default_world
+
+    compressed = (cache is None or not cache.warm) and load_compressed_ontologies(ontology_arguments, world)
+    loaded_ontologies = []
+    for ontology in ontology_arguments:
+        if cache is not None and cache.warm:
+            onto = cache.get_ontology(ontology)
+        elif compressed:
+            onto = world.get_ontology(ontology.uri)
+        else:
+            onto = world.get_ontology(ontology.uri).load(reload=True)
+        loaded_ontologies.append(onto)
+
+    if cache is not None and not cache.warm:
+        cache.store(zip(ontology_arguments, loaded_ontologies))
+
+    ontologies, ontology_prefix_map = collect_ontologies(ontology_arguments, loaded_ontologies)
+    if resident is not None:
+        resident.ontologies = loaded_ontologies
+        remember_ontologies(resident, ontology_arguments, ontologies)
+    return ontologies, ontology_prefix_map
+
+
+def load_compressed_ontologies(ontology_arguments, world):
+    """Loads the import closure of the ontologies with owlready2 if it
+    contains compressed files.
+
+    owlready2 only reads uncompressed files, so each file is read through
+    open_source instead. The files are loaded in the order owlready2 would
+    load them, as the prefixes of the classes depend on it: each ontology
+    before its imports, which owlready2 is kept from loading itself.
+
+    Args:
+        ontology_arguments: A list of OntologyArguments.
+        world: The owlready2 World to load the ontologies into.
+
+    Returns:
+        Whether the ontologies were loaded, otherwise the import closure
+        has no compressed files.
+    """
+    import owlready2
+
+    sources = resolve_imports(ontology_arguments, owlready2.onto_path)
+    if not any(isinstance(source, Path) and str(source).endswith(COMPRESSION_SUFFIXES) for source in sources):
+        return False
+    ontologies = {source: world.get_ontology(iri) for source, (iri, _) in sources.items()}
+    for onto in ontologies.values():
+        onto.loaded = True
+
+    loaded = set()
+    pending = [(ontology.path or locate_ontology(ontology.uri, owlready2.onto_path) or ontology.uri.rstrip('#/'), True)
+               for ontology in reversed(ontology_arguments)]
+    while pending:
+        source, reload = pending.pop()
+        if source in loaded and not reload:
+            continue
+        loaded.add(source)
+        if isinstance(source, Path):
+            load_ontology_file(ontologies[source], source)
+        else:
+            ontologies[source].load(reload=True)
+        pending.extend((imported, False) for imported in reversed(sources[source][1]))
+    return True
+
+
+def load_ontology_file(onto, path):
+    """(Re)loads an owlready2 ontology from its local file, which may be
+    compressed, see open_source."""
+    if str(path).endswith(COMPRESSION_SUFFIXES):
+        return onto.load(fileobj=open_source(path), reload=True)
+    return onto.load(reload=True)
+
+
+def remember_ontologies(resident, ontology_arguments, ontologies):
+    """Stores the loaded ontologies by their local files in resident.
+
+    Ontologies which are only available online are not stored.
+
+    Args:
+        resident: ResidentFiles.
+        ontology_arguments: A list of OntologyArguments.
+        ontologies: The ontologies, as returned by collect_ontologies.
+    """
+    import owlready2
+
+    for index, onto in enumerate(ontologies):
+        if index < len(ontology_arguments):
+            path = ontology_arguments[index].path
+        else:
+            path = locate_ontology(onto.base_iri, owlready2.onto_path)
+        if path is not None and (path, 'owlready2') not in resident.entries:
+            resident.put(path, onto, 'owlready2')
+
+
+def collect_ontologies(ontology_arguments, loaded_ontologies):
+    """Adds all indirectly imported ontologies and assigns the prefixes.
+
+    Args:
+        ontology_arguments: A list of OntologyArguments.
+        loaded_ontologies: The ontologies loaded for the OntologyArguments.
+
+    Returns:
+        The same tuple as load_ontologies.
+    """
     ontology_prefix_map = {'owl': 'owl'}
     ontologies = []
-    for ontology in ontology_arguments:
-        onto = owlready2.get_ontology(ontology.uri).load(reload=True)
+    for ontology, onto in zip(ontology_arguments, loaded_ontologies):
         ontologies.append(onto)
         ontology_prefix_map[onto.ontology.name] = ontology.prefix
 
-    for ontology in ontologies:
-        for imported_ontology in ontology.indirectly_imported_ontologies():
+    with profile_stage('imports'):
+        for imported_ontology in imported_ontologies(loaded_ontologies):
             onto_name = imported_ontology.ontology.name
             if onto_name not in ontology_prefix_map:
                 ontologies.append(imported_ontology)
@@ -169,27 +1216,1316 @@ def load_ontologies(ontology_arguments):
     return ontologies, ontology_prefix_map
 
 
-def classname(cls, ontology_prefix_map):
-    """Returns the prefixed classname as it is needed in OpenCCG.
+def imported_ontologies(ontologies):
+    """Yields the ontologies and all their (indirect) imports.
+
+    The order is the same as calling indirectly_imported_ontologies on each
+    ontology in turn, but each ontology of the import graph is visited only
+    once, instead of once per ontology importing it.
+
+    Args:
+        ontologies: A list of owlready2 ontologies or StreamedOntologies.
+    """
+    visited = set()
+    for ontology in ontologies:
+        pending = [ontology]
+        while pending:
+            current = pending.pop()
+            if current in visited:
+                continue
+            visited.add(current)
+            yield current
+            pending.extend(reversed(list(current.imported_ontologies)))
+
+
+def uncompressed_name(name):
+    """Returns a filename or IRI without its compression suffix, if any, see
+    COMPRESSION_SUFFIXES."""
+    for suffix in COMPRESSION_SUFFIXES:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def open_source(path):
+    """Opens a local file for reading in binary mode.
+
+    Files ending in .gz, .xz or .zst are decompressed on the fly while they
+    are read, so they are never decompressed as a whole.
+
+    Args:
+        path: The filename.
+
+    Returns:
+        A binary file object.
+    """
+    path = str(path)
+    if path.endswith('.gz'):
+        import gzip
+        return gzip.open(path, 'rb')
+    if path.endswith('.xz'):
+        import lzma
+        return lzma.open(path, 'rb')
+    if path.endswith('.zst'):
+        return open_zstd(path, 'rb')
+    return open(path, 'rb')
+
+
+def open_zstd(file, mode):
+    """Opens a zstd compressed file, like gzip.open.
+
+    The zstd module of Python 3.14 is used if it exists, otherwise the
+    zstandard package.
+
+    Args:
+        file: A filename or a binary file object.
+        mode: rb or wb.
+
+    Raises:
+        OSError: If neither is available.
+    """
+    try:
+        from compression import zstd
+    except ImportError:
+        try:
+            import zstandard
+        except ImportError:
+            raise OSError(f'{file}: zstd files need Python 3.14 or the zstandard package') from None
+        return zstandard.open(file, mode)
+    return zstd.ZstdFile(file, mode[0])
+
+
+def scan_ontology(source):
+    """Reads the ontology IRI and the owl:imports of an RDF/XML file.
+
+    Only the owl:Ontology header is parsed, the file is not read any further.
+
+    Args:
+        source: A filename or file object.
+
+    Returns:
+        A tuple of the ontology IRI (or None if the file has no owl:Ontology
+        element) and the list of imported IRIs.
+    """
+    import xml.etree.ElementTree as ET
+
+    base = ''
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            base = elem.get(XML_BASE, base)
+        elif elem.tag == f'{{{OWL}}}Ontology':
+            iri = urljoin(base, elem.get(f'{{{RDF}}}about', ''))
+            imports = [urljoin(base, child.get(f'{{{RDF}}}resource', ''))
+                       for child in elem if child.tag == f'{{{OWL}}}imports']
+            return iri, imports
+    return None, []
+
+
+def locate_ontology(iri, lookup_paths):
+    """Finds the local file owlready2 would load for an ontology IRI.
+
+    This mirrors the lookup of owlready2: file IRIs are used as they are,
+    otherwise each lookup path is searched for the last part of the IRI,
+    optionally with one of owlready2's known extensions. Unlike owlready2,
+    compressed files (see COMPRESSION_SUFFIXES) are found as well, after the
+    uncompressed ones.
+
+    Args:
+        iri: The ontology IRI.
+        lookup_paths: The directories to search, usually owlready2.onto_path.
+
+    Returns:
+        A Path or None, if the ontology can only be found online.
+    """
+    iri = iri.rstrip('#/')
+    if iri.startswith('file://'):
+        return Path(unquote(urlparse(iri).path))
+    basename = iri.rsplit('/', 1)[-1]
+    name = basename[:-4] if basename.endswith(('.owl', '.rdf')) else basename
+    for directory in lookup_paths:
+        candidates = [basename] + [name + ext for ext in ('', '.nt', '.ntriples', '.rdf', '.owl')]
+        candidates += [candidate + suffix for suffix in COMPRESSION_SUFFIXES for candidate in candidates]
+        for candidate in candidates:
+            path = Path(directory, candidate)
+            if path.is_file():
+                return path.absolute()
+    return None
+
+
+def resolve_imports(ontology_arguments, lookup_paths, remote=None):
+    """Resolves the import graph of the ontologies.
+
+    Each file is visited once and only its owl:Ontology header is read.
+
+    Args:
+        ontology_arguments: A list of OntologyArguments.
+        lookup_paths: The directories to search for imported ontologies.
+        remote: An optional dictionary of IRIs to local copies of ontologies
+                which are not found in the lookup paths, see
+                fetch_remote_ontologies.
+
+    Returns:
+        An OrderedDict mapping each ontology source to the tuple of the IRI it
+        is loaded with and the list of sources it imports, in the order the
+        sources are first reached. Local files are given as Paths, ontologies
+        which can only be found online as their IRI strings.
+    """
+    import xml.etree.ElementTree as ET
+
+    remote = remote or {}
+
+    def locate(iri):
+        return locate_ontology(iri, lookup_paths) or remote.get(iri) or iri
+
+    graph = OrderedDict()
+    seen = set()
+    pending = [(ontology.path or locate(ontology.uri), ontology.uri.rstrip('#/'))
+               for ontology in ontology_arguments]
+    while pending:
+        source, key = pending.pop(0)
+        if source in seen:
+            continue
+        seen.add(source)
+        graph[source] = (key, [])
+        if isinstance(source, str):
+            continue
+        try:
+            with open_source(source) as f:
+                iri, imports = scan_ontology(f)
+        except ET.ParseError:
+            continue
+        if iri is not None:
+            seen.add(iri.rstrip('#/'))
+        for imported in imports:
+            imported = imported.rstrip('#/')
+            imported_source = locate(imported)
+            graph[source][1].append(imported_source)
+            if imported not in seen:
+                pending.append((imported_source, imported))
+    return graph
+
+
+def import_closure(ontology_arguments, lookup_paths):
+    """Resolves all files which are (indirectly) imported by the ontologies.
+
+    Args:
+        ontology_arguments: A list of OntologyArguments.
+        lookup_paths: The directories to search for imported ontologies.
+
+    Returns:
+        A list of the ontology sources in the order they are first reached,
+        see resolve_imports.
+    """
+    return list(resolve_imports(ontology_arguments, lookup_paths))
+
+
+def hash_sources(sources, *extra):
+    """Computes a content hash over ontology sources.
+
+    Local files contribute their content, online ontologies only their IRI.
+
+    Args:
+        sources: A list as returned by import_closure.
+        extra: Further strings which should be part of the hash.
+
+    Returns:
+        The hexadecimal SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    for value in extra:
+        digest.update(value.encode('utf-8') + b'\0')
+    for source in sources:
+        digest.update(source_digest(source).encode('utf-8') + b'\0')
+    return digest.hexdigest()
+
+
+def source_digest(source):
+    """Returns the SHA-256 digest of a local file, or the IRI of an online
+    ontology, as online ontologies are identified by their IRI only.
+
+    Args:
+        source: A Path or an IRI string, as returned by import_closure.
+    """
+    if isinstance(source, str):
+        return source
+    return hashlib.sha256(source.read_bytes()).hexdigest()
+
+
+class OntologyCache:
+    """A persistent owlready2 world for one set of input ontologies.
+
+    The world is stored as an SQLite quadstore inside the cache directory,
+    next to a small JSON file which records the content hash of the import
+    closure it was built from. As long as the hash matches, the ontologies
+    are read from the quadstore instead of being parsed again. If any file of
+    the import closure changes, the quadstore is rebuilt.
+    """
+
+    def __init__(self, directory, ontology_arguments):
+        """Determines the cache files for the ontology arguments.
+
+        Args:
+            directory: The cache directory. It is created if needed.
+            ontology_arguments: A list of OntologyArguments.
+        """
+        self.directory = Path(directory)
+        self.ontology_arguments = ontology_arguments
+        name = hashlib.sha256('\0'.join(o.uri for o in ontology_arguments).encode('utf-8')).hexdigest()[:16]
+        self.database = self.directory / f'{name}.sqlite3'
+        self.index = self.directory / f'{name}.json'
+        self.key = None
+        self.iris = {}
+        self.warm = False
+        self.world = None
+
+    def open(self):
+        """Opens the cached world, or a new one if the cache is outdated.
+
+        Afterwards, OntologyCache.warm tells whether the ontologies can be
+        taken from the cache.
+
+        Returns:
+            The owlready2 World.
+        """
+        import owlready2
+
+        sources = import_closure(self.ontology_arguments, owlready2.onto_path)
+        self.key = hash_sources(sources, owlready2.VERSION)
+
+        try:
+            index = json.loads(self.index.read_text())
+        except (OSError, ValueError):
+            index = {}
+        self.warm = index.get('key') == self.key and self.database.exists()
+
+        if self.warm:
+            self.iris = index['ontologies']
+        else:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            for stale in (self.index, self.database):
+                if stale.exists():
+                    stale.unlink()
+        self.world = owlready2.World(filename=str(self.database))
+        return self.world
+
+    def get_ontology(self, ontology_argument):
+        """Returns the cached ontology for an OntologyArgument.
+
+        Ontologies loaded from a file are stored under their own IRI, thus
+        the IRI and the name they had when they were first loaded are
+        restored.
+        """
+        iri, name = self.iris[ontology_argument.uri]
+        onto = self.world.get_ontology(iri).load()
+        onto.name = name
+        return onto
+
+    def store(self, loaded_ontologies):
+        """Saves the world and marks the cache as valid.
+
+        Args:
+            loaded_ontologies: Pairs of OntologyArguments and the ontologies
+                               which were loaded for them.
+        """
+        self.world.save()
+        self.iris = {argument.uri: (onto.base_iri, onto.name) for argument, onto in loaded_ontologies}
+        self.index.write_text(json.dumps({'key': self.key, 'ontologies': self.iris}, indent=2))
+
+    def close(self):
+        """Closes the world, so that the cache can be opened again."""
+        if self.world is not None:
+            self.world.close()
+            self.world = None
+
+
+def fetch_remote_ontologies(arguments):
+    """Fetches the online ontologies of the import closure into the
+    RemoteOntologies store inside the --cache directory.
+
+    Afterwards, the store is one of the lookup paths, so that all engines
+    read the local copies instead of downloading the ontologies. Each level
+    of the import graph is fetched concurrently. Ontologies in the lookup
+    paths are never fetched.
+
+    Args:
+        arguments: The parsed command line arguments, see
+                   add_ontology_arguments. Their lookup paths are extended.
+
+    Raises:
+        OSError: If an ontology is not in the store with --offline.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    store = RemoteOntologies(Path(arguments.cache, 'remote'), arguments.offline)
+    fetched = {}
+    try:
+        with ThreadPoolExecutor(FETCH_THREADS) as pool:
+            while True:
+                graph = resolve_imports(arguments.ontologies, arguments.lookup, fetched)
+                missing = [source for source in graph
+                           if isinstance(source, str) and source not in fetched
+                           and source.rstrip('#/') not in WELL_KNOWN_ONTOLOGIES]
+                if not missing:
+                    break
+                fetched.update(zip(missing, pool.map(store.fetch, missing)))
+        store.save()
+    finally:
+        store.close()
+    arguments.lookup = list(arguments.lookup) + [str(store.files)]
+
+
+class RemoteOntologies:
+    """A content-addressed store of ontologies downloaded over HTTP(S).
+
+    The downloaded files are stored under their SHA-256 in objects/. The
+    index maps each IRI to its file and to the ETag and Last-Modified
+    headers it was served with, so that later fetches only ask the server
+    whether there is a newer version. Each fetched ontology is linked into
+    files/ under the last part of its IRI, where owlready2 and
+    locate_ontology find it, as in any other lookup directory.
+
+    Connections are kept open per thread and host and reused.
+    """
+
+    def __init__(self, directory, offline=False):
+        """Opens the store.
+
+        Args:
+            directory: The directory of the store.
+            offline: Whether to use only the stored ontologies and never
+                     connect to a server.
+        """
+        self.directory = Path(directory)
+        self.objects = self.directory / 'objects'
+        self.files = self.directory / 'files'
+        self.index_path = self.directory / 'index.json'
+        self.offline = offline
+        try:
+            self.index = json.loads(self.index_path.read_text())
+        except (OSError, ValueError):
+            self.index = {}
+        self.linked = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.connections = []
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.files.mkdir(exist_ok=True)
+
+    def fetch(self, iri):
+        """Fetches an ontology, unless the stored version is still current.
+
+        If the server cannot be reached, the stored version is used. If
+        there is none, the ontology is left to be downloaded while loading.
+
+        Args:
+            iri: The IRI of the ontology.
+
+        Returns:
+            The Path of the local copy, or None.
+
+        Raises:
+            OSError: If the ontology is not stored and the store is offline.
+        """
+        entry = self.index.get(iri)
+        if entry is not None and not (self.objects / entry['sha256']).exists():
+            entry = None
+        if self.offline:
+            if entry is None:
+                raise FileNotFoundError(f'{iri} is not cached and cannot be fetched with --offline')
+            return self.link(iri, entry['sha256'])
+
+        headers = {'Accept': 'application/rdf+xml, application/xml;q=0.9, */*;q=0.1'}
+        if entry is not None and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry is not None and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        try:
+            status, response_headers, body = self.request(iri.split('#', 1)[0], headers)
+            if status not in (200, 304) or (status == 304 and entry is None):
+                raise OSError(f'HTTP status {status}')
+        except OSError as error:
+            if entry is None:
+                print(f'owl2types: cannot fetch {iri}, {error}', file=sys.stderr)
+                return None
+            print(f'owl2types: cannot fetch {iri}, using the cached copy, {error}', file=sys.stderr)
+            return self.link(iri, entry['sha256'])
+        if status == 304:
+            return self.link(iri, entry['sha256'])
+
+        digest = hashlib.sha256(body).hexdigest()
+        if not (self.objects / digest).exists():
+            replace_file(self.objects / digest, [body], compare=False)
+        with self.lock:
+            self.index[iri] = {'sha256': digest,
+                               'etag': response_headers.get('ETag'),
+                               'last_modified': response_headers.get('Last-Modified')}
+        return self.link(iri, digest)
+
+    def request(self, url, headers, redirects=5):
+        """Sends a GET request over a pooled connection, following
+        redirects.
+
+        Returns:
+            A tuple of the status, the response headers and the body.
+        """
+        import http.client
+        from urllib.parse import urlsplit
+
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise OSError(f'unsupported scheme {parts.scheme}')
+        connections = self.local.__dict__.setdefault('connections', {})
+        connection = connections.get((parts.scheme, parts.netloc))
+        if connection is None:
+            connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+            connection = connection_class(parts.netloc, timeout=FETCH_TIMEOUT)
+            connections[(parts.scheme, parts.netloc)] = connection
+            with self.lock:
+                self.connections.append(connection)
+
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        for attempt in range(2):
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                body = response.read()
+                break
+            except (OSError, http.client.HTTPException) as error:
+                # The server may have closed the idle connection, retry once.
+                connection.close()
+                if attempt:
+                    raise OSError(str(error) or type(error).__name__)
+
+        if response.status in (301, 302, 303, 307, 308) and response.getheader('Location'):
+            if not redirects:
+                raise OSError('too many redirects')
+            return self.request(urljoin(url, response.getheader('Location')), headers, redirects - 1)
+        return response.status, dict(response.getheaders()), body
+
+    def link(self, iri, digest):
+        """Makes a stored ontology available in files/ under the last part
+        of its IRI.
+
+        Returns:
+            The Path of the stored ontology.
+        """
+        import shutil
+
+        name = iri.rstrip('#/').rsplit('/', 1)[-1]
+        with self.lock:
+            other = self.linked.setdefault(name, iri)
+        if other != iri:
+            print(f'owl2types: {iri} and {other} have the same file name, only {other} is read from the cache',
+                  file=sys.stderr)
+        elif name and not self.current(self.files / name, digest):
+            temporary = self.files / f'.{name}.{threading.get_ident()}.tmp'
+            if os.path.lexists(temporary):
+                os.unlink(temporary)
+            try:
+                os.link(self.objects / digest, temporary)
+            except OSError:
+                shutil.copyfile(self.objects / digest, temporary)
+            os.replace(temporary, self.files / name)
+        return self.objects / digest
+
+    def current(self, path, digest):
+        """Whether path is linked to the stored ontology with digest."""
+        try:
+            return os.path.samefile(path, self.objects / digest) or \
+                hashlib.sha256(path.read_bytes()).hexdigest() == digest
+        except OSError:
+            return False
+
+    def save(self):
+        """Writes the index."""
+        replace_file(self.index_path, [json.dumps(self.index, indent=2, sort_keys=True).encode('utf-8')])
+
+    def close(self):
+        """Closes all connections."""
+        for connection in self.connections:
+            connection.close()
+
+
+class ResidentFiles:
+    """Remembers what was read from local files for as long as they do not
+    change.
+
+    This keeps parsed and loaded ontologies in memory between the
+    conversions of --watch. A file is considered changed if its modification
+    time or size changed.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.ontologies = None
+
+    @staticmethod
+    def signature(path):
+        """Returns the modification time and size of a file, or None if it
+        does not exist."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, path, key=None):
+        """Returns the value stored for a file, unless the file changed since."""
+        entry = self.entries.get((path, key))
+        if entry is not None and entry[0] == self.signature(path):
+            return entry[1]
+        return None
+
+    def put(self, path, value, key=None, signature=None):
+        """Stores a value for a file.
+
+        Args:
+            path: The file the value was read from.
+            value: The value.
+            key: An optional additional key, if several values are read from
+                 one file.
+            signature: The signature of the file before it was read, to
+                       not miss changes during the read.
+        """
+        self.entries[(path, key)] = (signature or self.signature(path), value)
+
+    def stale(self, key=None, paths=False):
+        """Returns the values stored with key for all files which changed
+        since, or tuples of the files and the values if paths is set, and
+        marks them as current."""
+        values = []
+        for (path, value_key), (signature, value) in self.entries.items():
+            current = self.signature(path)
+            if value_key == key and current != signature:
+                self.entries[(path, value_key)] = (current, value)
+                values.append((path, value) if paths else value)
+        return values
+
+
+class Profiler:
+    """Records the wall and CPU time and the peak memory of each stage of
+    the conversions, and counts the ontologies, classes and edges they
+    processed.
+
+    Used as a context manager, it profiles all conversions of the current
+    thread inside the with block, those of the command line (see --profile)
+    as well as those of a Converter:
+
+        with Profiler(hooks=[print]) as profiler:
+            Converter(['ontology.owl']).render()
+        report = profiler.report()
+
+    Stages can be nested, e.g. the import closure walk (imports) inside
+    load; the times of a stage include those of its nested stages. The peak
+    memory is measured with tracemalloc, which slows the conversion down.
+    With cprofile, the top level stages are also run with cProfile, and the
+    statistics of the slowest (the hot stage) are kept, see dump.
+    """
+
+    def __init__(self, memory=True, cprofile=False, hooks=()):
+        """Prepares a profile.
+
+        Args:
+            memory: Whether to measure the peak memory of each stage, as
+                    traced by tracemalloc.
+            cprofile: Whether to run the top level stages with cProfile.
+            hooks: Callables which are called with the record of each stage
+                   (see report) when it ends.
+        """
+        self.memory = memory
+        self.cprofile = cprofile
+        self.hooks = list(hooks)
+        self.stages = []
+        self.counts = OrderedDict()
+        self.peak = 0
+        self.active = []
+        self.hot = None
+        self.start = None
+        self.end = None
+        self.tracing = False
+        self.token = None
+
+    def __enter__(self):
+        if self.memory:
+            import tracemalloc
+
+            self.tracing = not tracemalloc.is_tracing()
+            if self.tracing:
+                tracemalloc.start()
+        self.token = PROFILER.set(self)
+        self.start = (time.perf_counter(), time.process_time())
+        self.end = None
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.end = (time.perf_counter(), time.process_time())
+        PROFILER.reset(self.token)
+        if self.memory:
+            import tracemalloc
+
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            if self.tracing:
+                tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name):
+        """Profiles the block as the stage name."""
+        record = OrderedDict([('name', name), ('parent', self.active[-1]['name'] if self.active else None),
+                              ('wall_seconds', 0.0), ('cpu_seconds', 0.0)])
+        if self.memory:
+            import tracemalloc
+
+            record['peak_bytes'] = 0
+            self.reset_peak(tracemalloc)
+            start_bytes = tracemalloc.get_traced_memory()[0]
+        profile = None
+        if self.cprofile and not self.active:
+            import cProfile
+
+            profile = cProfile.Profile()
+        self.stages.append(record)
+        self.active.append(record)
+        wall, cpu = time.perf_counter(), time.process_time()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield record
+        finally:
+            if profile is not None:
+                profile.disable()
+            record['wall_seconds'] = time.perf_counter() - wall
+            record['cpu_seconds'] = time.process_time() - cpu
+            if self.memory:
+                self.reset_peak(tracemalloc)
+                record['peak_increase_bytes'] = record['peak_bytes'] - start_bytes
+            self.active.pop()
+            if profile is not None and (self.hot is None or record['wall_seconds'] > self.hot[0]['wall_seconds']):
+                self.hot = (record, profile)
+            for hook in self.hooks:
+                hook(record)
+
+    def reset_peak(self, tracemalloc):
+        """Adds the peak memory since the last reset to the open stages and
+        resets it, so that the next stage measures its own peak."""
+        peak = tracemalloc.get_traced_memory()[1]
+        self.peak = max(self.peak, peak)
+        for record in self.active:
+            record['peak_bytes'] = max(record['peak_bytes'], peak)
+        tracemalloc.reset_peak()
+
+    def count(self, **counts):
+        """Adds to the counts, e.g. count(classes=10)."""
+        for key, value in counts.items():
+            self.counts[key] = self.counts.get(key, 0) + value
+
+    def report(self):
+        """Returns the profile as a JSON serializable dictionary.
+
+        It contains the total wall and CPU time in seconds, the peak memory
+        in bytes (or None), the counts and the classes converted per second,
+        the name of the hot stage (the slowest top level stage) and a
+        record per stage, in the order the stages started, with the name of the
+        stage and of the stage it is nested in, its times, its peak memory
+        and how far the peak exceeded the memory in use when it started.
+        """
+        end = self.end or (time.perf_counter(), time.process_time())
+        wall, cpu = end[0] - self.start[0], end[1] - self.start[1]
+        classes = self.counts.get('classes')
+        top_level = [record for record in self.stages if record['parent'] is None]
+        return OrderedDict([('version', PROFILE_VERSION),
+                            ('wall_seconds', wall),
+                            ('cpu_seconds', cpu),
+                            ('peak_bytes', self.peak if self.memory else None),
+                            ('counts', dict(self.counts)),
+                            ('classes_per_second', classes / wall if classes and wall else None),
+                            ('hot_stage', max(top_level, key=lambda record: record['wall_seconds'],
+                                              default={'name': None})['name']),
+                            ('stages', [dict(record) for record in self.stages])])
+
+    def write(self, path):
+        """Writes the report as JSON to path."""
+        replace_file(path, [json.dumps(self.report(), indent=2).encode('utf-8'), b'\n'], compare=False)
+
+    def dump(self, path):
+        """Writes the cProfile statistics of the hot stage to path, to be
+        read with pstats or tools like snakeviz.
+
+        Raises:
+            ValueError: If no stage was run with cProfile.
+        """
+        if self.hot is None:
+            raise ValueError('no stage was profiled with cProfile')
+        self.hot[1].dump_stats(path)
+
+
+@contextmanager
+def profile_stage(name):
+    """Profiles the block as the stage name of the current Profiler, if
+    there is one."""
+    profiler = PROFILER.get()
+    if profiler is None:
+        yield None
+    else:
+        with profiler.stage(name) as record:
+            yield record
+
+
+def profile_count(**counts):
+    """Adds to the counts of the current Profiler, if there is one."""
+    profiler = PROFILER.get()
+    if profiler is not None:
+        profiler.count(**counts)
+
+
+class Watcher:
+    """Reports changes to the files in a set of directories.
+
+    On Linux, inotify is used (through ctypes), elsewhere the directories are
+    polled.
+    """
+
+    # inotify's IN_MODIFY, IN_ATTRIB, IN_CLOSE_WRITE, IN_MOVED_TO, IN_CREATE and IN_DELETE
+    EVENTS = 0x2 | 0x4 | 0x8 | 0x80 | 0x100 | 0x200
+
+    def __init__(self, directories, interval=0.2, debounce=0.1, poll=False):
+        """Starts watching the directories.
+
+        Args:
+            directories: The directories to watch (not recursively).
+            interval: The polling interval in seconds.
+            debounce: Changes following each other within this many seconds
+                      are reported together.
+            poll: Poll even if inotify is available.
+        """
+        self.interval = interval
+        self.debounce = debounce
+        self.directories = {}
+        self.fd = None
+        try:
+            if poll:
+                raise OSError('polling requested')
+            import ctypes
+            self.libc = ctypes.CDLL(None, use_errno=True)
+            fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd >= 0:
+                self.fd = fd
+        except (OSError, AttributeError):
+            pass
+        self.snapshot = {}
+        self.add(directories)
+
+    def add(self, directories):
+        """Watches further directories."""
+        for directory in directories:
+            directory = Path(directory)
+            if directory in self.directories.values() or not directory.is_dir():
+                continue
+            if self.fd is not None:
+                wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), self.EVENTS)
+                if wd < 0:
+                    continue
+                self.directories[wd] = directory
+            else:
+                self.directories[len(self.directories)] = directory
+                self.snapshot.update(self.scan([directory]))
+
+    def close(self):
+        """Stops watching."""
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def wait(self, timeout=None):
+        """Waits for changes.
+
+        Args:
+            timeout: The number of seconds to wait at most, by default
+                     forever.
+
+        Returns:
+            The set of changed (including created or deleted) paths, empty
+            if there was no change before the timeout.
+        """
+        changed = self.changes(timeout)
+        while changed:
+            more = self.changes(self.debounce)
+            if not more:
+                break
+            changed |= more
+        return changed
+
+    def changes(self, timeout):
+        """Returns the paths changed until now or, if there are none, the
+        first changes within timeout seconds."""
+        import select
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self.fd is not None:
+                remaining = None if deadline is None else max(0, deadline - time.monotonic())
+                if select.select([self.fd], [], [], remaining)[0]:
+                    return self.read_events()
+                return set()
+
+            snapshot = self.scan(self.directories.values())
+            changed = set(path for path in snapshot.keys() | self.snapshot.keys()
+                          if snapshot.get(path) != self.snapshot.get(path))
+            self.snapshot = snapshot
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+            time.sleep(self.interval if deadline is None else
+                       max(0, min(self.interval, deadline - time.monotonic())))
+
+    def read_events(self):
+        """Reads the pending inotify events."""
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = struct.unpack_from('iIII', data, offset)
+                name = data[offset + 16:offset + 16 + length].rstrip(b'\0')
+                offset += 16 + length
+                if wd in self.directories and name:
+                    changed.add(self.directories[wd] / os.fsdecode(name))
+
+    @staticmethod
+    def scan(directories):
+        """Returns the signatures of all files in the directories."""
+        snapshot = {}
+        for directory in directories:
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_file():
+                    stat = entry.stat()
+                    snapshot[Path(entry.path)] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+
+def classname(cls, ontology_prefix_map):
+    """Returns the prefixed classname as it is needed in OpenCCG.
+
+    Args:
+        cls: The ontology class (e.g. an entry of ontology.classes())
+        ontology_prefix_map: A map as returned by load_ontologies, which maps
+                             ontology names to prefixes.
+
+    Returns:
+        "prefix-ClassName", e.g. for the class "Cup" in the ontology "Semantic
+        Lower Model" with the prefix "slm", the return value would be "slm-Cup".
+    """
+    return f'{ontology_prefix_map[cls.namespace.ontology.name]}-{cls.name}'
+
+
+def extract_classes(ontologies, ontology_prefix_map):
+    """Extracts all classes of a given ontology.
+
+    Each class is prefixed with the proper prefix as given by classname. For
+    each class, the list of immediate parents is created and filled with all
+    immediate parent classes.
+
+    Args:
+        ontologies: A list of ontologies
+        ontology_prefix_map: A prefix map
+
+        Both arguments are returned by load_ontologies.
+
+    Returns:
+        A dictionary of classnames to a list of parent classnames:
+        {
+            'slm-Cup': ['gum-Container', 'gum-Thing']
+        }
+        etc.
+    """
+    import owlready2
+
+    classes = {}
+    parent_classes = (owlready2.entity.ThingClass, )
+    for onto in ontologies:
+        for cls in onto.classes():
+            parents = set(classname(parent, ontology_prefix_map)
+                          for parent in cls.is_a
+                          if isinstance(parent, parent_classes))
+            key = classname(cls, ontology_prefix_map)
+            if key not in classes:
+                classes[key] = parents
+            else:
+                classes[key].union(parents)
+    return classes
+
+
+class UnsupportedOntology(Exception):
+    """Raised by the stream and sql engines for input they cannot read
+    faithfully.
+
+    owl2types then extracts the classes with owlready2's object model.
+    """
+
+
+class StreamedOntology:
+    """Stands in for an owlready2 ontology in the streaming engine.
+
+    It provides the attributes which are used by collect_ontologies and the
+    output functions: name, base_iri, ontology and the imports.
+    """
+
+    def __init__(self, name, base_iri):
+        self.name = name
+        self.base_iri = base_iri
+        self.imported_ontologies = []
+        self.classes = []
+
+    @property
+    def ontology(self):
+        return self
+
+    def indirectly_imported_ontologies(self, already=None):
+        """Yields this ontology and all its (indirect) imports, depth first,
+        in the same order as owlready2 does."""
+        already = already or set()
+        if self not in already:
+            already.add(self)
+            yield self
+            for ontology in self.imported_ontologies:
+                yield from ontology.indirectly_imported_ontologies(already)
+
+
+# The part of an RDF/XML file the streaming engine needs: the IRIs in the
+# order of their first mention, the class declarations, the subclass edges
+# between named classes, and the ontology header.
+ParsedOntology = namedtuple('ParsedOntology', 'ontology_iri imports mentions classes subclasses')
+
+
+def parse_rdfxml(source, default_base):
+    """Streams a single RDF/XML file.
+
+    Only the triples the streaming engine needs are kept, so that the result
+    is small and can be passed between processes.
+
+    Args:
+        source: A binary file object.
+        default_base: The base IRI if the document does not declare one.
+
+    Returns:
+        A ParsedOntology.
+
+    Raises:
+        UnsupportedOntology: If the file cannot be read faithfully.
+    """
+    import xml.etree.ElementTree as ET
+
+    xml_base = default_base
+    ontology_iri = None
+    imports = []
+    mentions = {}
+    classes = []
+    subclasses = []
+    data_subjects = []
+    blank_nodes = 0
+    stack = []
+
+    def resolve(iri):
+        if iri.startswith('#'):
+            return xml_base + iri
+        if iri.startswith('/'):
+            return xml_dir + iri[1:]
+        if not iri:
+            return xml_base
+        if ':' not in iri:
+            return urljoin(xml_dir, iri)
+        return iri
+
+    def triple(subject, predicate, obj):
+        for iri in (subject, obj):
+            if not iri.startswith('_:'):
+                mentions.setdefault(iri)
+        if subject.startswith('_:') or obj.startswith('_:'):
+            return
+        if predicate == f'{RDF}type' and obj == f'{OWL}Class':
+            classes.append(subject)
+        elif predicate == f'{RDFS}subClassOf':
+            subclasses.append((subject, obj))
+
+    try:
+        for event, elem in ET.iterparse(source, events=('start', 'end')):
+            if event == 'start':
+                if not stack:
+                    if elem.tag != f'{{{RDF}}}RDF':
+                        raise UnsupportedOntology(f'{default_base} is not an RDF/XML document')
+                    root = elem
+                    xml_base = elem.get(XML_BASE, xml_base)
+                    xml_dir = xml_base.rsplit('/', 1)[0] + '/'
+                    stack.append(['RDF'])
+                elif stack[-1][0] == 'node':
+                    parse_type = elem.get(f'{{{RDF}}}parseType')
+                    if parse_type not in (None, 'Collection'):
+                        raise UnsupportedOntology(f'rdf:parseType="{parse_type}" in {default_base}')
+                    obj = elem.get(f'{{{RDF}}}resource')
+                    if obj is not None:
+                        obj = resolve(obj).rstrip('/')
+                    elif elem.get(f'{{{RDF}}}nodeID') is not None:
+                        obj = '_:' + elem.get(f'{{{RDF}}}nodeID')
+                    stack.append(['property', elem.tag, parse_type, obj, []])
+                else:
+                    subject = elem.get(f'{{{RDF}}}about')
+                    if subject is None and elem.get(f'{{{RDF}}}ID') is not None:
+                        subject = '#' + elem.get(f'{{{RDF}}}ID')
+                    if subject is not None:
+                        subject = resolve(subject.rstrip('/'))
+                    elif elem.get(f'{{{RDF}}}nodeID') is not None:
+                        subject = '_:' + elem.get(f'{{{RDF}}}nodeID')
+                    else:
+                        blank_nodes += 1
+                        subject = f'_:{blank_nodes}'
+                    if elem.tag != f'{{{RDF}}}Description':
+                        tag = elem.tag[1:].replace('}', '', 1)
+                        triple(subject, f'{RDF}type', tag)
+                        if tag == f'{OWL}Ontology' and ontology_iri is None:
+                            ontology_iri = subject
+                    if stack[-1][0] == 'property':
+                        stack[-1][4].append(subject)
+                    stack.append(['node', subject])
+                continue
+
+            frame = stack.pop()
+            if frame[0] == 'property':
+                _, tag, parse_type, obj, nodes = frame
+                subject = stack[-1][1]
+                predicate = tag[1:].replace('}', '', 1)
+                if parse_type == 'Collection':
+                    for node in nodes:
+                        triple('_:', f'{RDF}first', node)
+                    triple(subject, predicate, '_:')
+                elif obj is not None or nodes:
+                    obj = obj if obj is not None else nodes[-1]
+                    triple(subject, predicate, obj)
+                    if predicate == f'{OWL}imports' and subject == ontology_iri:
+                        imports.append(obj)
+                elif not subject.startswith('_:'):
+                    data_subjects.append(subject)
+            if len(stack) == 1:
+                root.clear()
+    except ET.ParseError as error:
+        raise UnsupportedOntology(f'{default_base} is not an RDF/XML document: {error}')
+
+    for subject in data_subjects:
+        mentions.setdefault(subject)
+    return ParsedOntology(ontology_iri, imports, list(mentions), classes, subclasses)
+
+
+def parse_file(path, default_base):
+    """Streams a local RDF/XML file, which may be compressed, see
+    parse_rdfxml and open_source."""
+    with open_source(path) as source:
+        return parse_rdfxml(source, default_base)
+
+
+class StreamedWorld:
+    """Reads the class hierarchy from RDF/XML files without owlready2.
+
+    The files are streamed with iterparse, only class declarations, named
+    super classes and imports are kept. To produce exactly the same output as
+    the owlready2 engine, the world mimics the relevant owlready2 behavior:
+    IRIs are resolved the same way, ontologies are loaded in the same order,
+    classes are ordered by their first mention (as owlready2 does with its
+    storids), and a class is prefixed with the ontology through which
+    owlready2 would first create it.
+
+    Files can be parsed ahead, e.g. in other processes: parsing maps the
+    (IRI, path) a file is loaded with to a future of its ParsedOntology.
+    The results are merged in load order, so the outcome does not depend on
+    when the files were parsed. With ResidentFiles, parsed files are kept for
+    later worlds and only parsed again after they changed.
+    """
+
+    def __init__(self, lookup_paths, resident=None):
+        self.lookup_paths = lookup_paths
+        self.resident = resident
+        self.ontologies = {}
+        self.order = {}
+        self.declared_by = {}
+        self.parents = {}
+        self.parsing = {}
+
+    def load(self, iri, path=None):
+        """Loads an ontology and, afterwards, its imports.
+
+        Args:
+            iri: The ontology IRI, or the file URI of an OntologyArgument.
+            path: The file to read. If it is not given, the file is looked up
+                  like owlready2 does, or downloaded.
+
+        Returns:
+            The StreamedOntology.
+        """
+        key = iri.rstrip('#/')
+        if key in self.ontologies:
+            if path is not None:
+                raise UnsupportedOntology(f'{iri} is loaded more than once')
+            return self.ontologies[key]
+
+        name = uncompressed_name(key.rsplit('/', 1)[-1])
+        if name.endswith(('.owl', '.rdf')):
+            name = name[:-4]
+        onto = StreamedOntology(name, key + '#')
+        self.ontologies[key] = onto
+
+        if path is None:
+            path = locate_ontology(key, self.lookup_paths)
+        if path is None:
+            try:
+                from urllib.request import urlopen
+                source = urlopen(key)
+            except OSError as error:
+                raise UnsupportedOntology(f'cannot download {key}: {error}')
+            with source:
+                parsed = parse_rdfxml(source, key)
+        else:
+            parsed = None if self.resident is None else self.resident.get(path, key)
+            if parsed is None:
+                signature = ResidentFiles.signature(path)
+                if (key, path) in self.parsing:
+                    parsed = self.parsing.pop((key, path)).result()
+                else:
+                    parsed = parse_file(path, key)
+                if self.resident is not None:
+                    self.resident.put(path, parsed, key, signature)
+        self.merge(onto, parsed)
+
+        ontology_iri = parsed.ontology_iri
+        if ontology_iri:
+            base_iri = self.fix_base_iri(ontology_iri)
+            if base_iri.rstrip('#/') != key:
+                if base_iri.rstrip('#/') in self.ontologies:
+                    raise UnsupportedOntology(f'{base_iri} is loaded more than once')
+                self.ontologies[base_iri.rstrip('#/')] = onto
+            onto.base_iri = base_iri
+
+        onto.imported_ontologies = [self.load(imported) for imported in parsed.imports]
+        return onto
+
+    def merge(self, onto, parsed):
+        """Adds a parsed RDF/XML file to the world.
+
+        Args:
+            onto: The StreamedOntology the file belongs to.
+            parsed: The ParsedOntology of the file.
+        """
+        for iri in parsed.mentions:
+            self.order.setdefault(iri, len(self.order))
+        for iri in parsed.classes:
+            self.declared_by.setdefault(iri, onto)
+            onto.classes.append(iri)
+        for child, parent in parsed.subclasses:
+            self.parents.setdefault(child, {})[parent] = None
+
+    def fix_base_iri(self, iri):
+        """Appends # or / to an ontology IRI, like owlready2 does."""
+        if iri.endswith(('#', '/')):
+            return iri
+        if iri + '/' in self.order:
+            return iri + '/'
+        if any(known.startswith(iri + '#') for known in self.order):
+            return iri + '#'
+        if any(known.startswith(iri + '/') for known in self.order):
+            return iri + '/'
+        return iri + '#'
+
+    def extract_classes(self, ontologies, ontology_prefix_map):
+        """Extracts all classes, in the same way as extract_classes.
+
+        Args:
+            ontologies: The list of StreamedOntologies.
+            ontology_prefix_map: A prefix map, see collect_ontologies.
+
+        Returns:
+            The same dictionary as extract_classes.
+        """
+        def storid(iri):
+            # owlready2 predefines the OWL vocabulary with the lowest storids
+            return not iri.startswith(OWL), self.order[iri]
+
+        declarations = {onto: sorted(set(onto.classes), key=storid) for onto in ontologies}
+        return classes_from_iris(ontologies, ontology_prefix_map, declarations, self.parents, self.declared_by)
+
+
+def classes_from_iris(ontologies, ontology_prefix_map, declarations, parents, declared_by):
+    """Builds the class dictionary of extract_classes from plain IRIs.
+
+    Each class is prefixed with the ontology through which owlready2 would
+    first create it: the first ontology declaring it, which is passed on to
+    all its ancestors which do not exist yet. Classes without named parents
+    (except owl:Thing itself) get owl-Thing as their parent, like in
+    owlready2.
 
     Args:
-        cls: The ontology class (e.g. an entry of ontology.classes())
-        ontology_prefix_map: A map as returned by load_ontologies, which maps
-                             ontology names to prefixes.
+        ontologies: The ontologies, as returned by collect_ontologies.
+        ontology_prefix_map: A prefix map, see collect_ontologies.
+        declarations: Maps each ontology to the IRIs of the classes it
+                      declares, in owlready2's storid order.
+        parents: Maps class IRIs to the IRIs of their named parents.
+        declared_by: Maps class IRIs to the first ontology declaring them.
 
     Returns:
-        "prefix-ClassName", e.g. for the class "Cup" in the ontology "Semantic
-        Lower Model" with the prefix "slm", the return value would be "slm-Cup".
+        The same dictionary as extract_classes.
+
+    Raises:
+        UnsupportedOntology: If RDF or RDFS terms are used as classes.
     """
-    return f'{ontology_prefix_map[cls.namespace.ontology.name]}-{cls.name}'
+    owners = {}
+
+    def owner(iri):
+        if iri not in owners:
+            onto = declared_by[iri]
+            pending = [iri]
+            while pending:
+                current = pending.pop()
+                if current in owners or current.startswith(OWL):
+                    continue
+                if current.startswith((RDF, RDFS)):
+                    raise UnsupportedOntology(f'{current} used as a class')
+                owners[current] = onto
+                pending.extend(parents.get(current, ()))
+        return owners[iri]
+
+    def named_parents(iri):
+        if iri == f'{OWL}Thing':
+            return parents.get(iri, ())
+        return parents.get(iri) or [f'{OWL}Thing']
+
+    def name(iri):
+        if iri.startswith(OWL):
+            return f'owl-{iri[len(OWL):]}'
+        if '#' in iri:
+            local = iri.rsplit('#', 1)[1]
+        elif '/' in iri:
+            local = iri.rsplit('/', 1)[1]
+        else:
+            local = iri.split(':', 1)[-1]
+        return f'{ontology_prefix_map[owner(iri).name]}-{local}'
 
+    classes = {}
+    for onto in ontologies:
+        for iri in declarations[onto]:
+            key = name(iri)
+            if key not in classes:
+                classes[key] = set(name(parent) for parent in named_parents(iri))
+    return classes
 
-def extract_classes(ontologies, ontology_prefix_map):
-    """Extracts all classes of a given ontology.
 
-    Each class is prefixed with the proper prefix as given by classname. For
-    each class, the list of immediate parents is created and filled with all
-    immediate parent classes.
+def extract_classes_sql(ontologies, ontology_prefix_map):
+    """Extracts all classes with bulk queries on owlready2's quadstore.
+
+    Instead of creating a Python object for each class, the class
+    declarations and named super classes of all ontologies are read with
+    two joins. The result is the same as the one of extract_classes for a
+    fresh world.
 
     Args:
         ontologies: A list of ontologies
@@ -198,25 +2534,78 @@ def extract_classes(ontologies, ontology_prefix_map):
         Both arguments are returned by load_ontologies.
 
     Returns:
-        A dictionary of classnames to a list of parent classnames:
-        {
-            'slm-Cup': ['gum-Container', 'gum-Thing']
-        }
-        etc.
+        The same dictionary as extract_classes.
+
+    Raises:
+        UnsupportedOntology: If the hierarchy can not be extracted this way.
     """
-    classes = {}
-    parent_classes = (owlready2.entity.ThingClass, )
-    for onto in ontologies:
-        for cls in onto.classes():
-            parents = set(classname(parent, ontology_prefix_map)
-                          for parent in cls.is_a
-                          if isinstance(parent, parent_classes))
-            key = classname(cls, ontology_prefix_map)
-            if key not in classes:
-                classes[key] = parents
-            else:
-                classes[key].union(parents)
-    return classes
+    import sqlite3
+    from owlready2.base import owl_class, rdf_type, rdfs_subclassof
+
+    graph = ontologies[0].world.graph
+    graph_ontologies = {onto.graph.c: onto for onto in ontologies}
+    declarations = {onto: [] for onto in ontologies}
+    declared_by = {}
+    parents = {}
+    try:
+        rows = graph.execute('SELECT objs.c, resources.iri FROM objs '
+                             'JOIN resources ON resources.storid = objs.s '
+                             'WHERE objs.p = ? AND objs.o = ? AND objs.s > 0 '
+                             'ORDER BY objs.s, objs.c', (rdf_type, owl_class))
+        for c, iri in rows:
+            declared_by.setdefault(iri, graph.c_2_onto.get(c))
+            if c in graph_ontologies:
+                declarations[graph_ontologies[c]].append(iri)
+
+        rows = graph.execute('SELECT child.iri, parent.iri FROM objs '
+                             'JOIN resources AS child ON child.storid = objs.s '
+                             'JOIN resources AS parent ON parent.storid = objs.o '
+                             'WHERE objs.p = ? AND objs.s > 0 AND objs.o > 0', (rdfs_subclassof, ))
+        for child, parent in rows:
+            parents.setdefault(child, {})[parent] = None
+    except sqlite3.Error as error:
+        raise UnsupportedOntology(f'cannot query the quadstore: {error}')
+
+    return classes_from_iris(ontologies, ontology_prefix_map, declarations, parents, declared_by)
+
+
+def stream_ontologies(ontology_arguments, lookup_paths, jobs=1, resident=None):
+    """Loads the ontologies and extracts their classes with the streaming
+    engine.
+
+    Args:
+        ontology_arguments: A list of OntologyArguments.
+        lookup_paths: The directories to search for imported ontologies.
+        jobs: The number of processes to parse the local files of the import
+              graph in. The result is the same for any number of jobs.
+        resident: Optional ResidentFiles to reuse files parsed before.
+
+    Returns:
+        A tuple of the classes (see extract_classes), the ontologies and the
+        prefix map (see load_ontologies).
+
+    Raises:
+        UnsupportedOntology: If the ontologies need to be loaded with
+                             owlready2.
+    """
+    world = StreamedWorld(lookup_paths, resident)
+    if jobs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        graph = resolve_imports(ontology_arguments, lookup_paths)
+        with ProcessPoolExecutor(jobs) as pool:
+            world.parsing = {(key, source): pool.submit(parse_file, source, key)
+                             for source, (key, _) in graph.items()
+                             if isinstance(source, Path) and (resident is None or resident.get(source, key) is None)}
+            try:
+                loaded_ontologies = [world.load(ontology.uri, ontology.path) for ontology in ontology_arguments]
+            finally:
+                for future in world.parsing.values():
+                    future.cancel()
+    else:
+        loaded_ontologies = [world.load(ontology.uri, ontology.path) for ontology in ontology_arguments]
+    ontologies, ontology_prefix_map = collect_ontologies(ontology_arguments, loaded_ontologies)
+    return world.extract_classes(ontologies, ontology_prefix_map), ontologies, ontology_prefix_map
 
 
 def exclude_owl_thing(classes):
@@ -245,12 +2634,277 @@ def exclude_owl_thing(classes):
     return classes
 
 
+def prune_classes(classes, keep):
+    """Removes all classes which are neither kept nor an ancestor of a kept
+    class from a class dictionary as given by extract_classes.
+
+    This is a single walk up the parents from the kept classes, so each
+    class and each parent edge is visited at most once.
+
+    Args:
+        classes: A class dictionary of a classname mapping to a list of parent
+                 classnames.
+        keep: The classnames to keep. Names which are no classes are ignored.
+
+    Returns:
+        A new class dictionary with the reached classes, in the order of
+        classes.
+    """
+    pending = [name for name in set(keep) if name in classes]
+    reached = set(pending)
+    while pending:
+        for parent in classes[pending.pop()]:
+            if parent not in reached and parent in classes:
+                reached.add(parent)
+                pending.append(parent)
+    return {name: parents for name, parents in classes.items() if name in reached}
+
+
+def reduce_classes(classes):
+    """Removes the redundant parents from a class dictionary as given by
+    extract_classes, see ClassGraph.redundant_parents.
+
+    The result is the transitive reduction of the hierarchy: each class has
+    the same ancestors as before, but no parent which is already an ancestor
+    of another of its parents.
+
+    Args:
+        classes: A class dictionary of a classname mapping to a list of parent
+                 classnames.
+
+    Returns:
+        A tuple of the new class dictionary and the number of removed parent
+        edges.
+    """
+    redundant = ClassGraph(classes).redundant_parents()
+    reduced = {name: type(parents)(parent for parent in parents if parent not in redundant[name])
+               if name in redundant else parents
+               for name, parents in classes.items()}
+    return reduced, sum(len(parents) for parents in redundant.values())
+
+
+class ClassGraph:
+    """The class hierarchy with interned integer IDs.
+
+    The classes get the IDs 0 to len(graph) - 1 in the order of the class
+    dictionary, parents which are no classes themselves (e.g. owl-Thing if
+    it was not declared) get the following IDs. Parents and children are
+    stored as CSR arrays: the parents of the class with ID i are
+    parent_ids[parent_offsets[i]:parent_offsets[i + 1]], sorted by name, and
+    the children are stored alike, ordered by ID. The parents of a class
+    dictionary are often sets, so sorting them keeps the graph, and every
+    output written from it, the same from one process to the next.
+
+    The transitive closure is computed with the first query, as a bitset (a
+    Python int) of ancestors and of descendants per class. Afterwards,
+    is_subtype is a single bit test.
+    """
+
+    def __init__(self, classes):
+        """Builds the graph from a class dictionary as given by
+        extract_classes."""
+        self.names = list(classes)
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self.size = len(self.names)
+        self.parent_offsets = array('l', [0])
+        self.parent_ids = array('l')
+        for parents in classes.values():
+            for parent in sorted(parents):
+                if parent not in self.ids:
+                    self.ids[parent] = len(self.names)
+                    self.names.append(parent)
+                self.parent_ids.append(self.ids[parent])
+            self.parent_offsets.append(len(self.parent_ids))
+        self.parent_offsets.extend([len(self.parent_ids)] * (len(self.names) - self.size))
+
+        self.child_offsets = array('l', [0]) * (len(self.names) + 1)
+        for parent in self.parent_ids:
+            self.child_offsets[parent + 1] += 1
+        for i in range(len(self.names)):
+            self.child_offsets[i + 1] += self.child_offsets[i]
+        self.child_ids = array('l', [0]) * len(self.parent_ids)
+        positions = self.child_offsets[:-1]
+        for child in range(self.size):
+            for parent in self.parent_ids[self.parent_offsets[child]:self.parent_offsets[child + 1]]:
+                self.child_ids[positions[parent]] = child
+                positions[parent] += 1
+
+        self._ancestors = None
+        self._descendants = None
+
+    @classmethod
+    def from_arrays(cls, names, size, parent_offsets, parent_ids, child_offsets, child_ids):
+        """Creates a graph from its names and CSR arrays, e.g. those of a
+        GraphSnapshot, which are used as they are and not copied."""
+        graph = cls.__new__(cls)
+        graph.names = names
+        graph.ids = {name: i for i, name in enumerate(names)}
+        graph.size = size
+        graph.parent_offsets, graph.parent_ids = parent_offsets, parent_ids
+        graph.child_offsets, graph.child_ids = child_offsets, child_ids
+        graph._ancestors = None
+        graph._descendants = None
+        return graph
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def items(self):
+        """Yields the classes and their parents like the items of a class
+        dictionary."""
+        for i in range(self.size):
+            yield self.names[i], [self.names[p] for p in self.parent_ids[self.parent_offsets[i]:self.parent_offsets[i + 1]]]
+
+    def parents(self, name):
+        """Returns the names of the direct parents of a class."""
+        i = self.ids[name]
+        return [self.names[p] for p in self.parent_ids[self.parent_offsets[i]:self.parent_offsets[i + 1]]]
+
+    def children(self, name):
+        """Returns the names of the direct children of a class."""
+        i = self.ids[name]
+        return [self.names[c] for c in self.child_ids[self.child_offsets[i]:self.child_offsets[i + 1]]]
+
+    def ancestors(self, name):
+        """Returns the names of all (indirect) parents of a class, by ID."""
+        if self._ancestors is None:
+            self.close()
+        return self._names(self._ancestors[self.ids[name]])
+
+    def descendants(self, name):
+        """Returns the names of all (indirect) children of a class, by ID."""
+        if self._descendants is None:
+            self.close()
+        return self._names(self._descendants[self.ids[name]])
+
+    def is_subtype(self, name, other):
+        """Whether the class name is the class other or one of its
+        descendants."""
+        if self._ancestors is None:
+            self.close()
+        return name == other or bool(self._ancestors[self.ids[name]] >> self.ids[other] & 1)
+
+    def close(self):
+        """Computes the transitive closure of the hierarchy."""
+        self._ancestors = self._reach(self.parent_offsets, self.parent_ids, self.child_offsets, self.child_ids)
+        self._descendants = self._reach(self.child_offsets, self.child_ids, self.parent_offsets, self.parent_ids)
+
+    def _reach(self, offsets, ids, reverse_offsets, reverse_ids, masks=None):
+        """Computes for each class the bitset of the classes reachable via
+        the edges in offsets and ids.
+
+        The classes are visited in topological order, so each bitset is the
+        union of the bitsets of the direct neighbors. Classes on cycles are
+        updated until nothing changes anymore.
+
+        If masks is given, it maps the IDs of the classes to track to their
+        bits, and all other classes are left out of the bitsets.
+        """
+        count = len(self.names)
+        reach = [0] * count
+        pending = [offsets[i + 1] - offsets[i] for i in range(count)]
+        ready = [i for i in range(count) if not pending[i]]
+        while ready:
+            i = ready.pop()
+            bits = 0
+            for j in ids[offsets[i]:offsets[i + 1]]:
+                bits |= reach[j] | (1 << j if masks is None else masks.get(j, 0))
+            reach[i] = bits
+            for j in reverse_ids[reverse_offsets[i]:reverse_offsets[i + 1]]:
+                pending[j] -= 1
+                if not pending[j]:
+                    ready.append(j)
+
+        cyclic = [i for i in range(count) if pending[i]]
+        changed = bool(cyclic)
+        while changed:
+            changed = False
+            for i in cyclic:
+                bits = reach[i]
+                for j in ids[offsets[i]:offsets[i + 1]]:
+                    bits |= reach[j] | (1 << j if masks is None else masks.get(j, 0))
+                if bits != reach[i]:
+                    reach[i] = bits
+                    changed = True
+        return reach
+
+    def redundant_parents(self):
+        """Finds the parent edges which are not part of the transitive
+        reduction of the hierarchy, i.e. parents which are also ancestors of
+        another parent of the same class.
+
+        Only parents of classes with several parents can be redundant, so
+        the ancestors are computed as bitsets of just these parents instead
+        of all classes. Parents on a cycle with each other are all kept.
+
+        Returns:
+            A dictionary of the names of the classes to the sets of the
+            names of their redundant parents.
+        """
+        offsets, ids = self.parent_offsets, self.parent_ids
+        multiple = [i for i in range(self.size) if offsets[i + 1] - offsets[i] > 1]
+        masks = {}
+        for i in multiple:
+            for parent in ids[offsets[i]:offsets[i + 1]]:
+                masks.setdefault(parent, 1 << len(masks))
+        ancestors = self._reach(offsets, ids, self.child_offsets, self.child_ids, masks)
+
+        redundant = {}
+        for i in multiple:
+            parents = ids[offsets[i]:offsets[i + 1]]
+            for parent in parents:
+                if any(other != parent and ancestors[other] & masks[parent] and not ancestors[parent] & masks[other]
+                       for other in parents):
+                    redundant.setdefault(self.names[i], set()).add(self.names[parent])
+        return redundant
+
+    def unary_chains(self, length=2):
+        """Finds the chains of classes in which each class is the only
+        child of the previous one, and the previous one its only parent.
+
+        Args:
+            length: The minimum number of classes of a chain.
+
+        Yields:
+            The lists of the names of the classes of each chain, from the
+            top.
+        """
+        def link(i):
+            """Returns the only child of i if it has no other parent."""
+            if self.child_offsets[i + 1] - self.child_offsets[i] != 1:
+                return None
+            child = self.child_ids[self.child_offsets[i]]
+            return child if self.parent_offsets[child + 1] - self.parent_offsets[child] == 1 else None
+
+        for i in range(len(self.names)):
+            if link(i) is None or self.parent_offsets[i + 1] - self.parent_offsets[i] == 1 \
+                    and link(self.parent_ids[self.parent_offsets[i]]) == i:
+                continue
+            chain = [i]
+            while link(chain[-1]) is not None:
+                chain.append(link(chain[-1]))
+            if len(chain) >= length:
+                yield [self.names[j] for j in chain]
+
+    def _names(self, bits):
+        """Returns the names of the IDs in a bitset, by ID."""
+        names = []
+        while bits:
+            lowest = bits & -bits
+            names.append(self.names[lowest.bit_length() - 1])
+            bits ^= lowest
+        return names
+
+
 def classes2xml(classes, ontologies, ontology_prefix_map):
     """Generates the XML string from the classes and ontologies.
 
     Args:
         classes: A class dictionary of a classname mapping to a list of parent
-                 classnames.
+                 classnames, or a ClassGraph.
         ontologies: The list of used ontologies.
         ontology_prefix_map: A prefix map as returned by load_ontologies.
 
@@ -258,26 +2912,52 @@ def classes2xml(classes, ontologies, ontology_prefix_map):
         A string which can be parsed as valid xml, in the format of the types.xml
         needed for OpenCCG.
     """
-    # Create XML
-    root = ET.Element('types', name='core')
-    root.set('xmlns:xsi', 'http://www.w3.org/2001/XMLSchema-instance')
-    root.set('xsi:noNamespaceSchemaLocation', 'https://raw.githubusercontent.com/OpenCCG/openccg/master/grammars/types.xsd')
-    for cls, parents in classes.items():
-        elem = ET.SubElement(root, 'type', name=cls)
-        if len(parents):
-            elem.set('parents', ' '.join(parents))
-
-    # Prettify text output
-    pretty = minidom.parseString(ET.tostring(root)).toprettyxml(indent=' ' * 4, encoding='UTF-8').decode('utf-8')
-    pretty = pretty.replace('"/>', '" />')
-    comment = '<!-- This file was generated automatically. Do not modify it manually. -->'
-    comment_ontologies = '<!-- Ontologies used:\n     ' + \
-                         '\n     '.join('{}: {}'.format(ontology_prefix_map[o.name], o.base_iri) for o in ontologies) + \
-                         '\n-->'
-    lines = pretty.splitlines()
-    lines.insert(1, comment_ontologies)
-    lines.insert(1, comment)
-    return '\n'.join(lines)
+    return ''.join(iter_types_xml(classes, ontologies, ontology_prefix_map))
+
+
+def iter_types_xml(classes, ontologies, ontology_prefix_map):
+    """Generates the types.xml of classes2xml piece by piece.
+
+    The document is never held in memory as a whole: each type element is
+    yielded as soon as it is formatted, so the output can be written while
+    iterating over the classes.
+
+    Args:
+        classes: A class dictionary of a classname mapping to a list of parent
+                 classnames, or a ClassGraph.
+        ontologies: The list of used ontologies.
+        ontology_prefix_map: A prefix map as returned by load_ontologies.
+
+    Yields:
+        The text of the types.xml, without a trailing newline.
+    """
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<!-- This file was generated automatically. Do not modify it manually. -->\n'
+    yield '<!-- Ontologies used:\n     ' + \
+          '\n     '.join('{}: {}'.format(ontology_prefix_map[o.name], o.base_iri) for o in ontologies) + \
+          '\n-->\n'
+    root = ('<types xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" name="core" '
+            'xsi:noNamespaceSchemaLocation="https://raw.githubusercontent.com/OpenCCG/openccg/master/grammars/types.xsd"')
+    graph = classes if isinstance(classes, ClassGraph) else ClassGraph(classes)
+    if not len(graph):
+        yield root + ' />'
+        return
+    yield root + '>'
+    for cls, parents in graph.items():
+        yield '\n' + INDENT + type_element(cls, parents)
+    yield '\n</types>'
+
+
+def type_element(cls, parents):
+    """Formats the type element of a class in a types.xml."""
+    if len(parents):
+        return f'<type name="{xml_attribute(cls)}" parents="{xml_attribute(" ".join(parents))}" />'
+    return f'<type name="{xml_attribute(cls)}" />'
+
+
+def xml_attribute(value):
+    """Escapes an attribute value the same way minidom does."""
+    return value.replace('&', '&amp;').replace('<', '&lt;').replace('"', '&quot;').replace('>', '&gt;')
 
 
 def classes2ccg(classes, ontologies, ontology_prefix_map):
@@ -285,7 +2965,7 @@ def classes2ccg(classes, ontologies, ontology_prefix_map):
 
     Args:
         classes: A class dictionary of a classname mapping to a list of parent
-                 classnames.
+                 classnames, or a ClassGraph.
         ontologies: The list of used ontologies.
         ontology_prefix_map: A prefix map as returned by load_ontologies.
 
@@ -293,76 +2973,110 @@ def classes2ccg(classes, ontologies, ontology_prefix_map):
         A string which can be parsed as valid xml, in the format of the types.xml
         needed for OpenCCG.
     """
-    blocks = [CCG_COMMENT]
-    features = OrderedDict()
-    ccg_string = 'feature {{\n{}\n{}{}\n}}'
+    return ''.join(iter_ccg_features(classes, ontologies, ontology_prefix_map))
 
-    for cls, parents in classes.items():
-        feature = Feature(cls, sorted(parents))
-        features[feature.name] = feature
-
-    for feature in features.values():
-        parents = sorted(classes[feature.name])
-        if parents:
-            if len(parents) > 1:
-                feature.additional_parents += list(parents)[1:]
-            features[list(parents)[0]].children.append(feature)
 
-    tree = '\n\n{}'.format(INDENT).join(str(f) for f in features.values() if f.toplevel)
-    tree = re.sub(r'\s+$', '', tree, flags=re.M)
+def iter_ccg_features(classes, ontologies, ontology_prefix_map):
+    """Generates the ccg feature string of classes2ccg piece by piece.
 
-    ontology_strings = ['{}: {}'.format(ontology_prefix_map[o.name], o.base_iri) for o in ontologies]
-    comment_ontologies = '\n'.join('# ' + s for s in ['Ontologies used:'] + ontology_strings)
+    Each class is attached to its first (sorted) parent, further parents are
+    listed in brackets. The tree is rendered with an explicit stack, so the
+    depth of the hierarchy is not limited by the recursion limit and every
+    line is only built once.
 
-    blocks.append(ccg_string.format(comment_ontologies, INDENT, tree))
+    Args:
+        classes: A class dictionary of a classname mapping to a list of parent
+                 classnames, or a ClassGraph.
+        ontologies: The list of used ontologies.
+        ontology_prefix_map: A prefix map as returned by load_ontologies.
 
-    return '\n'.join(blocks)
+    Yields:
+        The text of the feature section.
+    """
+    graph = classes if isinstance(classes, ClassGraph) else ClassGraph(classes)
+    features = [Feature(cls, not parents) for cls, parents in graph.items()]
+    for feature, (_, parents) in zip(features, graph.items()):
+        if parents:
+            parents = sorted(parents)
+            feature.additional_parents = parents[1:]
+            first = graph.ids[parents[0]]
+            if first >= len(graph):
+                raise KeyError(parents[0])
+            features[first].children.append(feature)
 
+    ontology_strings = ['{}: {}'.format(ontology_prefix_map[o.name], o.base_iri) for o in ontologies]
+    yield CCG_COMMENT + '\nfeature {\n'
+    yield '\n'.join('# ' + s for s in ['Ontologies used:'] + ontology_strings) + '\n' + INDENT
+
+    toplevel = [feature for feature in features if feature.toplevel]
+    for i, feature in enumerate(toplevel):
+        if i:
+            yield '\n' + INDENT
+        yield feature.name
+        if feature.children:
+            yield ': '
+            yield from iter_ccg_children(feature.children)
+            if feature.children[-1].children:
+                yield '\n' + INDENT[:-1]
+        yield ';'
+    yield '\n}'
+
+
+def iter_ccg_children(children):
+    """Renders the children of a top level feature and all their descendants.
+
+    Siblings are separated by spaces, a feature with children opens a block
+    on a new, deeper indented line; the next sibling after a block starts on
+    a new line as well.
 
-class Feature:
-    def __init__(self, name, parents=None):
-        if parents is None:
-            parents = list()
-        self.name = name
-        self.toplevel = len(parents) == 0
+    Args:
+        children: The children of a top level Feature.
 
-        self.children = []
-        self.additional_parents = []
+    Yields:
+        The text of the children.
+    """
+    stack = [[children, 0]]
+    while stack:
+        frame = stack[-1]
+        siblings, index = frame
+        depth = len(stack)
+        if index == len(siblings):
+            stack.pop()
+            if stack:
+                yield '\n' + INDENT * (depth - 1) + '}'
+            continue
+        frame[1] = index + 1
+
+        feature = siblings[index]
+        if index:
+            yield '\n' + INDENT * depth if siblings[index - 1].children else ' '
+        if feature.additional_parents:
+            yield '{}[{}]'.format(feature.name, ' '.join(feature.additional_parents))
+        else:
+            yield feature.name
+        if feature.children:
+            yield ' {\n' + INDENT * (depth + 1)
+            stack.append([feature.children, 0])
 
-    def __str__(self, depth=0):
-        fmt = '{name}{parents}{colon}{children}{semicolon}'
 
-        parents = ''
-        colon = ''
-        children = ' '.join(child.__str__(depth+1) for child in self.children)
-        semicolon = ''
+class Feature:
+    """A class in the ccg feature hierarchy."""
 
-        if self.toplevel:
-            if self.children:
-                colon = ': '
-            semicolon = ';'
-        else:
-            if self.additional_parents:
-                parents = '[{}]'.format(' '.join(self.additional_parents))
-            if children:
-                if depth > 0:
-                    children = ' {{\n{indent}{spaces}{children}\n{spaces}}}\n{spaces}'\
-                        .format(indent=INDENT, spaces=INDENT * depth, children=children)[:-1]
-                else:
-                    children = ' {{{}}} '.format(children)
+    __slots__ = ('name', 'toplevel', 'children', 'additional_parents')
 
-        return fmt.format(name=self.name,
-                          parents=parents,
-                          colon=colon,
-                          children=children,
-                          semicolon=semicolon)
+    def __init__(self, name, toplevel=True):
+        self.name = name
+        self.toplevel = toplevel
+        self.children = []
+        self.additional_parents = ()
 
 
 def insert_ccg_features(input_text, feature_string):
     """Inserts into or replaces an existing feature string in input_text.
 
     If the CCG_COMMENT line is found inside input_text, the following
-    feature section is considered created by this tool and replaced.
+    feature section is considered created by this tool and replaced, see
+    find_ccg_features.
     If such a comment line is not found, a new feature section is created and
     prepended to input_text.
 
@@ -370,33 +3084,490 @@ def insert_ccg_features(input_text, feature_string):
         input_text: The text from the original file.
         feature_string: The ccg feature string containing the ontology information.
     """
-    lines = input_text.splitlines()
-
-    # Search for CCG_COMMENT and determine the feature section's lines
-    comment_line = -1
-    end_line = -1
-    brace_count = 0
-    for i, line in enumerate(input_text.splitlines()):
-        if comment_line > -1:
-            brace_count = brace_count + line.count('{') - line.count('}')
-        if CCG_COMMENT in line:
-            comment_line = i
-        elif comment_line > -1 and brace_count == 0:
-            end_line = i
-            break
-
-    # Cut and replace exist feature section or prepend new section
-    if comment_line > -1 and end_line > -1:
-        output = lines[:comment_line] + [feature_string] + lines[end_line + 1:]
+    data = input_text.encode('utf-8')
+    features = feature_string.encode('utf-8')
+    section = find_ccg_features(data)
+    if section is None:
+        return b'\n'.join((features, data)).decode('utf-8')
+    start, end = section
+    return b''.join((data[:start], features, data[end:])).decode('utf-8')
+
+
+def find_ccg_features(data):
+    """Finds the feature section created by this tool in a ccg file.
+
+    The section starts with the line containing CCG_COMMENT and ends with
+    the first line after it which closes all braces opened after the
+    comment line. The file is searched in a single pass, directly on the
+    bytes.
+
+    Args:
+        data: The contents of the ccg file, as bytes or an mmap.
+
+    Returns:
+        The byte offsets of the start of the section and of the end of its
+        last line (before the newline), or None if there is no section.
+    """
+    index = data.find(CCG_COMMENT.encode('utf-8'))
+    if index < 0:
+        return None
+    start = data.rfind(b'\n', 0, index) + 1
+    line_start = data.find(b'\n', index) + 1
+    if not line_start:
+        return None
+
+    depth = 0
+    comment_line = False
+    for match in CCG_SECTION_TOKENS.finditer(data, line_start):
+        token = match.group()
+        if token == b'\n':
+            if depth == 0 and not comment_line:
+                return start, match.start()
+            comment_line = False
+            line_start = match.end()
+        elif token == b'{':
+            depth += 1
+        elif token == b'}':
+            depth -= 1
+        else:
+            # A repeated comment line starts the section anew.
+            start = line_start
+            comment_line = True
+    if depth == 0 and not comment_line and line_start < len(data):
+        return start, len(data)
+    return None
+
+
+def write_ccg_features(output, feature_string, backup=True):
+    """Inserts the feature section into a ccg file, see insert_ccg_features.
+
+    The rest of the file is kept byte for byte. If the section did not
+    change, the file is not written at all, otherwise it is replaced in one
+    step, see replace_file. Files of MMAP_THRESHOLD bytes and more are
+    mapped into memory instead of being read.
+
+    Args:
+        output: The ccg filename.
+        feature_string: The ccg feature string containing the ontology
+                        information.
+        backup: Whether to keep the previous file as output.bak, replacing
+                an older backup.
+
+    Returns:
+        Whether the file was written.
+    """
+    import mmap
+
+    features = feature_string.encode('utf-8')
+    try:
+        f = open(output, 'rb')
+    except FileNotFoundError:
+        return replace_file(output, (features, b'\n'), compare=False)
+
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        if size and size >= MMAP_THRESHOLD:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            data = f.read()
+        try:
+            section = find_ccg_features(data)
+            if section is not None and data[section[0]:section[1]] == features:
+                return False
+            if backup:
+                backup_file(output)
+            if section is None:
+                views = [memoryview(data)]
+                chunks = (features, b'\n', views[0])
+            else:
+                views = [memoryview(data)[:section[0]], memoryview(data)[section[1]:]]
+                chunks = (views[0], features, views[1])
+            try:
+                return replace_file(output, chunks, compare=False)
+            finally:
+                for view in views:
+                    view.release()
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+
+def read_hierarchy(output, output_format):
+    """Reads the class hierarchy back from an output file.
+
+    Args:
+        output: The output filename.
+        output_format: xml for a types.xml, ccg for the feature section of
+                       a ccg file, or graph for a graph snapshot.
+
+    Returns:
+        A dictionary of the class names mapping to the lists of their
+        parents, like extract_classes, in the order of the file, or None if
+        the file does not exist. A ccg file without a feature section has
+        no classes. Compressed files are decompressed, see open_source.
+    """
+    if output_format == 'graph':
+        from owl2types_snapshot import GraphSnapshot
+
+        try:
+            snapshot = GraphSnapshot(output)
+        except FileNotFoundError:
+            return None
+        with snapshot:
+            return OrderedDict(snapshot.graph().items())
+    try:
+        with open_source(output) as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    if output_format == 'xml':
+        return OrderedDict((name, parents) for name, parents, _, _ in iter_type_elements(data))
+    section = find_ccg_features(data)
+    if section is None:
+        return OrderedDict()
+    return parse_ccg_hierarchy(data[section[0]:section[1]].decode('utf-8'))
+
+
+def iter_type_elements(data):
+    """Finds the type elements of a types.xml, without parsing the document.
+
+    Elements inside comments are skipped.
+
+    Args:
+        data: The contents of the types.xml, as bytes.
+
+    Yields:
+        Tuples of the name, the list of parents and the byte offsets of the
+        start and the end of each type element.
+
+    Raises:
+        ValueError: If a type element has no name or is not empty, as this
+                    tool writes them.
+    """
+    for match in TYPES_XML_TOKENS.finditer(data):
+        attributes = match.group('attributes')
+        if attributes is None:
+            continue
+        if not attributes.endswith(b'/'):
+            raise ValueError(f'unexpected type element at byte {match.start()}')
+        values = {key: value for key, value in TYPES_XML_ATTRIBUTE.findall(attributes)}
+        if b'name' not in values:
+            raise ValueError(f'type element without a name at byte {match.start()}')
+        name = xml_unescape(values[b'name'].decode('utf-8'))
+        parents = xml_unescape(values.get(b'parents', b'').decode('utf-8')).split()
+        yield name, parents, match.start(), match.end()
+
+
+def xml_unescape(value):
+    """Reverts xml_attribute."""
+    return value.replace('&quot;', '"').replace('&lt;', '<').replace('&gt;', '>').replace('&amp;', '&')
+
+
+def parse_ccg_hierarchy(section):
+    """Parses the class hierarchy of a feature section as written by
+    classes2ccg.
+
+    Args:
+        section: The text of the feature section.
+
+    Returns:
+        A dictionary of the class names mapping to the lists of their
+        parents, the parent the class is nested in first.
+
+    Raises:
+        ValueError: If the section is not a feature section.
+    """
+    classes = OrderedDict()
+    tokens = (match.group() for match in CCG_FEATURE_TOKENS.finditer(section) if match.group()[0] != '#')
+    if [token for _, token in zip(range(2), tokens)] != ['feature', '{']:
+        raise ValueError('not a feature section')
+    parents = []
+    last = None
+    brackets = False
+    for token in tokens:
+        if brackets:
+            if token == ']':
+                brackets = False
+            else:
+                classes[last].append(token)
+        elif token == '[':
+            brackets = True
+        elif token == '{':
+            parents.append(last)
+        elif token == '}':
+            if not parents:
+                return classes
+            parents.pop()
+        elif token == ':':
+            parents = [last]
+        elif token == ';':
+            parents = []
+        else:
+            last = token
+            classes[token] = parents[-1:]
+    raise ValueError('unterminated feature section')
+
+
+def hierarchy_delta(previous, classes):
+    """Compares two class hierarchies.
+
+    Args:
+        previous: The previous class dictionary, e.g. from read_hierarchy.
+        classes: The current class dictionary or ClassGraph.
+
+    Returns:
+        A dictionary of the added classes (mapping to their parents), the
+        removed classes and the reparented classes (mapping to their old
+        and new parents). Parents are compared regardless of their order.
+    """
+    current = OrderedDict(classes.items())
+    delta = OrderedDict([('added', OrderedDict()), ('removed', []), ('reparented', OrderedDict())])
+    for name, parents in current.items():
+        if name not in previous:
+            delta['added'][name] = list(parents)
+        elif set(previous[name]) != set(parents):
+            delta['reparented'][name] = {'old': sorted(previous[name]), 'new': sorted(parents)}
+    delta['removed'] = [name for name in previous if name not in current]
+    return delta
+
+
+def patch_types_xml(output, graph):
+    """Rewrites only the changed type elements of an existing types.xml.
+
+    Changed elements are replaced where they are, the lines of removed
+    elements are deleted, and added elements are appended after the last
+    element with its indentation. Elements whose parents only differ in
+    their order are unchanged. Everything else, e.g. a hand-written
+    header, is kept byte for byte.
+
+    Args:
+        output: The filename of the types.xml.
+        graph: The ClassGraph.
+
+    Returns:
+        Whether the file was written, or None if it cannot be patched and
+        needs to be written as a whole, e.g. because it is compressed.
+    """
+    if output.endswith(COMPRESSION_SUFFIXES):
+        return None
+    try:
+        data = Path(output).read_bytes()
+        elements = list(iter_type_elements(data))
+    except (OSError, ValueError):
+        return None
+    if not elements or len(set(name for name, *_ in elements)) < len(elements):
+        return None
+
+    current = OrderedDict(graph.items())
+    edits = []
+    for name, parents, start, end in elements:
+        if name not in current:
+            line_start = data.rfind(b'\n', 0, start)
+            if line_start < 0 or data[line_start:start].strip():
+                line_start = start
+            edits.append((line_start, end, b''))
+        elif set(current[name]) != set(parents):
+            edits.append((start, end, type_element(name, sorted(current[name])).encode('utf-8')))
+    _, _, start, end = elements[-1]
+    indent = data[data.rfind(b'\n', 0, start):start]
+    if indent.strip():
+        indent = ('\n' + INDENT).encode('utf-8')
+    previous = set(name for name, *_ in elements)
+    added = [indent + type_element(name, sorted(parents)).encode('utf-8')
+             for name, parents in current.items() if name not in previous]
+    if added:
+        edits.append((end, end, b''.join(added)))
+    if not edits:
+        return False
+
+    chunks = []
+    position = 0
+    for start, end, replacement in edits:
+        chunks.append(data[position:start])
+        chunks.append(replacement)
+        position = end
+    chunks.append(data[position:])
+    return replace_file(output, chunks)
+
+
+def write_delta(delta_output, deltas):
+    """Writes the deltas of the targets as a single line of JSON.
+
+    Args:
+        delta_output: The filename, or - for STDOUT.
+        deltas: A list of the deltas of the targets, see hierarchy_delta.
+    """
+    report = json.dumps({'version': DELTA_VERSION, 'targets': deltas}, separators=(',', ':'))
+    if delta_output == '-':
+        print(report)
     else:
-        output = (feature_string, input_text)
+        replace_file(delta_output, [report.encode('utf-8'), b'\n'])
+
+
+def backup_file(output):
+    """Keeps the current version of output as output.bak, replacing an
+    older backup. The backup is a hard link where possible, as the file
+    itself is replaced instead of overwritten."""
+    import shutil
+
+    backup = output + '.bak'
+    if os.path.lexists(backup):
+        os.unlink(backup)
+    try:
+        os.link(output, backup)
+    except OSError:
+        shutil.copyfile(output, backup)
+
+
+def compressing_writer(f, output):
+    """Wraps a binary file object such that what is written to it is
+    compressed according to the suffix of output.
+
+    Compressed files are written reproducibly, e.g. without the
+    modification time of gzip, so that replace_file can tell whether their
+    content changed.
+
+    Args:
+        f: The binary file object to write to.
+        output: The filename of the output.
+
+    Returns:
+        A binary file object which needs to be closed before f, or
+        contextlib.nullcontext(f) for uncompressed outputs.
+    """
+    import contextlib
+
+    if output.endswith('.gz'):
+        import gzip
+        return gzip.GzipFile(filename='', mode='wb', fileobj=f, mtime=0)
+    if output.endswith('.xz'):
+        import lzma
+        return lzma.LZMAFile(f, 'wb')
+    if output.endswith('.zst'):
+        return open_zstd(f, 'wb')
+    return contextlib.nullcontext(f)
 
-    return '\n'.join(output)
 
+def replace_file(output, chunks, compare=True):
+    """Writes a file via a temporary file next to it, which then replaces
+    the file in one step, so that no reader ever sees a partly written file.
+    Files ending in one of the COMPRESSION_SUFFIXES are compressed, see
+    compressing_writer.
 
-def parse_args():
+    Args:
+        output: The filename.
+        chunks: The contents, as an iterable of bytes-like objects.
+        compare: Whether to leave the file untouched if its content is the
+                 same already.
+
+    Returns:
+        Whether the file was written.
+    """
+    import filecmp
+    import stat
+    import tempfile
+
+    output = os.path.realpath(output)
+    try:
+        mode = stat.S_IMODE(os.stat(output).st_mode)
+    except FileNotFoundError:
+        mode = None
+    descriptor, temporary = tempfile.mkstemp(prefix=f'.{os.path.basename(output)}.', suffix='.tmp',
+                                             dir=os.path.dirname(output))
+    try:
+        with os.fdopen(descriptor, 'wb') as f, compressing_writer(f, output) as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+        if compare and mode is not None and filecmp.cmp(temporary, output, shallow=False):
+            os.unlink(temporary)
+            return False
+        if mode is None:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(temporary, mode)
+        os.replace(temporary, output)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        raise
+    return True
+
+
+def build_manifests(arguments):
+    """Describes everything the conversion of each target depends on.
+
+    This is the resolved import closure with the content hashes of all its
+    files, the prefixes of the ontologies and the options which change the
+    output. Building the manifests does not need owlready2.
+
+    Args:
+        arguments: The parsed command line arguments.
+
+    Returns:
+        A dictionary of the output filenames to JSON serializable
+        dictionaries.
+    """
+    sources = import_closure(arguments.ontologies, arguments.lookup)
+    digests = [[str(source), source_digest(source)] for source in sources]
+    options = {'exclude_owl_thing': arguments.exclude_owl_thing}
+    if arguments.reduce:
+        options['reduce'] = True
+    if arguments.keep or arguments.keep_referenced:
+        options['keep'] = sorted(set(arguments.keep))
+        options['keep_referenced'] = [[grammar, source_digest(Path(grammar)) if Path(grammar).is_file() else None]
+                                      for grammar in arguments.keep_referenced]
+    return {output: {
+        'version': MANIFEST_VERSION,
+        'sources': digests,
+        'prefixes': [[ontology.uri, ontology.prefix] for ontology in arguments.ontologies],
+        'options': {'format': output_format, **options},
+    } for output_format, output in arguments.targets}
+
+
+def manifest_path(output):
+    """Returns the path of the manifest which belongs to an output file."""
+    return Path(output + '.manifest.json')
+
+
+def manifest_matches(manifest, output):
+    """Checks whether the output is up to date.
+
+    This is the case if the stored manifest describes the same inputs and
+    options, and the output file was not modified since it was written.
+
+    Args:
+        manifest: The manifest of the current run, see build_manifests.
+        output: The output filename.
+
+    Returns:
+        True if the conversion can be skipped.
+    """
+    try:
+        stored = json.loads(manifest_path(output).read_text())
+        digest = hashlib.sha256(Path(output).read_bytes()).hexdigest()
+    except (OSError, ValueError):
+        return False
+    return stored.pop('output', None) == digest and stored == manifest
+
+
+def write_manifest(manifest, output):
+    """Stores the manifest together with the hash of the written output.
+
+    Args:
+        manifest: The manifest of the current run, see build_manifests.
+        output: The output filename.
+    """
+    stored = dict(manifest, output=hashlib.sha256(Path(output).read_bytes()).hexdigest())
+    manifest_path(output).write_text(json.dumps(stored, indent=2))
+
+
+def parse_args(args=None):
     """Defines and parses the command line arguments for the command line tool.
 
+    Args:
+        args: The arguments to parse, by default the command line arguments.
+
     Returns:
         The parsed command line arguments, see argparse.parse_args for more details.
     """
@@ -404,28 +3575,240 @@ def parse_args():
     parser.add_argument('-o', '--output', nargs='?',
                         type=str, default='-',
                         help='The output file, defaults to - (STDOUT)')
+    add_ontology_arguments(parser)
+    parser.add_argument('-f', '--format', nargs='?', default='xml',
+                        choices=['xml', 'ccg', 'graph'],
+                        help='Determines the output format: a types.xml to be '
+                             'used directly inside an OpenCCG grammar, a '
+                             '*.ccg file, or a binary snapshot of the class '
+                             'graph, which can be converted instead of the '
+                             'ontologies later.')
+    parser.add_argument('-t', '--target', action='append', default=[],
+                        type=target_argument, dest='targets',
+                        metavar='FORMAT:PATH',
+                        help='An output file and its format, e.g. '
+                             'ccg:grammar.ccg. Can be specified multiple '
+                             'times to write several files from one load, '
+                             'instead of --output and --format.')
+    parser.add_argument('-n', '--nobackup', action='store_true',
+                        help='Make no backup of the input file. Only used in '
+                             'conjunction with --format ccg.')
+    parser.add_argument('-m', '--manifest', action='store_true',
+                        help='Write a manifest of all inputs and options '
+                             'next to the output file and skip the '
+                             'conversion if it is still up to date.')
+    parser.add_argument('-w', '--watch', action='store_true',
+                        help='Keep running and convert again whenever one '
+                             'of the ontology files changes. Only the '
+                             'changed files are read again.')
+    parser.add_argument('-d', '--delta', default=None, metavar='FILE',
+                        help='Compare the classes to those of the existing '
+                             'output files and write the added, removed and '
+                             'reparented classes as JSON to FILE (- for '
+                             'STDOUT).')
+    parser.add_argument('-i', '--in-place', action='store_true',
+                        help='Only rewrite the changed type elements of an '
+                             'existing types.xml and keep the rest of it.')
+    parser.add_argument('-k', '--keep', '--roots', action='append', default=[],
+                        metavar='CLASS',
+                        help='Only write CLASS and its ancestors, and those '
+                             'of the other --keep and --keep-referenced '
+                             'classes. Can be specified multiple times.')
+    parser.add_argument('--keep-referenced', action='append', default=[],
+                        metavar='FILE',
+                        help='Keep the types referenced by a grammar file, '
+                             'e.g. lexicon.xml or morph.xml, and their '
+                             'ancestors, see --keep. Can be specified '
+                             'multiple times.')
+    parser.add_argument('--reduce', action='store_true',
+                        help='Leave out parents which are ancestors of '
+                             'another parent of the same class, and report '
+                             'chains of classes with a single child each.')
+    parser.add_argument('--chain-length', default=4, type=int, metavar='N',
+                        help='The minimum number of classes of the chains '
+                             'reported by --reduce, defaults to 4.')
+    parser.add_argument('--profile', default=None, metavar='FILE',
+                        help='Measure the time and peak memory of each '
+                             'stage of the conversion and write them as a '
+                             'JSON report to FILE.')
+    parser.add_argument('--cprofile', default=None, metavar='FILE',
+                        help='Run the stages of the conversion with '
+                             'cProfile and write the statistics of the '
+                             'slowest stage to FILE.')
+    arguments = parser.parse_args(args)
+    if not arguments.targets:
+        arguments.targets = [(arguments.format, arguments.output)]
+    elif arguments.output != '-':
+        parser.error('--output cannot be combined with --target.')
+    outputs = [output for _, output in arguments.targets]
+    if len(set(outputs)) < len(outputs):
+        parser.error('each --target needs its own file.')
+    if arguments.manifest and '-' in outputs:
+        parser.error('--manifest needs an --output file.')
+    if arguments.delta is not None and '-' in outputs:
+        parser.error('--delta needs an --output file.')
+    if arguments.jobs < 1:
+        parser.error('--jobs needs at least one job.')
+    if arguments.offline and arguments.cache is None:
+        parser.error('--offline needs a --cache directory.')
+    if any(output.endswith(COMPRESSION_SUFFIXES) for output_format, output in arguments.targets
+           if output_format != 'xml'):
+        parser.error('only xml outputs can be compressed.')
+    if ('graph', '-') in arguments.targets:
+        parser.error('--format graph needs an --output file.')
+    if arguments.chain_length < 2:
+        parser.error('--chain-length needs at least two classes.')
+    if arguments.watch and (arguments.profile or arguments.cprofile):
+        parser.error('--profile and --cprofile cannot be combined with --watch.')
+    return arguments
+
+
+def parse_query_args(args=None):
+    """Defines and parses the command line arguments for the query command.
+
+    Args:
+        args: The arguments to parse, by default the command line arguments
+              after query.
+
+    Returns:
+        The parsed command line arguments. The questions are collected in
+        order as tuples of the ClassGraph method and the class names.
+    """
+    parser = argparse.ArgumentParser(prog='owl2types query')
+    add_ontology_arguments(parser)
+    parser.add_argument('--is-subtype', nargs=2, action=QuestionAction,
+                        dest='questions', const='is_subtype', default=[],
+                        metavar=('CLASS', 'SUPERCLASS'),
+                        help='Whether CLASS is SUPERCLASS or one of its '
+                             'descendants.')
+    for question in ['ancestors', 'descendants', 'parents', 'children']:
+        parser.add_argument(f'--{question}', nargs=1, action=QuestionAction,
+                            dest='questions', const=question, default=[],
+                            metavar='CLASS',
+                            help=f'List the {question} of CLASS.')
+    arguments = parser.parse_args(sys.argv[2:] if args is None else args)
+    if not arguments.questions:
+        parser.error('at least one question is needed.')
+    if arguments.jobs < 1:
+        parser.error('--jobs needs at least one job.')
+    if arguments.offline and arguments.cache is None:
+        parser.error('--offline needs a --cache directory.')
+    return arguments
+
+
+def parse_check_args(args=None):
+    """Defines and parses the command line arguments for the check command.
+
+    Args:
+        args: The arguments to parse, by default the command line arguments
+              after check.
+
+    Returns:
+        The parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(prog='owl2types check')
+    add_ontology_arguments(parser)
+    parser.add_argument('-g', '--grammar', action='append', default=[],
+                        dest='grammars', metavar='FILE',
+                        help='A grammar file to check, e.g. lexicon.xml or '
+                             'morph.xml. Can be specified multiple times.')
+    parser.add_argument('-p', '--previous', default=None,
+                        type=target_argument, metavar='FORMAT:PATH',
+                        help='An output of a previous conversion, e.g. '
+                             'xml:types.xml, to tell types which were '
+                             'removed from the ontologies from unknown ones.')
+    arguments = parser.parse_args(sys.argv[2:] if args is None else args)
+    if not arguments.grammars:
+        parser.error('at least one --grammar is needed.')
+    if arguments.jobs < 1:
+        parser.error('--jobs needs at least one job.')
+    if arguments.offline and arguments.cache is None:
+        parser.error('--offline needs a --cache directory.')
+    return arguments
+
+
+def parse_build_args(args=None):
+    """Defines and parses the command line arguments for the build command.
+
+    Args:
+        args: The arguments to parse, by default the command line arguments
+              after build.
+
+    Returns:
+        The parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(prog='owl2types build')
+    parser.add_argument('buildfile', type=str,
+                        help='The build file listing the grammars, see '
+                             'the README.')
+    parser.add_argument('-j', '--jobs', nargs='?', default=None,
+                        type=int, metavar='N',
+                        help='Build up to N grammars concurrently, defaults '
+                             'to the number of CPUs.')
+    arguments = parser.parse_args(sys.argv[2:] if args is None else args)
+    if arguments.jobs is not None and arguments.jobs < 1:
+        parser.error('--jobs needs at least one job.')
+    return arguments
+
+
+def add_ontology_arguments(parser):
+    """Adds the arguments which select and load the ontologies to parser."""
     parser.add_argument('ontologies', nargs='+',
                         type=OntologyArgument.argument,
                         help='The list of ontologies and their mappings. '
                              'Should follow the format path/to/ontology:prefix, '
                              'e.g. ./ontologies/GUM-3.owl:gum . If no prefix is '
                              'specified, the program tries to invent one.')
-    parser.add_argument('-l', '--lookup', nargs=1,
-                        type=extend_lookup_path,
+    parser.add_argument('-l', '--lookup', action='append', default=[],
+                        type=str,
                         help='Additional lookup directory for ontology '
                              'files. Can be specified multiple times.')
     parser.add_argument('-x', '--exclude-owl-thing', action='store_true',
                         help='Exclude owl:Thing as the top level element. '
                              'By default, it will be included.')
-    parser.add_argument('-f', '--format', nargs='?', default='xml',
-                        choices=['xml', 'ccg'],
-                        help='Determines the output format: a types.xml to be '
-                             'used directly inside an OpenCCG grammar, or a '
-                             '*.ccg file.')
-    parser.add_argument('-n', '--nobackup', action='store_true',
-                        help='Make no backup of the input file. Only used in '
-                             'conjunction with --format ccg.')
-    return parser.parse_args()
+    parser.add_argument('-c', '--cache', nargs='?', default=None,
+                        type=str, metavar='DIR',
+                        help='Keep the loaded ontologies in an on-disk cache '
+                             'inside DIR. The cache is reused until one of '
+                             'the ontology files or their imports changes. '
+                             'Online ontologies are downloaded into DIR and '
+                             'only downloaded again if they changed.')
+    parser.add_argument('--offline', action='store_true',
+                        help='Never download ontologies, use the ones '
+                             'downloaded into the --cache directory before.')
+    parser.add_argument('-e', '--engine', nargs='?', default='owlready2',
+                        choices=['owlready2', 'sql', 'stream'],
+                        help='Determines how the ontologies are read: with '
+                             'owlready2, with owlready2 but extracting the '
+                             'classes with bulk queries on its quadstore, or '
+                             'by streaming the RDF/XML files, which is faster '
+                             'and needs less memory. The sql and stream '
+                             'engines fall back to owlready2 for input they '
+                             'cannot handle.')
+    parser.add_argument('-j', '--jobs', nargs='?', default=1,
+                        type=int, metavar='N',
+                        help='Parse independent ontology files in N '
+                             'processes. Only used by the stream engine, '
+                             'owlready2 loads into a single world.')
+
+
+def target_argument(argument):
+    """Parses a --target argument of the form FORMAT:PATH.
+
+    Returns:
+        A tuple of the format and the path.
+    """
+    output_format, _, output = argument.partition(':')
+    if output_format not in ('xml', 'ccg', 'graph') or not output:
+        raise argparse.ArgumentTypeError(f"invalid target '{argument}', expected xml:PATH, ccg:PATH or graph:PATH")
+    return output_format, output
+
+
+class QuestionAction(argparse.Action):
+    """Collects the questions of the query command in the given order."""
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        setattr(namespace, self.dest, getattr(namespace, self.dest) + [(self.const, values)])
 
 
 def unique_prefix(prefix):
@@ -445,16 +3828,24 @@ def unique_prefix(prefix):
         A string denoting the prefix or, if needed, the prefix with an
         additional number.
     """
+    prefixes = prefix_registry()
     candidate = prefix
     counter = 0
-    while candidate in unique_prefix.prefixes:
+    while candidate in prefixes:
         candidate = prefix + str(counter)
         counter += 1
-    unique_prefix.prefixes.append(candidate)
+    prefixes.append(candidate)
     return candidate
 unique_prefix.prefixes = []  # noqa
 
 
+def prefix_registry():
+    """Returns the list of prefixes in use by the current conversion, see
+    PREFIX_REGISTRY."""
+    prefixes = PREFIX_REGISTRY.get()
+    return unique_prefix.prefixes if prefixes is None else prefixes
+
+
 def generate_prefix(filename):
     """Generates a prefix from a given owl filename.
 
@@ -498,10 +3889,19 @@ def generate_prefix(filename):
     return unique_prefix(candidate)
 
 
+def extend_lookup_paths(paths):
+    """Adds the paths which are not in owlready2.onto_path yet to it, so
+    that repeated conversions, e.g. of watch, do not grow it."""
+    import owlready2
+
+    for path in paths:
+        if path not in owlready2.onto_path:
+            extend_lookup_path(path)
+
+
 def extend_lookup_path(path):
     """Wraps owlready2.onto_path.append such that a call also returns the path.
 
-    This is needed so that the argparser can properly handle the paths.
     Each path passed to this function is added to the onto_path and returned.
 
     Args:
@@ -510,9 +3910,13 @@ def extend_lookup_path(path):
     Returns:
         path
     """
+    import owlready2
+
     owlready2.onto_path.append(path)
     return path
 
 
 if __name__ == '__main__':
+    # The sibling modules of the subcommands import this one by its name.
+    sys.modules.setdefault('owl2types', sys.modules[__name__])
     owl2types()
@@ -0,0 +1,190 @@
+import argparse
+import hashlib
+import os
+import sys
+
+from pathlib import Path
+
+from owl2types import replace_file
+
+
+# The grammar elements whose children are left out by the compact command
+# if they are structurally identical to an earlier child, i.e. duplicate
+# morph entries and macros, families, and entries and members of a family.
+DEDUPLICATED_ELEMENTS = {'morph', 'ccg-lexicon', 'family'}
+
+
+# The characters to escape in attribute values when writing XML, besides
+# &, < and >; whitespace would be normalized to spaces otherwise.
+ATTRIBUTE_ENTITIES = {'"': '&quot;', '\n': '&#10;', '\r': '&#13;', '\t': '&#9;'}
+
+
+def compact(args=None):
+    """Writes a compact copy of the XML files of a grammar, e.g. for
+    deployment.
+
+    This is the compact command of owl2types:
+
+        owl2types compact --output deploy/english-cooking english-cooking
+
+    Each XML file of the grammar directory is written to the output
+    directory without comments and whitespace between elements, and without
+    the children of DEDUPLICATED_ELEMENTS which are duplicates of earlier
+    ones, see compact_grammar_xml. OpenCCG loads the same grammar from the
+    copy, but has less to parse. For each file, the sizes and the number of
+    removed duplicates are printed. Files whose content would not change are
+    left untouched.
+    """
+    arguments = parse_compact_args(args)
+    grammar = Path(arguments.grammar)
+    paths = sorted(grammar.glob('*.xml'))
+    if not paths:
+        sys.exit(f'owl2types: {grammar} contains no xml files')
+    before = after = 0
+    try:
+        os.makedirs(arguments.output, exist_ok=True)
+        for path in paths:
+            try:
+                data, elements, duplicates = compact_grammar_xml(path)
+            except SyntaxError as error:
+                sys.exit(f'owl2types: cannot compact {path}, {error}')
+            replace_file(os.path.join(arguments.output, path.name), [data])
+            size = path.stat().st_size
+            before, after = before + size, after + len(data)
+            print(f'owl2types: {path.name} {size} -> {len(data)} bytes '
+                  f'(-{100 * (size - len(data)) / size if size else 0:.0f}%), '
+                  f'removed {duplicates} duplicates of {elements} entries', file=sys.stderr)
+    except OSError as error:
+        sys.exit(f'owl2types: cannot compact {grammar}, {error}')
+    print(f'owl2types: compacted {len(paths)} files, {before} -> {after} bytes '
+          f'(-{100 * (before - after) / before if before else 0:.0f}%)', file=sys.stderr)
+
+
+def compact_grammar_xml(path):
+    """Compacts an OpenCCG grammar file.
+
+    The file is parsed in blocks with expat and written again without
+    comments, the XML declaration aside, and without text which is only
+    whitespace; attributes keep their order, and elements without content
+    become empty-element tags.
+
+    Each element is hashed from its name, its sorted attributes and the
+    hashes of its content. Children of DEDUPLICATED_ELEMENTS are buffered
+    until they end, and left out if an earlier sibling has the same hash,
+    e.g. a morph entry listed twice. As the hash of a family only covers its
+    remaining children, families which only differ by duplicates are
+    duplicates, too.
+
+    Args:
+        path: The grammar file, e.g. lexicon.xml or morph.xml.
+
+    Returns:
+        A tuple of the compact file in UTF-8, the number of children of
+        DEDUPLICATED_ELEMENTS and the number of those which were left out.
+
+    Raises:
+        SyntaxError: If the file is not well-formed XML.
+    """
+    from xml.parsers import expat
+    from xml.sax.saxutils import escape
+
+    parser = expat.ParserCreate()
+    parser.ordered_attributes = True
+    parser.buffer_text = True
+    output = ['<?xml version="1.0" encoding="UTF-8"?>\n']
+    # For each open element: the list its output goes to, the hash of its
+    # content, whether its start tag is still open, and the hashes of its
+    # children if it is one of the DEDUPLICATED_ELEMENTS.
+    stack = []
+    text = []
+    counts = [0, 0]
+
+    def open_content():
+        if stack and stack[-1][2]:
+            stack[-1][0].append('>')
+            stack[-1][2] = False
+        return stack[-1] if stack else None
+
+    def flush_text():
+        value = ''.join(text)
+        text.clear()
+        if value.strip():
+            parent = open_content()
+            parent[0].append(escape(value))
+            parent[1].update(b'\3' + value.encode('utf-8') + b'\0')
+
+    def start_element(tag, attributes):
+        flush_text()
+        parent = open_content()
+        if parent is None:
+            out = output
+        elif parent[3] is not None:
+            out = []
+        else:
+            out = parent[0]
+        pairs = list(zip(attributes[::2], attributes[1::2]))
+        out.append(f'<{tag}' + ''.join(f' {name}="{escape(value, ATTRIBUTE_ENTITIES)}"' for name, value in pairs))
+        content = hashlib.blake2b(digest_size=16)
+        content.update('\0'.join([tag, *(f'{name}\0{value}' for name, value in sorted(pairs))]).encode('utf-8'))
+        stack.append([out, content, True, set() if tag in DEDUPLICATED_ELEMENTS else None])
+
+    def end_element(tag):
+        flush_text()
+        out, content, empty, _ = stack.pop()
+        out.append('/>' if empty else f'</{tag}>')
+        digest = content.digest()
+        if not stack:
+            return
+        parent = stack[-1]
+        if parent[3] is not None:
+            counts[0] += 1
+            if digest in parent[3]:
+                counts[1] += 1
+                return
+            parent[3].add(digest)
+            parent[0].extend(out)
+        parent[1].update(b'\1' + digest)
+
+    def processing_instruction(target, data):
+        flush_text()
+        parent = open_content()
+        (output if parent is None else parent[0]).append(f'<?{target} {data}?>' if data else f'<?{target}?>')
+        if parent is not None:
+            parent[1].update(b'\2' + f'{target}\0{data}'.encode('utf-8') + b'\0')
+
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    parser.CharacterDataHandler = text.append
+    parser.ProcessingInstructionHandler = processing_instruction
+    with open(path, 'rb') as f:
+        try:
+            for block in iter(lambda: f.read(1 << 16), b''):
+                parser.Parse(block, False)
+            parser.Parse(b'', True)
+        except expat.ExpatError as error:
+            raise SyntaxError(f'{path}: {error}') from None
+    output.append('\n')
+    return ''.join(output).encode('utf-8'), counts[0], counts[1]
+
+
+def parse_compact_args(args=None):
+    """Defines and parses the command line arguments for the compact
+    command.
+
+    Args:
+        args: The arguments to parse, by default the command line arguments
+              after compact.
+
+    Returns:
+        The parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(prog='owl2types compact')
+    parser.add_argument('grammar', metavar='DIR',
+                        help='The grammar directory, e.g. english-cooking.')
+    parser.add_argument('-o', '--output', required=True, metavar='DIR',
+                        help='The directory to write the compact grammar '
+                             'files to.')
+    arguments = parser.parse_args(sys.argv[2:] if args is None else args)
+    if os.path.realpath(arguments.output) == os.path.realpath(arguments.grammar):
+        parser.error('the --output directory must not be the grammar directory.')
+    return arguments
@@ -0,0 +1,313 @@
+import argparse
+import struct
+import sys
+
+from array import array
+from collections import OrderedDict, namedtuple
+from pathlib import Path
+
+from owl2types import hash_sources, replace_file
+
+
+# The layout of a lexicon index, see build_lexicon_index: the magic and
+# version, a byte order mark, the numbers of strings, string bytes, word
+# forms, entries, macro and family references, and the digest of the
+# grammar files.
+LEXICON_INDEX_MAGIC = b'O2TLEXI\0'
+LEXICON_INDEX_VERSION = 1
+LEXICON_INDEX_HEADER = struct.Struct('<8sII6I32s')
+LEXICON_BYTE_ORDER = 0x01020304 if sys.byteorder == 'little' else 0x04030201
+LEXICON_NONE = 0xFFFFFFFF
+
+
+def lexicon(args=None):
+    """Looks up word forms in an index of the morph.xml and lexicon.xml of
+    a grammar.
+
+    This is the lexicon command of owl2types:
+
+        owl2types lexicon --index english-cooking/lexicon.idx \\
+                          --morph english-cooking/morph.xml \\
+                          --lexicon english-cooking/lexicon.xml drives
+
+    With --morph and --lexicon, the index is built first, unless it was
+    built from the same files before, see build_lexicon_index. Each morph
+    entry of each word is printed as one line of tab separated values: the
+    word, the stem, the part of speech, the class, the macros and the
+    families of the entry. If a word has no entries, the exit status is 1.
+    """
+    arguments = parse_lexicon_args(args)
+    try:
+        if arguments.morph is not None:
+            if build_lexicon_index(arguments.morph, arguments.lexicon, arguments.index):
+                print(f'owl2types: built {arguments.index}', file=sys.stderr)
+        with LexiconIndex(arguments.index) as index:
+            found = True
+            for word in arguments.words:
+                entries = index.lookup(word)
+                found = found and bool(entries)
+                for entry in entries:
+                    print('\t'.join([entry.word, entry.stem, entry.pos, entry.cls or '',
+                                     ' '.join(entry.macros), ' '.join(entry.families)]))
+    except (OSError, SyntaxError, ValueError) as error:
+        sys.exit(f'owl2types: {error}')
+    if not found:
+        sys.exit(1)
+
+
+LexiconEntry = namedtuple('LexiconEntry', 'word stem pos cls macros families')
+
+
+def read_lexicon_entries(morph, lexicon):
+    """Reads the morph entries of a grammar and the lexicon families they
+    belong to.
+
+    An entry belongs to the families of its part of speech, and to those
+    with members only if its stem is one of the members. Whether a family
+    is marked as closed does not matter, as ccg2xml marks all families as
+    closed.
+
+    Args:
+        morph: The morph.xml.
+        lexicon: The lexicon.xml.
+
+    Returns:
+        A list of LexiconEntry, in the order of the morph.xml.
+
+    Raises:
+        SyntaxError: If a file is not well-formed XML.
+    """
+    import xml.etree.ElementTree as ET
+
+    open_families = {}
+    closed_families = {}
+    family = None
+    members = []
+    for event, element in ET.iterparse(lexicon, ('start', 'end')):
+        if event == 'start' and element.tag == 'family':
+            family = element.get('name')
+        elif event == 'start' and element.tag == 'member' and family is not None:
+            members.append(element.get('stem'))
+        elif event == 'end' and element.tag == 'family':
+            if members:
+                for stem in members:
+                    closed_families.setdefault(element.get('pos'), {}).setdefault(stem, []).append(family)
+            else:
+                open_families.setdefault(element.get('pos'), []).append(family)
+            family = None
+            members = []
+            element.clear()
+
+    entries = []
+    for _, element in ET.iterparse(morph):
+        if element.tag != 'entry':
+            continue
+        word = element.get('word')
+        stem = element.get('stem') or word
+        pos = element.get('pos')
+        families = open_families.get(pos, []) + closed_families.get(pos, {}).get(stem, [])
+        entries.append(LexiconEntry(word, stem, pos, element.get('class'), element.get('macros', '').split(),
+                                    list(OrderedDict.fromkeys(families))))
+        element.clear()
+    return entries
+
+
+def build_lexicon_index(morph, lexicon, index):
+    """Compiles the morph.xml and lexicon.xml of a grammar into an index
+    file for LexiconIndex, unless the index was built from the same files.
+
+    All strings are stored once, sorted, so that their IDs are in the
+    order of the strings. The word forms are a sorted array of string IDs,
+    each with the range of its entries; each entry is an array of the IDs
+    of its stem, part of speech and class, with the ranges of its macros
+    and families. All numbers are unsigned 32 bit integers.
+
+    Args:
+        morph: The morph.xml.
+        lexicon: The lexicon.xml.
+        index: The index file.
+
+    Returns:
+        Whether the index was built.
+    """
+    digest = hash_sources([Path(morph), Path(lexicon)], 'lexicon', str(LEXICON_INDEX_VERSION))
+    try:
+        with LexiconIndex(index) as existing:
+            if existing.digest == digest:
+                return False
+    except (OSError, ValueError):
+        pass
+
+    entries = read_lexicon_entries(morph, lexicon)
+    strings = sorted(set(value for entry in entries
+                         for value in (entry.word, entry.stem, entry.pos, entry.cls, *entry.macros, *entry.families)
+                         if value is not None), key=lambda value: value.encode('utf-8'))
+    ids = {value: i for i, value in enumerate(strings)}
+    encoded = [value.encode('utf-8') for value in strings]
+    string_offsets = array('I', [0])
+    for value in encoded:
+        string_offsets.append(string_offsets[-1] + len(value))
+
+    entries = sorted(entries, key=lambda entry: ids[entry.word])
+    form_words = array('I')
+    form_offsets = array('I', [0])
+    records = array('I')
+    macro_offsets, macro_ids = array('I', [0]), array('I')
+    family_offsets, family_ids = array('I', [0]), array('I')
+    for i, entry in enumerate(entries):
+        if not form_words or form_words[-1] != ids[entry.word]:
+            if form_words:
+                form_offsets.append(i)
+            form_words.append(ids[entry.word])
+        records.extend([ids[entry.stem], ids[entry.pos], LEXICON_NONE if entry.cls is None else ids[entry.cls]])
+        macro_ids.extend(ids[macro] for macro in entry.macros)
+        macro_offsets.append(len(macro_ids))
+        family_ids.extend(ids[family] for family in entry.families)
+        family_offsets.append(len(family_ids))
+    if form_words:
+        form_offsets.append(len(entries))
+
+    blob = b''.join(encoded)
+    header = LEXICON_INDEX_HEADER.pack(LEXICON_INDEX_MAGIC, LEXICON_INDEX_VERSION, LEXICON_BYTE_ORDER,
+                                       len(strings), len(blob), len(form_words), len(entries),
+                                       len(macro_ids), len(family_ids), bytes.fromhex(digest))
+    chunks = [header, string_offsets.tobytes(), blob, b'\0' * (-len(blob) % 4)]
+    chunks.extend(values.tobytes() for values in [form_words, form_offsets, records, macro_offsets, macro_ids,
+                                                  family_offsets, family_ids])
+    replace_file(index, chunks, compare=False)
+    return True
+
+
+class LexiconIndex:
+    """Looks up word forms in an index built by build_lexicon_index.
+
+        with LexiconIndex('english-cooking/lexicon.idx') as index:
+            index.lookup('drives')
+
+    The index is mapped into memory and read in place, so opening it is
+    cheap however large it is, and a lookup is a binary search over the
+    sorted word forms.
+    """
+
+    def __init__(self, path):
+        """Maps the index into memory.
+
+        Raises:
+            ValueError: If the file is no index of this version.
+        """
+        import mmap
+
+        with open(path, 'rb') as f:
+            try:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError(f'{path} is no lexicon index') from None
+        try:
+            if len(self.map) < LEXICON_INDEX_HEADER.size:
+                raise ValueError(f'{path} is no lexicon index')
+            (magic, version, byte_order, strings, blob_size, forms, entries, macros, families,
+             digest) = LEXICON_INDEX_HEADER.unpack_from(self.map)
+            if magic != LEXICON_INDEX_MAGIC or version != LEXICON_INDEX_VERSION or byte_order != LEXICON_BYTE_ORDER:
+                raise ValueError(f'{path} is no lexicon index of this version')
+            self.digest = digest.hex()
+            view = memoryview(self.map)
+            self.views = []
+            position = LEXICON_INDEX_HEADER.size
+
+            def section(count, item=4):
+                nonlocal position
+                values = view[position:position + count * item]
+                position += count * item + (-count * item % 4)
+                self.views.append(values)
+                return values.cast('I') if item == 4 else values
+
+            self.string_offsets = section(strings + 1)
+            self.blob = section(blob_size, 1)
+            self.form_words = section(forms)
+            self.form_offsets = section(forms + 1)
+            self.records = section(entries * 3)
+            self.macro_offsets = section(entries + 1)
+            self.macro_ids = section(macros)
+            self.family_offsets = section(entries + 1)
+            self.family_ids = section(families)
+            self.views.extend([self.string_offsets, self.form_words, self.form_offsets, self.records,
+                               self.macro_offsets, self.macro_ids, self.family_offsets, self.family_ids, view])
+            if position > len(self.map):
+                raise ValueError(f'{path} is truncated')
+        except (ValueError, TypeError):
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self.form_words)
+
+    def close(self):
+        """Unmaps the index."""
+        for view in reversed(getattr(self, 'views', [])):
+            view.release()
+        self.views = []
+        self.map.close()
+
+    def string(self, i):
+        """Returns the string with the ID i."""
+        return str(self.blob[self.string_offsets[i]:self.string_offsets[i + 1]], 'utf-8')
+
+    def words(self):
+        """Returns all word forms, sorted."""
+        return [self.string(i) for i in self.form_words]
+
+    def lookup(self, word):
+        """Returns the morph entries of a word form as a list of
+        LexiconEntry, in the order of the morph.xml."""
+        key = word.encode('utf-8')
+        low, high = 0, len(self.form_words)
+        while low < high:
+            middle = (low + high) // 2
+            i = self.form_words[middle]
+            if bytes(self.blob[self.string_offsets[i]:self.string_offsets[i + 1]]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == len(self.form_words) or self.string(self.form_words[low]) != word:
+            return []
+        entries = []
+        for entry in range(self.form_offsets[low], self.form_offsets[low + 1]):
+            stem, pos, cls = self.records[3 * entry:3 * entry + 3]
+            entries.append(LexiconEntry(
+                word, self.string(stem), self.string(pos), None if cls == LEXICON_NONE else self.string(cls),
+                [self.string(i) for i in self.macro_ids[self.macro_offsets[entry]:self.macro_offsets[entry + 1]]],
+                [self.string(i) for i in self.family_ids[self.family_offsets[entry]:self.family_offsets[entry + 1]]]))
+        return entries
+
+
+def parse_lexicon_args(args=None):
+    """Defines and parses the command line arguments for the lexicon
+    command.
+
+    Args:
+        args: The arguments to parse, by default the command line arguments
+              after lexicon.
+
+    Returns:
+        The parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(prog='owl2types lexicon')
+    parser.add_argument('words', nargs='*', metavar='WORD',
+                        help='The word forms to look up.')
+    parser.add_argument('-i', '--index', required=True, metavar='FILE',
+                        help='The index file.')
+    parser.add_argument('-m', '--morph', default=None, metavar='FILE',
+                        help='The morph.xml to build the index from, if it '
+                             'changed since the index was built.')
+    parser.add_argument('-x', '--lexicon', default=None, metavar='FILE',
+                        help='The lexicon.xml to build the index from.')
+    arguments = parser.parse_args(sys.argv[2:] if args is None else args)
+    if (arguments.morph is None) != (arguments.lexicon is None):
+        parser.error('--morph and --lexicon are needed together.')
+    return arguments
@@ -0,0 +1,423 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+from collections import OrderedDict
+from pathlib import Path
+
+from owl2types import Converter, ResidentFiles, split_ontology_argument
+
+
+def serve(args=None):
+    """Runs a local conversion server.
+
+    This is the serve command of owl2types:
+
+        owl2types serve --port 8000 --workers 2
+
+    The server answers POST /convert with a JSON object of the options of
+    a Converter (ontologies, lookup, exclude_owl_thing, engine), the
+    format (xml or ccg) and optionally the ccg file to insert the features
+    into. Ontology files can be uploaded as files, an object of file names
+    and their base64 encoded contents; they are referred to by their names
+    in ontologies and can import each other, and are removed once the
+    conversion is done. The response is the types.xml or ccg file.
+    GET /stats returns the counters of the server as JSON, see
+    ConversionService.stats.
+
+    The conversions run in a pool of worker processes which have imported
+    owlready2 already and keep the files parsed by the stream engine.
+    The results are cached by the hash of the options and of all files of
+    the import closure, see Converter.digest.
+
+    Clients can only convert files inside the --root directories (the
+    working directory by default), and ontologies given by URL only with
+    --allow-remote. Imports of the converted files are still resolved like
+    for any conversion, online if they are not found in the lookup
+    directories, so the server should not be reachable by untrusted clients.
+    """
+    arguments = parse_serve_args(args)
+    service = ConversionService(arguments.workers, arguments.cache_size, arguments.roots, arguments.allow_remote)
+    server = conversion_server(service, arguments.host, arguments.port, arguments.socket, arguments.verbose)
+    address = arguments.socket or 'http://{}:{}'.format(*server.server_address[:2])
+    print(f'owl2types: serving on {address}', file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if arguments.socket:
+            os.unlink(arguments.socket)
+
+
+def conversion_server(service, host='127.0.0.1', port=0, socket=None, verbose=False):
+    """Creates the HTTP server of the serve command.
+
+    Args:
+        service: The ConversionService answering the requests.
+        host: The address to listen on.
+        port: The port to listen on, 0 picks a free one.
+        socket: The path of a Unix socket to listen on instead.
+        verbose: Whether to log each request to STDERR.
+
+    Returns:
+        The server, see socketserver.BaseServer.serve_forever.
+    """
+    import socketserver
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class ConversionHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/stats':
+                self.reply(200, json.dumps(service.stats(), indent=2), 'application/json')
+            else:
+                self.reply(404, json.dumps({'error': f'unknown path {self.path}'}), 'application/json')
+
+        def do_POST(self):
+            if self.path != '/convert':
+                return self.reply(404, json.dumps({'error': f'unknown path {self.path}'}), 'application/json')
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                output, hit = service.convert(request)
+            except BadRequest as error:
+                self.reply(400, json.dumps({'error': str(error)}), 'application/json')
+            except Exception as error:
+                self.reply(500, json.dumps({'error': f'{type(error).__name__}: {error}'}), 'application/json')
+            else:
+                content_type = 'application/xml' if request.get('format', 'xml') == 'xml' else 'text/plain'
+                self.reply(200, output, content_type, {'X-Owl2types-Cache': 'hit' if hit else 'miss'})
+
+        def reply(self, status, body, content_type, headers=None):
+            body = body.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            for header, value in (headers or {}).items():
+                self.send_header(header, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def address_string(self):
+            return self.client_address[0] if self.client_address else socket
+
+        def log_message(self, format, *args):
+            if verbose:
+                super().log_message(format, *args)
+
+    if socket is None:
+        return ThreadingHTTPServer((host, port), ConversionHandler)
+
+    class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    return UnixHTTPServer(socket, ConversionHandler)
+
+
+class BadRequest(ValueError):
+    """Raised by ConversionService.convert for invalid requests."""
+
+
+class ConversionService:
+    """Runs the conversions of the serve command in a pool of worker
+    processes and caches their results.
+
+    All workers are started right away and import owlready2, so that no
+    request has to wait for that.
+    """
+
+    def __init__(self, workers=1, cache_size=64, roots=('.',), remote=False):
+        """Starts the workers.
+
+        Args:
+            workers: The number of worker processes.
+            cache_size: The number of results to keep, the least recently
+                        used ones are dropped first.
+            roots: The directories whose files may be converted; the local
+                   ontologies and lookup directories of a request must be
+                   inside one of them.
+            remote: Whether requests may give ontologies by URL.
+        """
+        import multiprocessing
+        import tempfile
+        from concurrent.futures import ProcessPoolExecutor, wait
+
+        self.workers = workers
+        # Each worker waits for the others at the end of its initialization,
+        # so the warm-up tasks only finish once all workers are warm.
+        barrier = multiprocessing.get_context().Barrier(workers)
+        self.pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context(),
+                                        initializer=serve_worker_init, initargs=(barrier,))
+        wait([self.pool.submit(serve_worker, None) for _ in range(workers)])
+        self.roots = [os.path.realpath(root) for root in roots]
+        self.remote = remote
+        self.cache_size = cache_size
+        self.results = OrderedDict()
+        self.uploads = Path(tempfile.mkdtemp(prefix='owl2types-uploads-'))
+        self.upload_users = {}
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.counters = {'requests': 0, 'hits': 0, 'conversions': 0, 'errors': 0,
+                         'latency_ms': 0.0, 'max_latency_ms': 0.0}
+
+    def convert(self, request):
+        """Answers a conversion request, see serve.
+
+        Args:
+            request: The request as a dictionary.
+
+        Returns:
+            A tuple of the output and whether it was cached.
+
+        Raises:
+            BadRequest: If the request is invalid.
+        """
+        start = time.perf_counter()
+        hit = error = False
+        upload = None
+        try:
+            options, output_format, ccg, upload = self.options(request)
+            key = Converter(**options).digest(output_format, ccg)
+            with self.lock:
+                output = self.results.get(key)
+                if output is not None:
+                    self.results.move_to_end(key)
+            hit = output is not None
+            if not hit:
+                output = self.pool.submit(serve_worker, (options, output_format, ccg)).result()
+                with self.lock:
+                    self.results[key] = output
+                    while len(self.results) > self.cache_size:
+                        self.results.popitem(last=False)
+            return output, hit
+        except BaseException:
+            error = True
+            raise
+        finally:
+            if upload is not None:
+                self.release(upload)
+            latency = (time.perf_counter() - start) * 1000
+            with self.lock:
+                self.counters['requests'] += 1
+                self.counters['hits'] += hit
+                self.counters['conversions'] += not (hit or error)
+                self.counters['errors'] += error
+                self.counters['latency_ms'] += latency
+                self.counters['max_latency_ms'] = max(self.counters['max_latency_ms'], latency)
+
+    def options(self, request):
+        """Validates a request and stores its uploaded files.
+
+        Returns:
+            A tuple of the arguments for a Converter, the output format, the
+            ccg file and the directory of the uploaded files, or None. The
+            directory has to be released once the conversion is done, see
+            release.
+        """
+        import base64
+        import binascii
+
+        if not isinstance(request, dict):
+            raise BadRequest('the request must be a JSON object')
+        unknown = set(request) - {'ontologies', 'lookup', 'exclude_owl_thing', 'engine', 'format', 'ccg', 'files'}
+        if unknown:
+            raise BadRequest(f'unknown options {", ".join(sorted(unknown))}')
+        ontologies = request.get('ontologies')
+        lookup = request.get('lookup', [])
+        if not isinstance(ontologies, list) or not isinstance(lookup, list) or not ontologies \
+                or not all(isinstance(o, str) for o in ontologies + lookup):
+            raise BadRequest('ontologies and lookup must be lists of strings')
+        output_format = request.get('format', 'xml')
+        if output_format not in ('xml', 'ccg'):
+            raise BadRequest(f'unknown format {output_format}')
+        ccg = request.get('ccg', '')
+        if not isinstance(ccg, str):
+            raise BadRequest('ccg must be a string')
+        files = request.get('files', {})
+        for ontology in ontologies:
+            path, _ = split_ontology_argument(ontology)
+            if path.startswith(('http://', 'https://')):
+                if not self.remote:
+                    raise BadRequest(f'{path} is remote, which the server does not allow')
+            elif not isinstance(files, dict) or path not in files:
+                self.check_root(path)
+        for path in lookup:
+            self.check_root(path)
+        options = {'ontologies': ontologies, 'lookup': lookup,
+                   'exclude_owl_thing': bool(request.get('exclude_owl_thing', False)),
+                   'engine': request.get('engine', 'owlready2')}
+
+        if files:
+            try:
+                files = {name: base64.b64decode(content, validate=True) for name, content in sorted(files.items())}
+            except (AttributeError, TypeError, binascii.Error) as error:
+                raise BadRequest(f'files must map names to base64 contents: {error}')
+            if not all(name == Path(name).name and not name.startswith('.') for name in files):
+                raise BadRequest('uploaded files need plain file names')
+            directory = self.upload(files)
+            options['ontologies'] = [str(directory / filename) + (':' + prefix if prefix else '')
+                                     if filename in files else ontology
+                                     for ontology in ontologies
+                                     for filename, prefix in [split_ontology_argument(ontology)]]
+            options['lookup'] = [str(directory)] + lookup
+
+        else:
+            directory = None
+
+        try:
+            Converter(**options)
+        except ValueError as error:
+            if directory is not None:
+                self.release(directory)
+            raise BadRequest(str(error))
+        return options, output_format, ccg, directory
+
+    def check_root(self, path):
+        """Raises BadRequest unless path is inside one of the roots."""
+        path = os.path.realpath(path)
+        if not any(os.path.commonpath([root, path]) == root for root in self.roots):
+            raise BadRequest(f'{path} is outside of the directories the server converts files from')
+
+    def upload(self, files):
+        """Stores uploaded files in a directory named by their hash.
+
+        Requests which upload the same files at the same time share the
+        directory; it is removed when the last of them releases it, see
+        release.
+
+        Args:
+            files: A dictionary of file names and contents.
+
+        Returns:
+            The directory.
+        """
+        digest = hashlib.sha256()
+        for name, content in files.items():
+            digest.update(name.encode('utf-8') + b'\0' + hashlib.sha256(content).digest())
+        directory = self.uploads / digest.hexdigest()
+        with self.lock:
+            if directory not in self.upload_users:
+                directory.mkdir()
+                for name, content in files.items():
+                    (directory / name).write_bytes(content)
+            self.upload_users[directory] = self.upload_users.get(directory, 0) + 1
+        return directory
+
+    def release(self, directory):
+        """Removes a directory of uploaded files once no request uses it
+        anymore, see upload."""
+        import shutil
+
+        with self.lock:
+            self.upload_users[directory] -= 1
+            if not self.upload_users[directory]:
+                del self.upload_users[directory]
+                shutil.rmtree(directory, ignore_errors=True)
+
+    def stats(self):
+        """Returns the counters: the number of requests, of results taken
+        from the cache, of conversions and of errors, the summed up and the
+        maximum latency, and derived from them the throughput and the mean
+        latency."""
+        with self.lock:
+            stats = dict(self.counters)
+            stats['cached_results'] = len(self.results)
+        stats['workers'] = self.workers
+        stats['uptime_s'] = time.perf_counter() - self.started
+        stats['requests_per_s'] = stats['requests'] / stats['uptime_s']
+        stats['mean_latency_ms'] = stats['latency_ms'] / stats['requests'] if stats['requests'] else 0.0
+        return stats
+
+    def close(self):
+        """Stops the workers and removes the uploaded files."""
+        import shutil
+
+        self.pool.shutdown()
+        shutil.rmtree(self.uploads, ignore_errors=True)
+
+
+def serve_worker(conversion):
+    """Runs a conversion of the serve command in a worker process.
+
+    Args:
+        conversion: A tuple of the arguments for a Converter, the output
+                    format and the ccg file, or None to only start the
+                    worker.
+    """
+    if conversion is None:
+        return None
+    options, output_format, ccg = conversion
+    return Converter(**options, resident=serve_worker.resident).render(output_format, ccg)
+serve_worker.resident = None  # noqa
+
+
+def serve_worker_init(barrier=None):
+    """Prepares a worker process of the serve command.
+
+    Interrupts are left to the server, which stops the workers.
+
+    Args:
+        barrier: An optional multiprocessing.Barrier to wait at once the
+                 worker is ready, see ConversionService.
+    """
+    import signal
+    import owlready2  # noqa: F401
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    serve_worker.resident = ResidentFiles()
+    if barrier is not None:
+        barrier.wait()
+
+
+def parse_serve_args(args=None):
+    """Defines and parses the command line arguments for the serve command.
+
+    Args:
+        args: The arguments to parse, by default the command line arguments
+              after serve.
+
+    Returns:
+        The parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(prog='owl2types serve',
+                                     description='Runs a local conversion server. Clients can convert any '
+                                                 'ontology inside the --root directories, and the imports of '
+                                                 'those ontologies are downloaded if they are not found '
+                                                 'locally, so only let trusted clients reach the server.')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='The address to listen on, defaults to '
+                             '127.0.0.1.')
+    parser.add_argument('-p', '--port', default=8000, type=int,
+                        help='The port to listen on, defaults to 8000.')
+    parser.add_argument('-s', '--socket', default=None, metavar='PATH',
+                        help='Listen on a Unix socket instead.')
+    parser.add_argument('-w', '--workers', default=min(4, os.cpu_count() or 1),
+                        type=int, metavar='N',
+                        help='The number of worker processes, defaults to '
+                             'the number of CPUs, but at most 4.')
+    parser.add_argument('--cache-size', default=64, type=int, metavar='N',
+                        help='The number of results to keep, defaults to '
+                             '64.')
+    parser.add_argument('-r', '--root', action='append', default=[], dest='roots', metavar='DIR',
+                        help='A directory whose ontologies clients may '
+                             'convert, defaults to the working directory. '
+                             'Can be specified multiple times. Clients can '
+                             'read any ontology inside, so only give '
+                             'directories without private files.')
+    parser.add_argument('--allow-remote', action='store_true',
+                        help='Allow clients to convert ontologies given by '
+                             'URL, which the server then downloads.')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='Log each request.')
+    arguments = parser.parse_args(sys.argv[2:] if args is None else args)
+    if arguments.workers < 1:
+        parser.error('--workers needs at least one worker.')
+    if arguments.cache_size < 0:
+        parser.error('--cache-size cannot be negative.')
+    arguments.roots = arguments.roots or ['.']
+    return arguments
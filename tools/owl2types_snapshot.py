@@ -0,0 +1,172 @@
+import struct
+import sys
+
+from array import array
+
+from owl2types import ClassGraph, StreamedOntology
+
+
+# The layout of a graph snapshot, see iter_graph_snapshot: the magic and
+# version, a byte order mark, the numbers of names, classes, parent edges,
+# ontologies, prefixes and string bytes.
+GRAPH_SNAPSHOT_MAGIC = b'O2TGRPH\0'
+GRAPH_SNAPSHOT_VERSION = 1
+GRAPH_SNAPSHOT_HEADER = struct.Struct('<8sII6I')
+GRAPH_SNAPSHOT_BYTE_ORDER = 0x01020304 if sys.byteorder == 'little' else 0x04030201
+
+
+def iter_graph_snapshot(graph, ontologies, ontology_prefix_map):
+    """Generates a binary snapshot of a class graph, see GraphSnapshot.
+
+    After the header (GRAPH_SNAPSHOT_HEADER) follow the string table and
+    the CSR arrays of the ClassGraph as unsigned 32 bit integers. The strings
+    are the names of the graph, then the names and IRIs of the ontologies
+    and finally the names and prefixes of the prefix map; each is stored as
+    the range of its UTF-8 bytes in a blob, which is padded to four bytes.
+
+    Args:
+        graph: The ClassGraph.
+        ontologies: The list of used ontologies.
+        ontology_prefix_map: A prefix map as returned by load_ontologies.
+
+    Yields:
+        The bytes of the snapshot.
+    """
+    strings = list(graph.names)
+    strings.extend(value for o in ontologies for value in (o.name, o.base_iri))
+    strings.extend(value for item in ontology_prefix_map.items() for value in item)
+    encoded = [value.encode('utf-8') for value in strings]
+    string_offsets = array('I', [0])
+    for value in encoded:
+        string_offsets.append(string_offsets[-1] + len(value))
+    blob = b''.join(encoded)
+
+    yield GRAPH_SNAPSHOT_HEADER.pack(GRAPH_SNAPSHOT_MAGIC, GRAPH_SNAPSHOT_VERSION, GRAPH_SNAPSHOT_BYTE_ORDER,
+                                     len(graph.names), len(graph), len(graph.parent_ids), len(ontologies),
+                                     len(ontology_prefix_map), len(blob))
+    yield string_offsets.tobytes()
+    yield blob
+    yield b'\0' * (-len(blob) % 4)
+    for values in [graph.parent_offsets, graph.parent_ids, graph.child_offsets, graph.child_ids]:
+        yield array('I', values).tobytes()
+
+
+class GraphSnapshot:
+    """Reads a snapshot of a class graph written by iter_graph_snapshot.
+
+        with GraphSnapshot('types.graph') as snapshot:
+            snapshot.graph().is_subtype('slm-Cup', 'gs-Container')
+
+    The snapshot is mapped into memory, and the arrays of its graph are
+    views of the mapped file, so neither owlready2 nor any ontology is
+    needed. Only the names are decoded.
+    """
+
+    def __init__(self, path):
+        """Maps the snapshot into memory.
+
+        Raises:
+            ValueError: If the file is no graph snapshot of this version.
+        """
+        import mmap
+
+        with open(path, 'rb') as f:
+            try:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError(f'{path} is no graph snapshot') from None
+        try:
+            if len(self.map) < GRAPH_SNAPSHOT_HEADER.size:
+                raise ValueError(f'{path} is no graph snapshot')
+            (magic, version, byte_order, names, self.size, edges, ontologies, prefixes,
+             blob_size) = GRAPH_SNAPSHOT_HEADER.unpack_from(self.map)
+            if magic != GRAPH_SNAPSHOT_MAGIC or version != GRAPH_SNAPSHOT_VERSION \
+                    or byte_order != GRAPH_SNAPSHOT_BYTE_ORDER:
+                raise ValueError(f'{path} is no graph snapshot of this version')
+            view = memoryview(self.map)
+            self.views = [view]
+            position = GRAPH_SNAPSHOT_HEADER.size
+
+            def section(count, item=4):
+                nonlocal position
+                if position + count * item > len(self.map):
+                    raise ValueError(f'{path} is truncated')
+                values = view[position:position + count * item]
+                position += count * item + (-count * item % 4)
+                self.views.append(values)
+                if item == 4:
+                    values = values.cast('I')
+                    self.views.append(values)
+                return values
+
+            strings = names + 2 * ontologies + 2 * prefixes
+            string_offsets = section(strings + 1)
+            blob = section(blob_size, 1)
+            self.parent_offsets = section(names + 1)
+            self.parent_ids = section(edges)
+            self.child_offsets = section(names + 1)
+            self.child_ids = section(edges)
+
+            strings = str(blob, 'utf-8')
+            if len(strings) == blob_size:
+                # Only ASCII, byte offsets are character offsets.
+                strings = [strings[string_offsets[i]:string_offsets[i + 1]] for i in range(len(string_offsets) - 1)]
+            else:
+                strings = [str(blob[string_offsets[i]:string_offsets[i + 1]], 'utf-8')
+                           for i in range(len(string_offsets) - 1)]
+            self.names = strings[:names]
+            pairs = strings[names:]
+            self.ontologies = [StreamedOntology(pairs[i], pairs[i + 1]) for i in range(0, 2 * ontologies, 2)]
+            self.ontology_prefix_map = {pairs[i]: pairs[i + 1] for i in range(2 * ontologies, len(pairs), 2)}
+        except (ValueError, TypeError):
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def graph(self):
+        """Returns the ClassGraph of the snapshot. It reads from the mapped
+        file, so it can only be used until the snapshot is closed."""
+        return ClassGraph.from_arrays(list(self.names), self.size, self.parent_offsets, self.parent_ids,
+                                      self.child_offsets, self.child_ids)
+
+    def close(self):
+        """Unmaps the snapshot."""
+        for view in reversed(getattr(self, 'views', [])):
+            view.release()
+        self.views = []
+        self.map.close()
+
+    @staticmethod
+    def detect(path):
+        """Whether a file is a graph snapshot."""
+        try:
+            with open(path, 'rb') as f:
+                return f.read(len(GRAPH_SNAPSHOT_MAGIC)) == GRAPH_SNAPSHOT_MAGIC
+        except OSError:
+            return False
+
+
+def open_snapshot_argument(arguments):
+    """Opens the graph snapshot given instead of the ontologies, if any.
+
+    Args:
+        arguments: The parsed command line arguments, see
+                   add_ontology_arguments.
+
+    Returns:
+        A GraphSnapshot, or None if the ontologies are no snapshot.
+    """
+    snapshots = [o.path for o in arguments.ontologies if o.path is not None and GraphSnapshot.detect(o.path)]
+    if not snapshots:
+        return None
+    if len(arguments.ontologies) > 1:
+        sys.exit(f'owl2types: the graph snapshot {snapshots[0]} cannot be combined with other ontologies')
+    try:
+        return GraphSnapshot(snapshots[0])
+    except (OSError, ValueError) as error:
+        sys.exit(f'owl2types: {error}')
@@ -0,0 +1,44 @@
+import sys
+import tempfile
+import unittest
+
+from pathlib import Path
+
+from owl2types import Converter
+
+from test_export_types import SysOut
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'benchmarks'))
+
+from benchmark import compare, generate_ontologies  # noqa: E402
+
+
+def results(seconds, peak_bytes):
+    return {'scenarios': {'small': {'stages': {'graph': {'min_seconds': seconds, 'peak_bytes': peak_bytes}}}}}
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_generate(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = generate_ontologies(directory, classes=200, depth=5, fanout=3, multi=0.3, imports=3)
+            self.assertEqual(sorted(p.name for p in Path(directory).iterdir()),
+                             ['PartA.owl', 'PartB.owl', 'PartC.owl'])
+            graphs = {engine: Converter([str(path)], lookup=[directory], exclude_owl_thing=True,
+                                        engine=engine).graph()
+                      for engine in ['owlready2', 'stream']}
+        self.assertEqual(sorted(graphs['stream'].items()), sorted(graphs['owlready2'].items()))
+        graph = graphs['stream']
+        self.assertEqual(len(graph), 200)
+        self.assertEqual(sum(1 for _, parents in graph.items() if not parents), 1)
+        self.assertTrue(any(len(parents) == 2 for _, parents in graph.items()))
+
+    def test_compare(self):
+        with SysOut():
+            self.check_compare()
+
+    def check_compare(self):
+        self.assertEqual(compare(results(0.1, 10 ** 6), results(0.12, 10 ** 6)), [])
+        self.assertEqual(len(compare(results(0.1, 10 ** 6), results(0.2, 10 ** 6))), 1)
+        self.assertEqual(len(compare(results(0.1, 10 ** 6), results(0.1, 2 * 10 ** 6))), 1)
+        # Below the noise floor
+        self.assertEqual(compare(results(0.001, 1000), results(0.002, 2000)), [])
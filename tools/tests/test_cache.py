@@ -0,0 +1,81 @@
+import shutil
+import tempfile
+import unittest
+
+from pathlib import Path
+
+import owlready2
+
+from owl2types import (OntologyArgument, OntologyCache, import_closure, load_ontologies, owl2types,
+                       resolve_imports, unique_prefix)
+
+from test_export_types import TESTDATA, argv, owl, SysOut, parse_types, expected_types, compare_types
+
+
+def arguments(*owls):
+    """Creates OntologyArguments from `owl(...)` calls."""
+    unique_prefix.prefixes = []
+    return [OntologyArgument.argument(o) for o in owls]
+
+
+class TestImportClosure(unittest.TestCase):
+    def test_local_imports(self):
+        sources = import_closure(arguments(owl('complex_import_d', 'd')), [TESTDATA])
+        self.assertEqual([s.name for s in sources],
+                         ['complex_import_d.owl', 'complex_import_c.owl',
+                          'complex_import_a.owl', 'complex_import_b.owl'])
+
+    def test_no_imports(self):
+        sources = import_closure(arguments(owl('single_entry')), [TESTDATA])
+        self.assertEqual([s.name for s in sources], ['single_entry.owl'])
+
+    def test_import_graph(self):
+        graph = resolve_imports(arguments(owl('complex_import_d', 'd')), [TESTDATA])
+        self.assertEqual({source.name: [imported.name for imported in imports]
+                          for source, (_, imports) in graph.items()},
+                         {'complex_import_d.owl': ['complex_import_c.owl', 'complex_import_a.owl'],
+                          'complex_import_c.owl': ['complex_import_b.owl'],
+                          'complex_import_a.owl': [],
+                          'complex_import_b.owl': ['complex_import_a.owl']})
+
+
+class TestOntologyCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.data = self.directory / 'data'
+        shutil.copytree(TESTDATA, self.data)
+        owlready2.onto_path.insert(0, str(self.data))
+
+    def tearDown(self):
+        owlready2.onto_path.remove(str(self.data))
+        shutil.rmtree(self.directory)
+
+    def load(self):
+        ontology_arguments = arguments(f'{self.data}/simple_import_ext.owl:ext')
+        cache = OntologyCache(self.directory / 'cache', ontology_arguments)
+        ontologies, ontology_prefix_map = load_ontologies(ontology_arguments, cache)
+        cache.close()
+        return cache, [o.name for o in ontologies], ontology_prefix_map
+
+    def test_reuse(self):
+        cold, names, prefixes = self.load()
+        warm, warm_names, warm_prefixes = self.load()
+        self.assertFalse(cold.warm)
+        self.assertTrue(warm.warm)
+        self.assertEqual(names, warm_names)
+        self.assertEqual(prefixes, warm_prefixes)
+
+    def test_changed_import(self):
+        self.load()
+        imported = self.data / 'simple_import_base.owl'
+        imported.write_text(imported.read_text().replace('</rdf:RDF>', '<!-- changed --></rdf:RDF>'))
+        cache, _, _ = self.load()
+        self.assertFalse(cache.warm)
+
+    def test_output(self):
+        owls = (owl('complex_import_a', 'a'), owl('complex_import_b', 'b'),
+                owl('complex_import_c', 'c'), owl('complex_import_d', 'd'))
+        for _ in range(2):
+            with argv('--cache', str(self.directory / 'cache'), *owls), SysOut() as out:
+                owl2types()
+            self.assertTrue(compare_types(parse_types(out.getvalue()), expected_types('complex_import')))
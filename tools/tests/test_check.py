@@ -0,0 +1,82 @@
+import tempfile
+import unittest
+
+from pathlib import Path
+
+from owl2types import iter_type_references, owl2types
+
+from test_export_types import TESTDATA, owl, SysOut
+
+
+LEXICON = '''<?xml version="1.0" encoding="UTF-8"?>
+<ccg-lexicon name="test">
+  <family name="n" pos="N">
+    <entry name="Primary">
+      <lf>
+        <satop nomvar="X:test-Animal">
+          <diamond mode="test-relation"><nomvar name="Y:test-Horse" /></diamond>
+          <diamond mode="test-other"><nomvar name="Z" /></diamond>
+        </satop>
+      </lf>
+    </entry>
+  </family>
+</ccg-lexicon>
+'''
+
+MORPH = '''<?xml version="1.0" encoding="UTF-8"?>
+<morph name="test">
+  <entry pos="N" word="mule" class="test-Mule" />
+  <entry pos="N" word="donkey" class="test-donkey" />
+  <entry pos="N" word="unicorn" class="test-Unicorn" />
+  <entry pos="N" word="the" />
+</morph>
+'''
+
+
+class TestCheck(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name)
+        (self.path / 'lexicon.xml').write_text(LEXICON)
+        (self.path / 'morph.xml').write_text(MORPH)
+        (self.path / 'types.xml').write_text((TESTDATA / 'multi_inheritance.xml').read_text().replace(
+            '</types>', '    <type name="test-Unicorn" parents="test-Horse" />\n</types>'))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def check(self, *options):
+        args = ['check', '--engine', 'stream', '--exclude-owl-thing', '--lookup', str(TESTDATA),
+                '--grammar', str(self.path / 'lexicon.xml'), '--grammar', str(self.path / 'morph.xml'),
+                *options, owl('multi_inheritance')]
+        with SysOut() as out:
+            try:
+                owl2types(args)
+            except SystemExit as exit:
+                return out.getvalue().splitlines(), exit.code
+        return out.getvalue().splitlines(), 0
+
+    def test_references(self):
+        self.assertEqual(list(iter_type_references(self.path / 'lexicon.xml')),
+                         [(6, 'test-Animal'), (7, 'test-Horse')])
+        self.assertEqual([name for _, name in iter_type_references(self.path / 'morph.xml')],
+                         ['test-Mule', 'test-donkey', 'test-Unicorn'])
+
+    def test_check(self):
+        morph = self.path / 'morph.xml'
+        self.assertEqual(self.check(), ([f'{morph}:4: unknown type test-donkey, did you mean test-Donkey?',
+                                         f'{morph}:5: unknown type test-Unicorn'], 1))
+
+    def test_previous(self):
+        lines, status = self.check('--previous', f'xml:{self.path / "types.xml"}')
+        self.assertEqual(lines[1], f'{self.path / "morph.xml"}:5: type test-Unicorn was removed from the ontologies')
+        self.assertEqual(status, 1)
+
+    def test_valid(self):
+        (self.path / 'morph.xml').write_text(MORPH.replace('test-donkey', 'test-Donkey').replace('test-Unicorn', ''))
+        self.assertEqual(self.check(), ([], 0))
+
+    def test_malformed(self):
+        (self.path / 'morph.xml').write_text(MORPH[:-10])
+        lines, status = self.check()
+        self.assertIn('cannot check', status)
@@ -0,0 +1,131 @@
+import sys
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from owl2types import owl2types
+from owl2types_compact import compact_grammar_xml
+from owl2types_lexicon import read_lexicon_entries
+
+from test_lexicon import GRAMMAR
+
+
+MORPH = '''<?xml version="1.0" encoding="UTF-8"?>
+<!-- A license header -->
+<morph name="test">
+  <!-- <entry pos="N" word="unicorn" /> -->
+  <entry pos="N" word="mule" class="test-Mule" macros="@num.sg" />
+  <entry word="mule" pos="N" class="test-Mule" macros="@num.sg"></entry>
+  <entry pos="N" word="mules" stem="mule" class="test-Mule" macros="@num.pl" />
+  <macro name="@num.sg"><fs id="2" attr="num" val="sg"/></macro>
+  <macro name="@num.sg"><fs id="2" attr="num" val="sg"/></macro>
+  <macro name="@num.pl"><fs id="2" attr="num" val="pl"/></macro>
+</morph>
+'''
+
+LEXICON = '''<?xml version="1.0" encoding="UTF-8"?>
+<ccg-lexicon name="test">
+  <family pos="V" name="v.trans" closed="true">
+    <member stem="kick" />
+    <member stem="kick" />
+    <entry name="Primary"><complexcat><atomcat type="s"/></complexcat></entry>
+  </family>
+  <family pos="V" name="v.trans" closed="true">
+    <member stem="kick" />
+    <entry name="Primary"><complexcat><atomcat type="s"/></complexcat></entry>
+  </family>
+  <family pos="V" name="v.intrans" closed="true">
+    <entry name="Primary"><complexcat><atomcat type="s"/></complexcat></entry>
+    <member stem="kick" />
+  </family>
+</ccg-lexicon>
+'''
+
+
+def canonical(element):
+    """Returns the names, attributes, text and children of an element."""
+    return (element.tag, sorted(element.attrib.items()), (element.text or '').strip(),
+            [canonical(child) for child in element])
+
+
+class TestCompact(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name)
+        self.grammar, self.output = self.path / 'grammar', self.path / 'deploy'
+        self.grammar.mkdir()
+        (self.grammar / 'morph.xml').write_text(MORPH)
+        (self.grammar / 'lexicon.xml').write_text(LEXICON)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def compact(self, *args):
+        with patch.object(sys, 'stderr', StringIO()) as err:
+            owl2types(['compact', '--output', str(self.output), str(self.grammar), *args])
+        return err.getvalue().splitlines()
+
+    def test_morph(self):
+        data, elements, duplicates = compact_grammar_xml(self.grammar / 'morph.xml')
+        self.assertEqual((elements, duplicates), (6, 2))
+        self.assertNotIn(b'<!--', data)
+        self.assertNotIn(b'unicorn', data)
+        self.assertEqual(data.count(b'word="mule"'), 1)
+        self.assertIn(b'<entry pos="N" word="mule" class="test-Mule" macros="@num.sg"/>', data)
+        self.assertEqual(data.count(b'<macro name="@num.sg">'), 1)
+
+    def test_families(self):
+        data, elements, duplicates = compact_grammar_xml(self.grammar / 'lexicon.xml')
+        root = ET.fromstring(data)
+        self.assertEqual([family.get('name') for family in root], ['v.trans', 'v.intrans'])
+        self.assertEqual(len(root[0].findall('member')), 1)
+        self.assertEqual((elements, duplicates), (10, 2))
+
+    def test_escaping(self):
+        (self.grammar / 'testbed.xml').write_text(
+            '<regression><item string="a &lt;b&gt; &amp; &quot;c&quot;&#10;d" numOfParses="1">x &amp; y</item>'
+            '<?stylesheet type="text/xsl"?></regression>')
+        data, _, _ = compact_grammar_xml(self.grammar / 'testbed.xml')
+        original = ET.parse(self.grammar / 'testbed.xml').getroot()
+        self.assertEqual(canonical(ET.fromstring(data)), canonical(original))
+        self.assertIn(b'<?stylesheet type="text/xsl"?>', data)
+
+    def test_invalid(self):
+        (self.grammar / 'rules.xml').write_text('<rules><typechanging></rules>')
+        with self.assertRaises(SyntaxError):
+            compact_grammar_xml(self.grammar / 'rules.xml')
+        with self.assertRaises(SystemExit):
+            self.compact()
+
+    def test_command(self):
+        report = self.compact()
+        self.assertEqual(sorted(p.name for p in self.output.iterdir()), ['lexicon.xml', 'morph.xml'])
+        self.assertEqual(len(report), 3)
+        self.assertIn('removed 2 duplicates of 6 entries', report[1])
+        self.assertTrue(report[2].startswith('owl2types: compacted 2 files, '))
+
+        mtime = (self.output / 'morph.xml').stat().st_mtime_ns
+        self.compact()
+        self.assertEqual((self.output / 'morph.xml').stat().st_mtime_ns, mtime)
+
+        with patch.object(sys, 'stderr', StringIO()), self.assertRaises(SystemExit):
+            owl2types(['compact', '--output', str(self.grammar), str(self.grammar)])
+
+    def test_grammar(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with patch.object(sys, 'stderr', StringIO()):
+                owl2types(['compact', '--output', directory, str(GRAMMAR)])
+            for path in GRAMMAR.glob('*.xml'):
+                self.assertLess((Path(directory) / path.name).stat().st_size, path.stat().st_size)
+            entries = read_lexicon_entries(GRAMMAR / 'morph.xml', GRAMMAR / 'lexicon.xml')
+            compacted = read_lexicon_entries(Path(directory, 'morph.xml'), Path(directory, 'lexicon.xml'))
+        unique = []
+        for entry in entries:
+            if entry not in unique:
+                unique.append(entry)
+        self.assertLess(len(unique), len(entries))
+        self.assertEqual(compacted, unique)
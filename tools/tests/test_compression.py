@@ -0,0 +1,96 @@
+import gzip
+import lzma
+import shutil
+import sys
+import tempfile
+import unittest
+
+from pathlib import Path
+from unittest.mock import patch
+
+from owl2types import Converter, locate_ontology, open_source, owl2types, read_hierarchy, replace_file
+
+from test_export_types import TESTDATA, SysOut
+
+
+def zstd_available():
+    """Whether zstd files can be read and written."""
+    try:
+        from compression import zstd  # noqa: F401
+    except ImportError:
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            return False
+    return True
+
+
+class TestCompression(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name)
+        self.plain = self.path / 'plain'
+        self.compressed = self.path / 'compressed'
+        self.plain.mkdir()
+        self.compressed.mkdir()
+        for name in ['simple_import_base', 'simple_import_ext']:
+            shutil.copy(TESTDATA / f'{name}.owl', self.plain)
+        (self.compressed / 'simple_import_ext.owl.gz').write_bytes(
+            gzip.compress((TESTDATA / 'simple_import_ext.owl').read_bytes()))
+        (self.compressed / 'simple_import_base.owl.xz').write_bytes(
+            lzma.compress((TESTDATA / 'simple_import_base.owl').read_bytes()))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def convert(self, directory, name, engine):
+        converter = Converter([f'{directory / name}:ext'], lookup=[directory], exclude_owl_thing=True, engine=engine)
+        return converter.render('xml')
+
+    def test_open_source(self):
+        for name in ['simple_import_ext.owl.gz', 'simple_import_base.owl.xz']:
+            with open_source(self.compressed / name) as f:
+                self.assertEqual(f.read(), (TESTDATA / name.rsplit('.', 1)[0]).read_bytes())
+
+    def test_lookup(self):
+        self.assertEqual(locate_ontology('http://example.org/simple_import_base.owl', [self.compressed]),
+                         self.compressed / 'simple_import_base.owl.xz')
+        shutil.copy(TESTDATA / 'simple_import_base.owl', self.compressed)
+        self.assertEqual(locate_ontology('http://example.org/simple_import_base.owl', [self.compressed]),
+                         self.compressed / 'simple_import_base.owl')
+
+    def test_inputs(self):
+        for engine in ['owlready2', 'sql', 'stream']:
+            with self.subTest(engine=engine):
+                self.assertEqual(self.convert(self.compressed, 'simple_import_ext.owl.gz', engine),
+                                 self.convert(self.plain, 'simple_import_ext.owl', engine))
+
+    def test_output(self):
+        expected = self.convert(self.plain, 'simple_import_ext.owl', 'stream')
+        for suffix, decompress in [('.gz', gzip.decompress), ('.xz', lzma.decompress)]:
+            with self.subTest(suffix=suffix):
+                output = self.path / f'types.xml{suffix}'
+                args = ['--exclude-owl-thing', '--engine', 'stream', '--lookup', str(self.plain),
+                        '--output', str(output), f'{self.plain}/simple_import_ext.owl:ext']
+                owl2types(args)
+                self.assertEqual(decompress(output.read_bytes()).decode('utf-8'), expected)
+                self.assertEqual(sorted(read_hierarchy(str(output), 'xml')), ['ext-ChildThing', 'ext-ParentThing'])
+
+                mtime = output.stat().st_mtime_ns
+                owl2types(args + ['--in-place'])
+                self.assertEqual(output.stat().st_mtime_ns, mtime)
+
+    def test_ccg_output(self):
+        with patch.object(sys, 'stderr'), self.assertRaises(SystemExit):
+            owl2types(['--format', 'ccg', '--output', str(self.path / 'grammar.ccg.gz'),
+                       f'{self.plain}/simple_import_ext.owl'])
+
+    @unittest.skipUnless(zstd_available(), 'needs Python 3.14 or the zstandard package')
+    def test_zstd(self):
+        output = self.path / 'simple_import_base.owl.zst'
+        replace_file(str(output), [(TESTDATA / 'simple_import_base.owl').read_bytes()])
+        with open_source(output) as f:
+            self.assertEqual(f.read(), (TESTDATA / 'simple_import_base.owl').read_bytes())
+        with SysOut() as out:
+            owl2types(['--exclude-owl-thing', '--engine', 'stream', f'{output}:sib'])
+        self.assertIn('sib-ParentThing', out.getvalue())
@@ -0,0 +1,62 @@
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+
+import owlready2
+
+from owl2types import Converter, ClassGraph, owl2types, unique_prefix
+
+from test_export_types import TESTDATA, argv, owl, SysOut
+
+
+def convert(*owls, engine='owlready2', output_format='xml'):
+    """Converts with the Converter, with the same options as argv."""
+    converter = Converter(owls, lookup=[TESTDATA], exclude_owl_thing=True, engine=engine)
+    return converter.render(output_format)
+
+
+def convert_cli(*owls, engine='owlready2', output_format='xml'):
+    """Converts with the command line."""
+    with argv('--engine', engine, '--format', output_format, *owls), SysOut() as out:
+        owl2types()
+    return out.getvalue()[:-1]
+
+
+class TestConverter(unittest.TestCase):
+    def test_same_as_command_line(self):
+        owls = [owl('multi_onto_A', 'A'), owl('simple_import_ext', 'ext')]
+        for engine in ['owlready2', 'sql', 'stream']:
+            for output_format in ['xml', 'ccg']:
+                with self.subTest(engine=engine, output_format=output_format):
+                    self.assertEqual(convert(*owls, engine=engine, output_format=output_format),
+                                     convert_cli(*owls, engine=engine, output_format=output_format))
+
+    def test_graph(self):
+        graph = Converter([owl('multi_inheritance')], lookup=[TESTDATA], exclude_owl_thing=True).graph()
+        self.assertIsInstance(graph, ClassGraph)
+        self.assertTrue(graph.is_subtype('test-Mule', 'test-Animal'))
+
+    def test_no_global_state(self):
+        unique_prefix.prefixes = ['test']
+        onto_path = list(owlready2.onto_path)
+        ontologies = dict(owlready2.default_world.ontologies)
+        convert(owl('simple_import_ext'))
+        self.assertEqual(unique_prefix.prefixes, ['test'])
+        self.assertEqual(owlready2.onto_path, onto_path)
+        self.assertEqual(owlready2.default_world.ontologies, ontologies)
+
+    def test_repeated(self):
+        expected = convert(owl('simple_import_base', 'base'), owl('simple_import_ext', 'ext'))
+        for _ in range(3):
+            self.assertEqual(convert(owl('simple_import_base', 'base'), owl('simple_import_ext', 'ext')), expected)
+
+    def test_threads(self):
+        fixtures = [[owl('multi_inheritance')],
+                    [owl('multi_onto_A', 'A'), owl('multi_onto_B', 'B')],
+                    [owl('simple_import_base', 'base'), owl('simple_import_ext', 'ext')]]
+        for engine in ['owlready2', 'stream']:
+            with self.subTest(engine=engine):
+                expected = [convert(*owls, engine=engine) for owls in fixtures]
+                with ThreadPoolExecutor(6) as pool:
+                    actual = list(pool.map(lambda owls: convert(*owls, engine=engine), fixtures * 4))
+                self.assertEqual(actual, expected * 4)
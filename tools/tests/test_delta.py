@@ -0,0 +1,102 @@
+import json
+import os
+import tempfile
+import unittest
+
+from pathlib import Path
+
+from owl2types import Converter, owl2types, parse_ccg_hierarchy, read_hierarchy
+
+from test_export_types import TESTDATA, argv, owl, SysOut
+from test_writer import run_owl2types
+
+
+HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n<!-- A hand-written header. <type name="test-Commented" /> -->\n'
+
+
+class TestDelta(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name)
+        self.types = self.path / 'types.xml'
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def convert(self, *options):
+        with argv('--engine', 'stream', '--output', str(self.types), *options, owl('multi_inheritance')), \
+                SysOut() as out:
+            owl2types()
+        return out.getvalue()
+
+    def outdated(self):
+        """Writes a types.xml with one removed, one reparented and one
+        additional type."""
+        expected = (TESTDATA / 'multi_inheritance.xml').read_text()
+        self.types.write_text(HEADER + expected[expected.index('<types'):]
+                              .replace('    <type name="test-Horse" parents="test-Animal" />\n', '')
+                              .replace('"test-Donkey test-Horse"', '"test-Donkey"')
+                              .replace('</types>', '    <type name="test-Unicorn" parents="test-Horse" />\n</types>'))
+
+    def test_read_hierarchy(self):
+        self.convert()
+        self.assertEqual(read_hierarchy(self.types, 'xml'),
+                         {'test-Animal': [], 'test-Donkey': ['test-Animal'], 'test-Horse': ['test-Animal'],
+                          'test-Mule': ['test-Donkey', 'test-Horse']})
+        self.assertIsNone(read_hierarchy(self.path / 'missing.xml', 'xml'))
+        self.assertEqual(read_hierarchy(TESTDATA / 'empty.ccg', 'ccg'), {})
+
+    def test_parse_ccg(self):
+        for name in ['multi_inheritance', 'multi_branch', 'single_branch']:
+            with self.subTest(name=name):
+                converter = Converter([owl(name)], lookup=[TESTDATA], exclude_owl_thing=True, engine='stream')
+                classes = parse_ccg_hierarchy(converter.render('ccg'))
+                self.assertEqual({cls: set(parents) for cls, parents in classes.items()},
+                                 {cls: set(parents) for cls, parents in converter.graph().items()})
+
+    def test_delta(self):
+        self.outdated()
+        delta = json.loads(self.convert('--delta', '-').splitlines()[0])
+        self.assertEqual(delta['targets'], [{
+            'format': 'xml', 'output': str(self.types),
+            'added': {'test-Horse': ['test-Animal']},
+            'removed': ['test-Unicorn'],
+            'reparented': {'test-Mule': {'old': ['test-Donkey'], 'new': ['test-Donkey', 'test-Horse']}}}])
+        delta = json.loads(self.convert('--delta', '-').splitlines()[0])
+        self.assertEqual(delta['targets'][0]['reparented'], {})
+
+    def test_in_place(self):
+        self.outdated()
+        self.convert('--in-place')
+        patched = self.types.read_text()
+        self.assertTrue(patched.startswith(HEADER))
+        self.assertNotIn('test-Unicorn', patched)
+        self.assertEqual(dict(read_hierarchy(self.types, 'xml')),
+                         dict(read_hierarchy(TESTDATA / 'multi_inheritance.xml', 'xml')))
+        mtime = self.types.stat().st_mtime_ns
+        self.convert('--in-place')
+        self.assertEqual(self.types.stat().st_mtime_ns, mtime)
+
+    def test_parent_order(self):
+        self.convert()
+        self.types.write_text(self.types.read_text().replace('"test-Donkey test-Horse"', '"test-Horse test-Donkey"'))
+        mtime = self.types.stat().st_mtime_ns
+        self.convert('--in-place')
+        self.assertEqual(self.types.stat().st_mtime_ns, mtime)
+
+    def test_hash_seed(self):
+        self.outdated()
+        args = ['--exclude-owl-thing', '--engine', 'stream', '--lookup', str(TESTDATA), '--output', str(self.types),
+                '--in-place', '--delta', '-', owl('multi_inheritance')]
+        run_owl2types(*args, seed=1)
+        patched = self.types.read_bytes()
+        self.assertIn(b'parents="test-Donkey test-Horse"', patched)
+        os.utime(self.types, ns=(0, 0))
+        delta = json.loads(run_owl2types(*args, seed=2).stdout.splitlines()[0])
+        self.assertEqual(delta['targets'][0]['reparented'], {})
+        self.assertEqual(self.types.stat().st_mtime_ns, 0)
+        self.assertEqual(self.types.read_bytes(), patched)
+
+    def test_stdout(self):
+        with argv('--delta', 'delta.json', owl('multi_inheritance')), self.assertRaises(SystemExit):
+            owl2types()
@@ -0,0 +1,160 @@
+import random
+import sys
+import tempfile
+import unittest
+
+from io import StringIO
+from pathlib import Path
+
+from unittest.mock import patch
+
+from owl2types import ClassGraph, owl2types, reduce_classes
+
+from test_export_types import TESTDATA, owl, SysOut
+
+
+MULE = {
+    'test-Animal': set(),
+    'test-Donkey': {'test-Animal'},
+    'test-Horse': {'test-Animal'},
+    'test-Mule': ['test-Donkey', 'test-Horse'],
+}
+
+REDUNDANT = '''<?xml version="1.0"?>
+<rdf:RDF xmlns:owl="http://www.w3.org/2002/07/owl#"
+         xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+         xmlns:rdfs="http://www.w3.org/2000/01/rdf-schema#"
+         xml:base="http://example.org/redundant.owl">
+    <owl:Ontology rdf:about="http://example.org/redundant.owl"/>
+    <owl:Class rdf:about="#Animal"/>
+    <owl:Class rdf:about="#Horse">
+        <rdfs:subClassOf rdf:resource="#Animal"/>
+    </owl:Class>
+    <owl:Class rdf:about="#Pony">
+        <rdfs:subClassOf rdf:resource="#Horse"/>
+    </owl:Class>
+    <owl:Class rdf:about="#Shetland">
+        <rdfs:subClassOf rdf:resource="#Pony"/>
+        <rdfs:subClassOf rdf:resource="#Animal"/>
+    </owl:Class>
+</rdf:RDF>
+'''
+
+
+def query(*args):
+    """Runs the query command with args, returns its output and exit status."""
+    argv = ['owl2types', 'query', '--exclude-owl-thing', '--engine', 'stream', '--lookup', str(TESTDATA), *args]
+    status = 0
+    with patch.object(sys, 'argv', argv), SysOut() as out:
+        try:
+            owl2types()
+        except SystemExit as exit:
+            status = exit.code
+    return out.getvalue().splitlines(), status
+
+
+class TestClassGraph(unittest.TestCase):
+    def test_adjacency(self):
+        graph = ClassGraph(MULE)
+        self.assertEqual(len(graph), 4)
+        self.assertEqual(list(graph.items()), [(name, list(parents)) for name, parents in MULE.items()])
+        self.assertEqual(graph.parents('test-Mule'), ['test-Donkey', 'test-Horse'])
+        self.assertEqual(graph.children('test-Animal'), ['test-Donkey', 'test-Horse'])
+        self.assertEqual(list(graph.parent_offsets), [0, 0, 1, 2, 4])
+        self.assertEqual(list(graph.child_offsets), [0, 2, 3, 4, 4])
+
+    def test_closure(self):
+        graph = ClassGraph(MULE)
+        self.assertEqual(graph.ancestors('test-Mule'), ['test-Animal', 'test-Donkey', 'test-Horse'])
+        self.assertEqual(graph.descendants('test-Animal'), ['test-Donkey', 'test-Horse', 'test-Mule'])
+        self.assertTrue(graph.is_subtype('test-Mule', 'test-Animal'))
+        self.assertTrue(graph.is_subtype('test-Horse', 'test-Horse'))
+        self.assertFalse(graph.is_subtype('test-Horse', 'test-Donkey'))
+        self.assertFalse(graph.is_subtype('test-Animal', 'test-Mule'))
+
+    def test_undeclared_parent(self):
+        graph = ClassGraph({'a-A': {'owl-Thing'}, 'a-B': {'a-A'}})
+        self.assertEqual(len(graph), 2)
+        self.assertIn('owl-Thing', graph)
+        self.assertEqual(graph.ancestors('a-B'), ['a-A', 'owl-Thing'])
+        self.assertEqual(graph.children('owl-Thing'), ['a-A'])
+
+    def test_cycle(self):
+        graph = ClassGraph({'a-A': {'a-C'}, 'a-B': {'a-A'}, 'a-C': {'a-B'}, 'a-D': {'a-C'}})
+        self.assertEqual(graph.ancestors('a-D'), ['a-A', 'a-B', 'a-C'])
+        self.assertTrue(graph.is_subtype('a-A', 'a-B'))
+        self.assertEqual(graph.descendants('a-A'), ['a-A', 'a-B', 'a-C', 'a-D'])
+
+    def test_deep_hierarchy(self):
+        graph = ClassGraph({f'a-C{i}': {f'a-C{i - 1}'} if i else set() for i in range(5000)})
+        self.assertTrue(graph.is_subtype('a-C4999', 'a-C0'))
+        self.assertEqual(len(graph.ancestors('a-C4999')), 4999)
+
+
+class TestReduce(unittest.TestCase):
+    def test_redundant_parents(self):
+        classes = {'a-A': set(), 'a-B': {'a-A'}, 'a-C': {'a-B', 'a-A'}, 'a-D': ['a-C', 'a-A', 'a-B'], 'a-E': ['a-B']}
+        self.assertEqual(ClassGraph(classes).redundant_parents(), {'a-C': {'a-A'}, 'a-D': {'a-A', 'a-B'}})
+        reduced, removed = reduce_classes(classes)
+        self.assertEqual(reduced, {'a-A': set(), 'a-B': {'a-A'}, 'a-C': {'a-B'}, 'a-D': ['a-C'], 'a-E': ['a-B']})
+        self.assertEqual(removed, 3)
+
+    def test_cycle(self):
+        classes = {'a-A': {'a-B'}, 'a-B': {'a-A'}, 'a-C': ['a-A', 'a-B'], 'a-D': ['a-C', 'a-A']}
+        self.assertEqual(ClassGraph(classes).redundant_parents(), {'a-D': {'a-A'}})
+
+    def test_same_ancestors(self):
+        generator = random.Random(0)
+        classes = {f'a-C{i}': {f'a-C{generator.randrange(i)}' for _ in range(generator.randint(1, 4))} if i else set()
+                   for i in range(500)}
+        graph = ClassGraph(classes)
+        reduced, removed = reduce_classes(classes)
+        reduced_graph = ClassGraph(reduced)
+        self.assertGreater(removed, 0)
+        self.assertEqual(len(graph.parent_ids) - len(reduced_graph.parent_ids), removed)
+        for name in classes:
+            self.assertEqual(reduced_graph.ancestors(name), graph.ancestors(name))
+        self.assertFalse(reduced_graph.redundant_parents())
+
+    def test_unary_chains(self):
+        graph = ClassGraph({'a-A': set(), 'a-B': {'a-A'}, 'a-C': {'a-B'}, 'a-D': {'a-C'}, 'a-E': {'a-D'},
+                            'a-F': {'a-D'}, 'a-G': {'a-F'}, 'a-H': {'a-F', 'a-A'}})
+        self.assertEqual(list(graph.unary_chains()), [['a-B', 'a-C', 'a-D']])
+        self.assertEqual(list(graph.unary_chains(4)), [])
+        graph = ClassGraph({f'a-C{i}': {f'a-C{i - 1}'} if i else set() for i in range(5)})
+        self.assertEqual(list(graph.unary_chains(5)), [[f'a-C{i}' for i in range(5)]])
+
+    def test_command_line(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, 'redundant.owl')
+            path.write_text(REDUNDANT)
+            args = ['owl2types', '--exclude-owl-thing', '--engine', 'stream', '--reduce', '--chain-length', '3',
+                    f'{path}:a']
+            with patch.object(sys, 'argv', args), SysOut() as out, patch.object(sys, 'stderr', StringIO()) as err:
+                owl2types()
+        self.assertIn('<type name="a-Shetland" parents="a-Pony" />', out.getvalue())
+        self.assertEqual(err.getvalue().splitlines(), [
+            'owl2types: removed 1 redundant parents',
+            'owl2types: chain of 4 types, each the only child of the previous one: '
+            'a-Animal > a-Horse > a-Pony > a-Shetland',
+        ])
+
+
+class TestQuery(unittest.TestCase):
+    def test_questions(self):
+        output, status = query(owl('multi_inheritance'),
+                               '--ancestors', 'test-Mule',
+                               '--is-subtype', 'test-Mule', 'test-Horse',
+                               '--children', 'test-Animal')
+        self.assertEqual(output, ['test-Animal test-Donkey test-Horse', 'true', 'test-Donkey test-Horse'])
+        self.assertEqual(status, 0)
+
+    def test_not_a_subtype(self):
+        output, status = query(owl('multi_inheritance'), '--is-subtype', 'test-Horse', 'test-Mule')
+        self.assertEqual(output, ['false'])
+        self.assertEqual(status, 1)
+
+    def test_unknown_class(self):
+        output, status = query(owl('multi_inheritance'), '--descendants', 'test-Unicorn')
+        self.assertEqual(output, [])
+        self.assertEqual(status, 'owl2types: unknown class test-Unicorn')
@@ -0,0 +1,86 @@
+import tempfile
+import unittest
+
+from collections import defaultdict
+from pathlib import Path
+
+from owl2types import owl2types
+from owl2types_lexicon import LexiconIndex, build_lexicon_index, read_lexicon_entries
+
+from test_export_types import SysOut
+
+
+GRAMMAR = Path(__file__).parent.parent.parent / 'english-cooking'
+
+MORPH = '''<?xml version="1.0" encoding="UTF-8"?>
+<morph name="test">
+  <entry pos="N" word="mule" class="test-Mule" macros="@num.sg @pers.3rd" />
+  <entry pos="N" word="mules" stem="mule" class="test-Mule" macros="@num.pl" />
+  <entry pos="V" word="kicks" stem="kick" />
+  <entry pos="DET" word="the" />
+  <macro name="@num.sg" />
+</morph>
+'''
+
+LEXICON = '''<?xml version="1.0" encoding="UTF-8"?>
+<ccg-lexicon name="test">
+  <family pos="N" name="n" closed="true"><entry name="Primary" /></family>
+  <family pos="V" name="v.trans" closed="true"><member stem="kick" /><member stem="hit" /></family>
+  <family pos="V" name="v.intrans" closed="true"><member stem="sleep" /></family>
+</ccg-lexicon>
+'''
+
+
+class TestLexiconIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name)
+        self.morph, self.lexicon, self.index = self.path / 'morph.xml', self.path / 'lexicon.xml', self.path / 'idx'
+        self.morph.write_text(MORPH)
+        self.lexicon.write_text(LEXICON)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_lookup(self):
+        self.assertTrue(build_lexicon_index(self.morph, self.lexicon, self.index))
+        with LexiconIndex(self.index) as index:
+            self.assertEqual(index.words(), ['kicks', 'mule', 'mules', 'the'])
+            entry, = index.lookup('mule')
+            self.assertEqual(entry, ('mule', 'mule', 'N', 'test-Mule', ['@num.sg', '@pers.3rd'], ['n']))
+            entry, = index.lookup('kicks')
+            self.assertEqual(entry, ('kicks', 'kick', 'V', None, [], ['v.trans']))
+            self.assertEqual(index.lookup('mul'), [])
+            self.assertEqual(index.lookup('zebra'), [])
+
+    def test_rebuild(self):
+        self.assertTrue(build_lexicon_index(self.morph, self.lexicon, self.index))
+        self.assertFalse(build_lexicon_index(self.morph, self.lexicon, self.index))
+        self.morph.write_text(MORPH.replace('mules', 'mulez'))
+        self.assertTrue(build_lexicon_index(self.morph, self.lexicon, self.index))
+        with LexiconIndex(self.index) as index:
+            self.assertEqual(len(index.lookup('mulez')), 1)
+
+    def test_invalid(self):
+        self.index.write_bytes(b'no index')
+        with self.assertRaises(ValueError):
+            LexiconIndex(self.index)
+        self.assertTrue(build_lexicon_index(self.morph, self.lexicon, self.index))
+
+    def test_grammar(self):
+        build_lexicon_index(GRAMMAR / 'morph.xml', GRAMMAR / 'lexicon.xml', self.index)
+        expected = defaultdict(list)
+        for entry in read_lexicon_entries(GRAMMAR / 'morph.xml', GRAMMAR / 'lexicon.xml'):
+            expected[entry.word].append(entry)
+        with LexiconIndex(self.index) as index:
+            self.assertEqual(index.words(), sorted(expected, key=lambda word: word.encode('utf-8')))
+            for word, entries in expected.items():
+                self.assertEqual(index.lookup(word), entries)
+
+    def test_command_line(self):
+        with SysOut() as out:
+            owl2types(['lexicon', '--index', str(self.index), '--morph', str(self.morph),
+                       '--lexicon', str(self.lexicon), 'mules', 'the'])
+        self.assertEqual(out.getvalue(), 'mules\tmule\tN\ttest-Mule\t@num.pl\tn\nthe\tthe\tDET\t\t\t\n')
+        with SysOut(), self.assertRaises(SystemExit):
+            owl2types(['lexicon', '--index', str(self.index), 'zebra'])
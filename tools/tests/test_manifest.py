@@ -0,0 +1,61 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from pathlib import Path
+from unittest.mock import patch
+
+import owl2types as module
+from owl2types import owl2types, manifest_path
+
+from test_export_types import TESTDATA, argv, owl
+
+
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.output = Path(self.directory.name) / 'types.xml'
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_owl2types(self, *options):
+        with argv('--manifest', '--output', str(self.output), *options, owl('simple_import_ext', 'ext')):
+            owl2types()
+
+    def test_manifest_written(self):
+        self.run_owl2types()
+        self.assertTrue(manifest_path(str(self.output)).exists())
+
+    def test_up_to_date(self):
+        self.run_owl2types()
+        mtime = os.stat(self.output).st_mtime_ns
+        with patch.object(module, 'load_ontologies', side_effect=AssertionError('ontologies loaded')):
+            self.run_owl2types()
+        self.assertEqual(mtime, os.stat(self.output).st_mtime_ns)
+
+    def test_changed_option(self):
+        self.run_owl2types()
+        with patch.object(module, 'load_ontologies', wraps=module.load_ontologies) as load:
+            self.run_owl2types('--format', 'ccg', '--nobackup')
+        load.assert_called_once()
+
+    def test_modified_output(self):
+        self.run_owl2types()
+        self.output.write_text('')
+        self.run_owl2types()
+        self.assertNotEqual(self.output.read_text(), '')
+
+    def test_no_owlready2_import(self):
+        self.run_owl2types()
+        script = ('import sys, owl2types\n'
+                  'owl2types.owl2types()\n'
+                  'print("owlready2" in sys.modules)\n')
+        args = ['--exclude-owl-thing', '--lookup', str(TESTDATA), '--manifest',
+                '--output', str(self.output), owl('simple_import_ext', 'ext')]
+        result = subprocess.run([sys.executable, '-c', script, *args], check=True,
+                                capture_output=True, text=True,
+                                cwd=Path(module.__file__).parent)
+        self.assertEqual(result.stdout.strip(), 'False')
@@ -0,0 +1,59 @@
+import json
+import pstats
+import tempfile
+import unittest
+
+from pathlib import Path
+
+from owl2types import Converter, Profiler, owl2types
+
+from test_export_types import TESTDATA, argv, owl, SysOut
+
+
+class TestProfile(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_command_line(self):
+        report, stats = self.path / 'profile.json', self.path / 'profile.prof'
+        with argv('--profile', str(report), '--cprofile', str(stats), '--target', f'xml:{self.path / "types.xml"}',
+                  owl('simple_import_base', 'base'), owl('simple_import_ext', 'ext')):
+            owl2types()
+        report = json.loads(report.read_text())
+        self.assertEqual([(stage['name'], stage['parent']) for stage in report['stages']],
+                         [('load', None), ('imports', 'load'), ('extract', None), ('exclude_owl_thing', None),
+                          ('graph', None), ('xml', None)])
+        self.assertEqual(report['counts'], {'ontologies': 2, 'classes': 2, 'edges': 1})
+        self.assertIn(report['hot_stage'], ['load', 'extract'])
+        self.assertGreater(report['classes_per_second'], 0)
+        for stage in report['stages']:
+            self.assertGreaterEqual(stage['peak_bytes'], stage['peak_increase_bytes'])
+        self.assertIn('load_ontologies', str(pstats.Stats(str(stats)).stats))
+
+    def test_hooks(self):
+        stages = []
+        with Profiler(memory=False, hooks=[stages.append]) as profiler:
+            Converter([owl('multi_inheritance')], lookup=[TESTDATA], exclude_owl_thing=True,
+                      engine='stream').render('ccg')
+        self.assertEqual([stage['name'] for stage in stages], ['imports', 'stream', 'exclude_owl_thing', 'graph',
+                                                         'ccg', 'splice'])
+        report = profiler.report()
+        self.assertIsNone(report['peak_bytes'])
+        self.assertEqual(report['counts']['classes'], len(Converter([owl('multi_inheritance')], lookup=[TESTDATA],
+                                                                     engine='stream').graph()))
+
+    def test_not_profiled(self):
+        with Profiler() as profiler:
+            pass
+        with argv(owl('multi_inheritance')), SysOut():
+            owl2types()
+        self.assertEqual(profiler.stages, [])
+
+    def test_watch(self):
+        with argv('--profile', str(self.path / 'profile.json'), '--watch', owl('multi_inheritance')), \
+                self.assertRaises(SystemExit):
+            owl2types()
@@ -0,0 +1,90 @@
+import json
+import sys
+import tempfile
+import unittest
+
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from owl2types import Converter, owl2types, prune_classes
+
+from test_export_types import TESTDATA, argv, owl, SysOut, parse_types
+
+
+MORPH = '''<?xml version="1.0" encoding="UTF-8"?>
+<morph name="test">
+  <entry pos="N" word="horse" class="test-Horse" />
+  <entry pos="N" word="unicorn" class="test-Unicorn" />
+</morph>
+'''
+
+
+def type_names(output):
+    """Returns the names and parents of the types of a types.xml."""
+    return {t.get('name'): t.get('parents') for t in parse_types(output).findall('type')}
+
+
+class TestPrune(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name)
+        (self.path / 'morph.xml').write_text(MORPH)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def convert(self, *options, output_format='xml'):
+        with argv('--engine', 'stream', '--format', output_format, *options, owl('multi_inheritance')), \
+                SysOut() as out, patch.object(sys, 'stderr', StringIO()) as err:
+            owl2types()
+        return out.getvalue(), err.getvalue()
+
+    def test_prune_classes(self):
+        classes = {'A': set(), 'B': {'A'}, 'C': {'A'}, 'D': {'B', 'C'}, 'E': {'F'}, 'F': {'E'}, 'G': {'owl-Thing'}}
+        self.assertEqual(prune_classes(classes, ['B']), {'A': set(), 'B': {'A'}})
+        self.assertEqual(list(prune_classes(classes, ['D', 'unknown'])), ['A', 'B', 'C', 'D'])
+        self.assertEqual(prune_classes(classes, {'E', 'G'}), {'E': {'F'}, 'F': {'E'}, 'G': {'owl-Thing'}})
+        self.assertEqual(prune_classes(classes, []), {})
+
+    def test_keep(self):
+        output, err = self.convert('--keep', 'test-Donkey')
+        self.assertEqual(type_names(output), {'test-Animal': None, 'test-Donkey': 'test-Animal'})
+        self.assertIn('removed 2 of 4 types, xml ', err)
+        self.assertEqual(self.convert('--roots', 'test-Donkey')[0], output)
+
+    def test_keep_referenced(self):
+        output, err = self.convert('--keep-referenced', str(self.path / 'morph.xml'), '--keep', 'test-Nothing')
+        self.assertEqual(type_names(output), {'test-Animal': None, 'test-Horse': 'test-Animal'})
+        self.assertIn('--keep test-Nothing is no class of the ontologies', err)
+        self.assertIn('1 referenced types are no classes of the ontologies', err)
+
+        output, _ = self.convert('--keep-referenced', str(self.path / 'morph.xml'), output_format='ccg')
+        self.assertIn('test-Horse', output)
+        self.assertNotIn('test-Mule', output)
+
+    def test_sizes(self):
+        full, _ = self.convert()
+        pruned, err = self.convert('--keep', 'test-Animal')
+        self.assertIn(f'xml {len(full) - 1} -> {len(pruned) - 1} bytes', err)
+
+    def test_missing_grammar(self):
+        with self.assertRaises(SystemExit) as context:
+            self.convert('--keep-referenced', str(self.path / 'missing.xml'))
+        self.assertIn('cannot read the type references', str(context.exception.code))
+
+    def test_manifest(self):
+        output = self.path / 'types.xml'
+        morph = self.path / 'morph.xml'
+        self.convert('--manifest', '--output', str(output), '--keep-referenced', str(morph))
+        options = json.loads(Path(f'{output}.manifest.json').read_text())['options']
+        self.assertEqual(options['keep_referenced'][0][0], str(morph))
+
+        morph.write_text(MORPH.replace('test-Horse', 'test-Mule'))
+        self.convert('--manifest', '--output', str(output), '--keep-referenced', str(morph))
+        self.assertIn('test-Mule', type_names(output.read_text()))
+
+    def test_converter(self):
+        converter = Converter([owl('multi_inheritance')], lookup=[TESTDATA], exclude_owl_thing=True,
+                              engine='stream', keep=['test-Donkey'])
+        self.assertEqual(converter.render(), self.convert('--keep', 'test-Donkey')[0][:-1])
@@ -0,0 +1,135 @@
+import hashlib
+import sys
+import tempfile
+import threading
+import unittest
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import patch
+
+from owl2types import owl2types
+
+from test_export_types import TESTDATA, SysOut
+
+
+GITHUB = 'https://raw.githubusercontent.com/shoeffner/openccg-gum-cooking/master/tools/tests/data/'
+
+TOP = '''<?xml version="1.0"?>
+<rdf:RDF xmlns:owl="http://www.w3.org/2002/07/owl#"
+         xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+         xmlns:rdfs="http://www.w3.org/2000/01/rdf-schema#"
+         xml:base="{url}top.owl">
+    <owl:Ontology rdf:about="{url}top.owl">
+        <owl:imports rdf:resource="{url}simple_import_ext.owl"/>
+    </owl:Ontology>
+    <owl:Class rdf:about="{url}top.owl#GrandChildThing">
+        <rdfs:subClassOf rdf:resource="{url}simple_import_ext.owl#ChildThing"/>
+    </owl:Class>
+</rdf:RDF>
+'''
+
+
+class OntologyHandler(BaseHTTPRequestHandler):
+    """Serves the files of the server's directory with ETags."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get('If-None-Match')))
+        path = Path(self.server.directory, self.path.lstrip('/'))
+        if not path.is_file():
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = path.read_bytes()
+        etag = '"{}"'.format(hashlib.sha256(body).hexdigest())
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestRemoteOntologies(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.served = Path(self.directory.name, 'served')
+        self.served.mkdir()
+        self.cache = Path(self.directory.name, 'cache')
+        self.start_server()
+        self.url = 'http://127.0.0.1:{}/'.format(self.server.server_address[1])
+        for name in ['simple_import_base', 'simple_import_ext']:
+            (self.served / f'{name}.owl').write_text((TESTDATA / f'{name}.owl').read_text().replace(GITHUB, self.url))
+        (self.served / 'top.owl').write_text(TOP.format(url=self.url))
+
+    def tearDown(self):
+        self.stop_server()
+        self.directory.cleanup()
+
+    def start_server(self, port=0):
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), OntologyHandler)
+        self.server.directory = self.served
+        self.server.requests = []
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def stop_server(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.thread.join()
+            self.server = None
+
+    def run_owl2types(self, *options, engine='stream'):
+        args = ['owl2types', '--exclude-owl-thing', '--engine', engine, *options]
+        with patch.object(sys, 'argv', args), SysOut() as out:
+            owl2types()
+        return out.getvalue()
+
+    def remote(self, *options, engine='stream'):
+        return self.run_owl2types('--cache', str(self.cache), *options, f'{self.url}top.owl:top', engine=engine)
+
+    def local(self, engine='stream'):
+        # A cache of its own, so that owlready2 loads into a fresh world like for remote
+        return self.run_owl2types('--cache', str(Path(self.directory.name, 'local')), '--lookup', str(self.served),
+                                  f'{self.served}/top.owl:top', engine=engine)
+
+    def test_fetch(self):
+        for engine in ['stream', 'owlready2']:
+            with self.subTest(engine=engine):
+                self.assertEqual(self.remote(engine=engine), self.local(engine=engine))
+        self.assertIn(f'sib: {self.url}simple_import_base.owl#', self.local())
+        self.assertEqual(sorted(path for path, _ in self.server.requests[:3]),
+                         ['/simple_import_base.owl', '/simple_import_ext.owl', '/top.owl'])
+        self.assertEqual([etag for _, etag in self.server.requests[:3]], [None] * 3)
+
+    def test_revalidate(self):
+        expected = self.remote()
+        self.server.requests.clear()
+        self.assertEqual(self.remote(), expected)
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertTrue(all(etag for _, etag in self.server.requests))
+
+    def test_changed(self):
+        self.remote()
+        base = self.served / 'simple_import_base.owl'
+        base.write_text(base.read_text().replace('ParentThing', 'AncestorThing'))
+        self.assertIn('sib-AncestorThing', self.remote())
+
+    def test_offline(self):
+        expected = self.remote()
+        self.stop_server()
+        self.assertEqual(self.remote('--offline'), expected)
+        self.assertEqual(self.remote(), expected)
+        self.cache = Path(self.directory.name, 'empty')
+        with self.assertRaises(SystemExit):
+            self.remote('--offline')
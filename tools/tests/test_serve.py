@@ -0,0 +1,126 @@
+import base64
+import http.client
+import json
+import socket
+import tempfile
+import threading
+import unittest
+
+from pathlib import Path
+
+from owl2types import Converter
+from owl2types_serve import BadRequest, ConversionService, conversion_server
+
+from test_export_types import TESTDATA, owl
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path):
+        super().__init__('localhost')
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+class TestServe(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.service = ConversionService(workers=2, cache_size=2, roots=[TESTDATA, tempfile.gettempdir()])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.service.close()
+
+    def setUp(self):
+        self.server = conversion_server(self.service, port=0)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def request(self, method, path, body=None, connection=None):
+        connection = connection or http.client.HTTPConnection(*self.server.server_address[:2])
+        try:
+            connection.request(method, path, body=json.dumps(body) if body is not None else None)
+            response = connection.getresponse()
+            return response.status, response.read().decode('utf-8'), response.getheader('X-Owl2types-Cache')
+        finally:
+            connection.close()
+
+    def convert(self, **request):
+        request = dict({'lookup': [str(TESTDATA)], 'exclude_owl_thing': True}, **request)
+        return self.request('POST', '/convert', request)
+
+    def test_convert(self):
+        owls = [owl('simple_import_base', 'base'), owl('simple_import_ext', 'ext')]
+        expected = Converter(owls, lookup=[TESTDATA], exclude_owl_thing=True).render('ccg')
+        self.assertEqual(self.convert(ontologies=owls, format='ccg', engine='stream'), (200, expected, 'miss'))
+        self.assertEqual(self.convert(ontologies=owls, format='ccg', engine='stream'), (200, expected, 'hit'))
+        stats = json.loads(self.request('GET', '/stats')[1])
+        self.assertGreaterEqual(stats['hits'], 1)
+        self.assertGreaterEqual(stats['conversions'], 1)
+        self.assertGreater(stats['mean_latency_ms'], 0)
+
+    def test_changed_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            ontology = Path(directory, 'multi_inheritance.owl')
+            ontology.write_text((TESTDATA / 'multi_inheritance.owl').read_text())
+            first = self.convert(ontologies=[f'{ontology}:test'], engine='stream')
+            ontology.write_text(ontology.read_text().replace('Mule', 'Hinny'))
+            second = self.convert(ontologies=[f'{ontology}:test'], engine='stream')
+        self.assertIn('test-Mule', first[1])
+        self.assertIn('test-Hinny', second[1])
+        self.assertEqual(second[2], 'miss')
+
+    def test_upload(self):
+        files = {f'{name}.owl': base64.b64encode((TESTDATA / f'{name}.owl').read_bytes()).decode('ascii')
+                 for name in ['simple_import_base', 'simple_import_ext']}
+        expected = Converter([owl('simple_import_ext', 'ext')], lookup=[TESTDATA], exclude_owl_thing=True).render()
+        self.assertEqual(self.convert(ontologies=['simple_import_ext.owl:ext'], files=files, lookup=[]),
+                         (200, expected, 'miss'))
+        self.assertEqual(self.convert(ontologies=['simple_import_ext.owl:ext'], files=files, lookup=[]),
+                         (200, expected, 'hit'))
+        self.assertEqual(self.convert(ontologies=['simple_import_ext.owl:ext', str(TESTDATA / 'missing.owl')],
+                                      files=files)[0], 500)
+        self.assertEqual(list(self.service.uploads.iterdir()), [])
+
+    def test_bad_request(self):
+        self.assertEqual(self.convert(ontologies=[owl('multi_inheritance')], format='json')[0], 400)
+        self.assertEqual(self.convert(ontologies=['a.owl'], files={'../a.owl': ''})[0], 400)
+        self.assertEqual(self.convert(ontologies=[str(TESTDATA / 'missing.owl')])[0], 500)
+        self.assertEqual(self.request('GET', '/convert')[0], 404)
+
+    def test_types(self):
+        ontologies = [owl('multi_inheritance')]
+        for request in [{'ontologies': ontologies[0]},
+                        {'ontologies': ontologies, 'lookup': str(TESTDATA)},
+                        {'ontologies': ontologies, 'format': 'ccg', 'ccg': 5}]:
+            with self.subTest(request=request):
+                with self.assertRaises(BadRequest):
+                    self.service.options(request)
+                self.assertEqual(self.request('POST', '/convert', request)[0], 400)
+
+    def test_roots(self):
+        self.assertEqual(self.convert(ontologies=[owl('multi_inheritance')], lookup=[str(TESTDATA.parent)])[0], 400)
+        self.assertEqual(self.convert(ontologies=[f'{TESTDATA}/../test_serve.py'])[0], 400)
+        self.assertEqual(self.convert(ontologies=['https://example.org/a.owl'])[0], 400)
+
+    def test_unix_socket(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = str(Path(directory, 'owl2types.sock'))
+            server = conversion_server(self.service, socket=path)
+            thread = threading.Thread(target=server.serve_forever)
+            thread.start()
+            try:
+                status, body, _ = self.request('GET', '/stats', connection=UnixHTTPConnection(path))
+            finally:
+                server.shutdown()
+                server.server_close()
+                thread.join()
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)['workers'], 2)
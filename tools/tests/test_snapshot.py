@@ -0,0 +1,84 @@
+import sys
+import tempfile
+import unittest
+
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from owl2types import ClassGraph, owl2types, read_hierarchy
+from owl2types_snapshot import GraphSnapshot
+
+from test_export_types import TESTDATA, argv, owl, SysOut
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name)
+        self.snapshot = self.path / 'types.graph'
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def convert(self, *args):
+        with argv('--engine', 'stream', *args), SysOut() as out, patch.object(sys, 'stderr', StringIO()):
+            owl2types()
+        return out.getvalue()
+
+    def write(self, name='multi_inheritance', *args):
+        self.convert('--format', 'graph', '--output', str(self.snapshot), *args, owl(name))
+
+    def test_round_trip(self):
+        for name in ['multi_inheritance', 'complex_inheritance', 'simple_import_ext']:
+            with self.subTest(name=name):
+                self.write(name)
+                for output_format in ['xml', 'ccg']:
+                    self.assertEqual(self.convert('--format', output_format, str(self.snapshot)),
+                                     self.convert('--format', output_format, owl(name)))
+
+    def test_graph(self):
+        self.write()
+        with GraphSnapshot(self.snapshot) as snapshot:
+            graph = snapshot.graph()
+            expected = ClassGraph(read_hierarchy(str(self.snapshot), 'graph'))
+            self.assertEqual(list(graph.items()), list(expected.items()))
+            self.assertEqual(graph.ancestors('test-Mule'), ['test-Animal', 'test-Donkey', 'test-Horse'])
+            self.assertIsInstance(graph.parent_ids, memoryview)
+            self.assertEqual([o.name for o in snapshot.ontologies], ['multi_inheritance'])
+            self.assertEqual(snapshot.ontology_prefix_map['multi_inheritance'], 'test')
+
+    def test_no_ontologies(self):
+        self.write()
+        with patch('owl2types.load_ontologies', side_effect=AssertionError), \
+                patch('owl2types.parse_file', side_effect=AssertionError):
+            output = self.convert('--keep', 'test-Donkey', str(self.snapshot))
+        self.assertIn('<type name="test-Donkey" parents="test-Animal" />', output)
+        self.assertNotIn('test-Mule', output)
+
+    def test_query(self):
+        self.write()
+        with SysOut() as out:
+            owl2types(['query', str(self.snapshot), '--descendants', 'test-Horse'])
+        self.assertEqual(out.getvalue(), 'test-Mule\n')
+
+    def test_invalid(self):
+        self.snapshot.write_bytes(b'O2TGRPH\0' + bytes(8))
+        with self.assertRaises(ValueError):
+            GraphSnapshot(self.snapshot)
+        self.write()
+        self.snapshot.write_bytes(self.snapshot.read_bytes()[:-8])
+        with self.assertRaises(ValueError):
+            GraphSnapshot(self.snapshot)
+        with self.assertRaises(SystemExit):
+            self.convert(str(self.snapshot))
+
+    def test_options(self):
+        self.write()
+        with patch.object(sys, 'stderr', StringIO()):
+            with self.assertRaises(SystemExit):
+                owl2types(['--format', 'graph', owl('multi_inheritance')])
+            with self.assertRaises(SystemExit):
+                owl2types(['--format', 'graph', '--output', f'{self.snapshot}.gz', owl('multi_inheritance')])
+        with self.assertRaises(SystemExit):
+            self.convert(str(self.snapshot), str(TESTDATA / 'multi_inheritance.owl'))
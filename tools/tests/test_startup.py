@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from pathlib import Path
+
+
+TOOLS = Path(__file__).parent.parent
+
+# Cumulative import time budget of the owl2types module in microseconds.
+IMPORT_BUDGET = int(os.environ.get('OWL2TYPES_IMPORT_BUDGET', 150_000))
+
+HEAVY_MODULES = ('owlready2', 'xml.dom.minidom', 'xml.etree.ElementTree')
+
+
+def python(*args, script):
+    """Runs a python script in a fresh interpreter inside the tools directory."""
+    return subprocess.run([sys.executable, *args, '-c', script], capture_output=True, text=True, cwd=TOOLS)
+
+
+def import_time():
+    """Returns the cumulative import time of owl2types in microseconds, as reported by -X importtime."""
+    result = python('-X', 'importtime', script='import owl2types')
+    for line in result.stderr.splitlines():
+        _, cumulative, name = line.split('|')
+        if name.strip() == 'owl2types':
+            return int(cumulative)
+    raise AssertionError(f'owl2types was not imported:\n{result.stderr}')
+
+
+def imported_modules(*args):
+    """Runs owl2types with args and returns which heavy modules were imported."""
+    script = ('import sys, owl2types\n'
+              f'sys.argv = ["owl2types", *{args!r}]\n'
+              'try:\n'
+              '    owl2types.owl2types()\n'
+              'except SystemExit:\n'
+              '    pass\n'
+              f'print("\\n" + " ".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n')
+    return python(script=script).stdout.splitlines()[-1].split()
+
+
+class TestStartup(unittest.TestCase):
+    def test_import_budget(self):
+        fastest = min(import_time() for _ in range(3))
+        self.assertLess(fastest, IMPORT_BUDGET,
+                        f'importing owl2types took {fastest} us, the budget is {IMPORT_BUDGET} us')
+
+    def test_import(self):
+        self.assertEqual(imported_modules(), [])
+
+    def test_help(self):
+        self.assertEqual(imported_modules('--help'), [])
+
+    def test_argument_error(self):
+        self.assertEqual(imported_modules('--format', 'json', 'a.owl:a'), [])
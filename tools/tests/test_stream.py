@@ -0,0 +1,90 @@
+import tempfile
+import unittest
+
+from pathlib import Path
+
+from owl2types import (OntologyArgument, OntologyCache, UnsupportedOntology, extend_lookup_path,
+                       extract_classes, extract_classes_sql, load_ontologies, stream_ontologies,
+                       unique_prefix)
+
+from test_export_types import TESTDATA, owl
+
+
+FIXTURES = [
+    [owl('empty')],
+    [owl('single_entry')],
+    [owl('multi_entry')],
+    [owl('single_branch')],
+    [owl('multi_branch')],
+    [owl('multi_inheritance')],
+    [owl('complex_inheritance')],
+    [owl('multi_onto_A', 'A'), owl('multi_onto_B', 'B')],
+    [owl('simple_import_base', 'base'), owl('simple_import_ext', 'ext')],
+    [owl('simple_import_ext', 'ext')],
+    [owl('complex_import_a', 'a'), owl('complex_import_b', 'b'),
+     owl('complex_import_c', 'c'), owl('complex_import_d', 'd')],
+]
+
+
+def arguments(*owls):
+    """Creates OntologyArguments from `owl(...)` calls."""
+    unique_prefix.prefixes = []
+    return [OntologyArgument.argument(o) for o in owls]
+
+
+def with_owlready2(*owls, extract=extract_classes):
+    """Loads the ontologies and extracts the classes with owlready2.
+
+    A fresh world is used for each call, as owlready2 keeps the classes it
+    created in earlier loads.
+    """
+    extend_lookup_path(str(TESTDATA))
+    ontology_arguments = arguments(*owls)
+    with tempfile.TemporaryDirectory() as directory:
+        cache = OntologyCache(directory, ontology_arguments)
+        try:
+            ontologies, ontology_prefix_map = load_ontologies(ontology_arguments, cache)
+            classes = extract(ontologies, ontology_prefix_map)
+            return classes, [(o.name, o.base_iri) for o in ontologies], ontology_prefix_map
+        finally:
+            cache.close()
+
+
+def with_stream(*owls, jobs=1):
+    """Loads the ontologies and extracts the classes with the streaming engine."""
+    classes, ontologies, ontology_prefix_map = stream_ontologies(arguments(*owls), [TESTDATA], jobs)
+    return classes, [(o.name, o.base_iri) for o in ontologies], ontology_prefix_map
+
+
+class TestStreamEngine(unittest.TestCase):
+    def test_same_as_owlready2(self):
+        for owls in FIXTURES:
+            with self.subTest(owls=owls):
+                expected = with_owlready2(*owls)
+                actual = with_stream(*owls)
+                self.assertEqual(list(actual[0].items()), list(expected[0].items()))
+                self.assertEqual(actual[1:], expected[1:])
+
+    def test_sql_same_as_owlready2(self):
+        for owls in FIXTURES:
+            with self.subTest(owls=owls):
+                expected = with_owlready2(*owls)
+                actual = with_owlready2(*owls, extract=extract_classes_sql)
+                self.assertEqual(list(actual[0].items()), list(expected[0].items()))
+
+    def test_parallel_same_as_serial(self):
+        for owls in FIXTURES:
+            with self.subTest(owls=owls):
+                expected = with_stream(*owls)
+                actual = with_stream(*owls, jobs=3)
+                self.assertEqual(list(actual[0].items()), list(expected[0].items()))
+                self.assertEqual(actual[1:], expected[1:])
+
+    def test_unsupported(self):
+        with tempfile.TemporaryDirectory() as directory:
+            ontology = Path(directory, 'literal.owl')
+            ontology.write_text((TESTDATA / 'single_entry.owl').read_text().replace(
+                '</rdf:RDF>', '<owl:Class rdf:about="#Z"><rdfs:comment rdf:parseType="Literal"><b>Z</b>'
+                              '</rdfs:comment></owl:Class></rdf:RDF>'))
+            with self.assertRaises(UnsupportedOntology):
+                stream_ontologies(arguments(f'{ontology}:z'), [])
@@ -0,0 +1,89 @@
+import json
+import tempfile
+import unittest
+
+from pathlib import Path
+from unittest.mock import patch
+
+import owl2types as module
+from owl2types import owl2types, read_buildfile
+
+from test_export_types import TESTDATA, argv, owl, compare_types, expected_types, parse_types
+
+
+class TestTargets(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_single_load(self):
+        xml, ccg = self.path / 'types.xml', self.path / 'grammar.ccg'
+        with argv('--target', f'xml:{xml}', '--target', f'ccg:{ccg}', '--nobackup',
+                  owl('multi_inheritance')), \
+                patch.object(module, 'load_ontologies', wraps=module.load_ontologies) as load:
+            owl2types()
+        load.assert_called_once()
+        self.assertTrue(compare_types(parse_types(xml.read_text()), expected_types('multi_inheritance')))
+        self.assertIn('test-Animal: test-Donkey', ccg.read_text())
+
+    def test_output_and_target(self):
+        with argv('--output', str(self.path / 'a.xml'), '--target', f'xml:{self.path / "b.xml"}',
+                  owl('multi_inheritance')), self.assertRaises(SystemExit):
+            owl2types()
+
+    def test_invalid_target(self):
+        with argv('--target', 'json:types.json', owl('multi_inheritance')), self.assertRaises(SystemExit):
+            owl2types()
+
+
+class TestBuild(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def buildfile(self, *grammars):
+        buildfile = self.path / 'grammars.json'
+        buildfile.write_text(json.dumps({'grammars': [
+            dict({'lookup': [str(TESTDATA)], 'exclude_owl_thing': True, 'engine': 'stream',
+                  'ontologies': [owl(name)]}, **grammar) for name, grammar in grammars]}))
+        return str(buildfile)
+
+    def test_grouping(self):
+        buildfile = self.buildfile(('multi_inheritance', {'targets': ['xml:a.xml']}),
+                                   ('single_branch', {'targets': ['xml:b.xml']}),
+                                   ('multi_inheritance', {'targets': ['ccg:a.ccg']}))
+        groups = read_buildfile(buildfile)
+        self.assertEqual(len(groups), 2)
+        self.assertEqual(groups[0][:4], ['--target', 'xml:a.xml', '--target', 'ccg:a.ccg'])
+
+    def test_build(self):
+        buildfile = self.buildfile(('multi_inheritance', {'targets': ['xml:a.xml', 'ccg:a.ccg']}),
+                                   ('single_branch', {'targets': ['xml:b.xml']}))
+        for jobs in ['1', '2']:
+            with self.subTest(jobs=jobs):
+                owl2types(['build', buildfile, '--jobs', jobs])
+                self.assertTrue(compare_types(parse_types((self.path / 'a.xml').read_text()),
+                                              expected_types('multi_inheritance')))
+                self.assertTrue(compare_types(parse_types((self.path / 'b.xml').read_text()),
+                                              expected_types('single_branch')))
+                self.assertIn('test-Animal: test-Donkey', (self.path / 'a.ccg').read_text())
+                for output in ['a.xml', 'a.ccg', 'b.xml']:
+                    (self.path / output).unlink()
+
+    def test_same_output(self):
+        buildfile = self.buildfile(('multi_inheritance', {'targets': ['xml:a.xml']}),
+                                   ('single_branch', {'targets': ['xml:a.xml']}))
+        with self.assertRaises(SystemExit):
+            owl2types(['build', buildfile])
+        self.assertFalse((self.path / 'a.xml').exists())
+
+    def test_unknown_option(self):
+        buildfile = self.buildfile(('multi_inheritance', {'targets': ['xml:a.xml'], 'format': 'xml'}))
+        with self.assertRaises(SystemExit):
+            owl2types(['build', buildfile])
@@ -0,0 +1,97 @@
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from pathlib import Path
+from unittest.mock import patch
+
+from owl2types import Watcher, parse_args, unique_prefix, watch
+
+from test_export_types import TESTDATA, parse_types, compare_types, expected_types
+
+
+class TestWatcher(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.file = self.directory / 'a.owl'
+        self.file.write_text('a')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def check_watcher(self, poll):
+        watcher = Watcher([self.directory], interval=0.01, debounce=0.2, poll=poll)
+        try:
+            self.assertEqual(watcher.wait(0.05), set())
+            time.sleep(0.02)
+            self.file.write_text('ab')
+            threading.Timer(0.05, (self.directory / 'b.owl').write_text, ['b']).start()
+            self.assertEqual(watcher.wait(1), {self.file, self.directory / 'b.owl'})
+        finally:
+            watcher.close()
+
+    def test_inotify(self):
+        self.check_watcher(poll=False)
+
+    def test_polling(self):
+        self.check_watcher(poll=True)
+
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.data = self.directory / 'data'
+        shutil.copytree(TESTDATA, self.data)
+        self.output = self.directory / 'types.xml'
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def check_watch(self, *options):
+        argv = ['owl2types', '--watch', '--exclude-owl-thing', '--lookup', str(self.data),
+                '--output', str(self.output), *options,
+                f'{self.data}/simple_import_base.owl:base', f'{self.data}/simple_import_ext.owl:ext']
+        unique_prefix.prefixes = []
+        with patch.object(sys, 'argv', argv):
+            arguments = parse_args()
+        thread = threading.Thread(target=watch, args=(arguments, None, 1))
+        thread.start()
+        try:
+            for _ in range(100):
+                if self.output.exists():
+                    break
+                time.sleep(0.05)
+            before = self.output.read_text()
+            self.assertTrue(compare_types(parse_types(before), expected_types('simple_import')))
+
+            imported = self.data / 'simple_import_base.owl'
+            imported.write_text(imported.read_text().replace('ParentThing', 'AncestorThing'))
+        finally:
+            thread.join(10)
+        self.assertFalse(thread.is_alive())
+        # ChildThing still refers to ParentThing, which is not declared anymore
+        self.assertEqual(self.output.read_text(),
+                         before.replace('<type name="base-ParentThing" />', '<type name="base-AncestorThing" />')
+                               .replace('parents="base-ParentThing"', 'parents="ext-ParentThing"'))
+
+    def test_stream(self):
+        self.check_watch('--engine', 'stream')
+
+    def test_owlready2(self):
+        self.check_watch('--cache', str(self.directory / 'cache'))
+
+    def test_resident_owlready2(self):
+        import owlready2
+
+        # owlready2's default world names classes after the ontology they
+        # were first accessed through, so the IRIs must be new to it.
+        for name in ['simple_import_base.owl', 'simple_import_ext.owl']:
+            path = self.data / name
+            path.write_text(path.read_text().replace(
+                'https://raw.githubusercontent.com/shoeffner/openccg-gum-cooking/master/tools/tests/data/',
+                'http://example.org/watch/'))
+        self.check_watch('--engine', 'owlready2')
+        self.assertEqual(owlready2.onto_path.count(str(self.data)), 1)
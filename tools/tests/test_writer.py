@@ -0,0 +1,211 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from unittest.mock import patch
+from xml.dom import minidom
+
+import owl2types as module
+from owl2types import (CCG_COMMENT, INDENT, classes2ccg, classes2xml, find_ccg_features, insert_ccg_features,
+                       iter_ccg_features, iter_types_xml, replace_file, write_ccg_features)
+
+
+TOOLS = Path(__file__).parent.parent
+
+CHIMERA_PARENTS = ['Lion', 'Goat', 'Snake', 'Eagle', 'Horse', 'Fish', 'Bat', 'Bull']
+
+CHIMERA = '''<?xml version="1.0"?>
+<rdf:RDF xmlns:owl="http://www.w3.org/2002/07/owl#"
+         xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+         xmlns:rdfs="http://www.w3.org/2000/01/rdf-schema#"
+         xml:base="http://example.org/chimera.owl">
+    <owl:Ontology rdf:about="http://example.org/chimera.owl"/>
+{}
+    <owl:Class rdf:about="#Chimera">
+{}
+    </owl:Class>
+</rdf:RDF>
+'''.format('\n'.join(f'    <owl:Class rdf:about="#{name}"/>' for name in CHIMERA_PARENTS),
+           '\n'.join(f'        <rdfs:subClassOf rdf:resource="#{name}"/>' for name in CHIMERA_PARENTS))
+
+
+def run_owl2types(*args, seed):
+    """Runs owl2types in a fresh interpreter with the hash seed seed."""
+    return subprocess.run([sys.executable, 'owl2types.py', *args], cwd=TOOLS, check=True, capture_output=True,
+                          env=dict(os.environ, PYTHONHASHSEED=str(seed)))
+
+
+class Ontology:
+    def __init__(self, name, base_iri):
+        self.name = name
+        self.base_iri = base_iri
+
+
+ONTOLOGIES = [Ontology('a', 'http://example.org/a#'), Ontology('b', 'http://example.org/b/')]
+PREFIXES = {'a': 'a', 'b': 'bb'}
+
+
+def minidom_types_xml(classes, ontologies, ontology_prefix_map):
+    """The former ElementTree and minidom based classes2xml."""
+    root = ET.Element('types', name='core')
+    root.set('xmlns:xsi', 'http://www.w3.org/2001/XMLSchema-instance')
+    root.set('xsi:noNamespaceSchemaLocation', 'https://raw.githubusercontent.com/OpenCCG/openccg/master/grammars/types.xsd')
+    for cls, parents in classes.items():
+        elem = ET.SubElement(root, 'type', name=cls)
+        if len(parents):
+            elem.set('parents', ' '.join(parents))
+    pretty = minidom.parseString(ET.tostring(root)).toprettyxml(indent=' ' * 4, encoding='UTF-8').decode('utf-8')
+    pretty = pretty.replace('"/>', '" />')
+    comment = '<!-- This file was generated automatically. Do not modify it manually. -->'
+    comment_ontologies = '<!-- Ontologies used:\n     ' + \
+                         '\n     '.join('{}: {}'.format(ontology_prefix_map[o.name], o.base_iri) for o in ontologies) + \
+                         '\n-->'
+    lines = pretty.splitlines()
+    lines.insert(1, comment_ontologies)
+    lines.insert(1, comment)
+    return '\n'.join(lines)
+
+
+class TestTypesXMLWriter(unittest.TestCase):
+    def assertSameAsMinidom(self, classes, ontologies=ONTOLOGIES):
+        self.assertEqual(classes2xml(classes, ontologies, PREFIXES),
+                         minidom_types_xml(classes, ontologies, PREFIXES))
+
+    def test_hierarchy(self):
+        self.assertSameAsMinidom({'owl-Thing': set(),
+                                  'a-Cup': ['bb-Container', 'owl-Thing'],
+                                  'bb-Container': ['owl-Thing']})
+
+    def test_empty(self):
+        self.assertSameAsMinidom({})
+        self.assertSameAsMinidom({}, [])
+
+    def test_escaping(self):
+        self.assertSameAsMinidom({'a-<"Odd"> & \'Names\'': ['a->']})
+
+    def test_streaming(self):
+        classes = {f'a-C{i}': [f'a-C{i - 1}'] if i else [] for i in range(1000)}
+        chunks = iter_types_xml(classes, ONTOLOGIES, PREFIXES)
+        self.assertEqual(len(list(chunks)), 1000 + 5)
+
+
+class TestCCGFeatureRenderer(unittest.TestCase):
+    def test_hierarchy(self):
+        classes = {'owl-Thing': set(), 'a-A': {'owl-Thing'}, 'a-B': {'a-A'}, 'a-C': {'a-B'},
+                   'a-D': {'a-C', 'a-A'}, 'a-E': {'a-A'}, 'a-F': {'owl-Thing'},
+                   'a-T': set(), 'a-G': {'a-T'}, 'a-H': {'a-G'}}
+        self.assertEqual(classes2ccg(classes, ONTOLOGIES[:1], PREFIXES),
+                         '# FEATURE SECTION AUTO GENERATED FROM ONTOLOGY FILES\n'
+                         'feature {\n'
+                         '# Ontologies used:\n'
+                         '# a: http://example.org/a#\n'
+                         '    owl-Thing: a-A {\n'
+                         '        a-B {\n'
+                         '            a-C\n'
+                         '        }\n'
+                         '        a-D[a-C] a-E\n'
+                         '    }\n'
+                         '    a-F;\n'
+                         '    a-T: a-G {\n'
+                         '        a-H\n'
+                         '    }\n'
+                         '   ;\n'
+                         '}')
+
+    def test_deep_hierarchy(self):
+        depth = 10000
+        classes = {f'a-C{i}': {f'a-C{i - 1}'} if i else set() for i in range(depth)}
+        blocks = [chunk for chunk in iter_ccg_features(classes, ONTOLOGIES, PREFIXES) if chunk.endswith('}')]
+        self.assertEqual(len(blocks), depth - 1)
+        self.assertEqual(blocks[0], '\n' + INDENT * (depth - 2) + '}')
+        self.assertEqual(blocks[-1], '\n}')
+
+    def test_many_classes(self):
+        classes = {f'a-C{i}': {f'a-C{(i - 1) // 10}'} if i else set() for i in range(100000)}
+        output = classes2ccg(classes, ONTOLOGIES, PREFIXES)
+        self.assertEqual(sum(1 for name in output.split() if name.startswith('a-C')), 100000)
+
+
+class TestCCGSplice(unittest.TestCase):
+    GRAMMAR = ('# grammar\n'
+               f'{CCG_COMMENT}\n'
+               'feature {\n'
+               '    a-A: a-B;\n'
+               '}\n'
+               'family Noun {\n'
+               '}\n')
+    FEATURES = f'{CCG_COMMENT}\nfeature {{\n    a-A: a-C;\n}}'
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.ccg = Path(self.directory.name) / 'grammar.ccg'
+        self.ccg.write_text(self.GRAMMAR)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_find(self):
+        data = self.GRAMMAR.encode('utf-8')
+        start, end = find_ccg_features(data)
+        self.assertEqual(data[start:end], b'\n'.join(self.GRAMMAR.encode('utf-8').splitlines()[1:5]))
+        self.assertIsNone(find_ccg_features(b'family Noun {\n}\n'))
+        self.assertIsNone(find_ccg_features(f'{CCG_COMMENT}\nfeature {{\n'.encode('utf-8')))
+
+    def test_insert(self):
+        self.assertEqual(insert_ccg_features(self.GRAMMAR, self.FEATURES),
+                         '# grammar\n' + self.FEATURES + '\nfamily Noun {\n}\n')
+        self.assertEqual(insert_ccg_features('family Noun {\n}', self.FEATURES),
+                         self.FEATURES + '\nfamily Noun {\n}')
+
+    def test_write(self):
+        for threshold in [module.MMAP_THRESHOLD, 1]:
+            with self.subTest(threshold=threshold), patch.object(module, 'MMAP_THRESHOLD', threshold):
+                self.ccg.write_text(self.GRAMMAR)
+                self.assertTrue(write_ccg_features(str(self.ccg), self.FEATURES))
+                self.assertEqual(self.ccg.read_text(), insert_ccg_features(self.GRAMMAR, self.FEATURES))
+                self.assertEqual(Path(f'{self.ccg}.bak').read_text(), self.GRAMMAR)
+
+    def test_unchanged(self):
+        write_ccg_features(str(self.ccg), self.FEATURES, backup=False)
+        os.utime(self.ccg, ns=(0, 0))
+        self.assertFalse(write_ccg_features(str(self.ccg), self.FEATURES))
+        self.assertEqual(os.stat(self.ccg).st_mtime_ns, 0)
+        self.assertEqual(sorted(os.listdir(self.directory.name)), ['grammar.ccg'])
+
+    def test_replace_file(self):
+        self.ccg.chmod(0o640)
+        self.assertTrue(replace_file(str(self.ccg), [b'new']))
+        self.assertEqual(self.ccg.read_text(), 'new')
+        self.assertEqual(self.ccg.stat().st_mode & 0o777, 0o640)
+        os.utime(self.ccg, ns=(0, 0))
+        self.assertFalse(replace_file(str(self.ccg), [b'ne', b'w']))
+        self.assertEqual(os.stat(self.ccg).st_mtime_ns, 0)
+        self.assertEqual(sorted(os.listdir(self.directory.name)), ['grammar.ccg'])
+
+
+class TestDeterminism(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_hash_seed(self):
+        owl = self.path / 'chimera.owl'
+        owl.write_text(CHIMERA)
+        output = self.path / 'types.xml'
+        args = ['--exclude-owl-thing', '--engine', 'stream', f'{owl}:c']
+        for output_format in ['xml', 'ccg']:
+            with self.subTest(output_format=output_format):
+                outputs = [run_owl2types('--format', output_format, *args, seed=seed).stdout for seed in [1, 2]]
+                self.assertEqual(outputs[0], outputs[1])
+        run_owl2types('--output', str(output), *args, seed=1)
+        self.assertIn(b'parents="c-Bat c-Bull c-Eagle c-Fish c-Goat c-Horse c-Lion c-Snake"', output.read_bytes())
+        os.utime(output, ns=(0, 0))
+        run_owl2types('--output', str(output), *args, seed=2)
+        self.assertEqual(os.stat(output).st_mtime_ns, 0)